@@ -0,0 +1,90 @@
+/**
+ * GLM多模态分析节点的前端实现
+ * 显示流式输出的实时进度：生成的文本末尾、token 数、首 token 时间和已用时间
+ */
+
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+
+const PROGRESS_EVENT = "bennodes.glm.progress";
+// 节点底部显示的文本行数
+const PREVIEW_LINES = 3;
+const LINE_HEIGHT = 14;
+
+function formatStatus(detail) {
+    const parts = [];
+    if (detail.label) parts.push(detail.label);
+    if (detail.thinking) {
+        parts.push(`思考中（${detail.reasoning_chars}字）`);
+    } else {
+        parts.push(detail.done ? "完成" : "生成中");
+    }
+    parts.push(`首token ${detail.ttft.toFixed(2)}秒`);
+    parts.push(`${detail.tokens} tokens`);
+    parts.push(`${detail.elapsed.toFixed(1)}秒`);
+    return parts.join(" · ");
+}
+
+// 把文本末尾按节点宽度折行，只保留最后几行
+function tailLines(ctx, text, maxWidth) {
+    const lines = [];
+    for (const paragraph of text.split("\n")) {
+        let line = "";
+        for (const ch of paragraph) {
+            if (ctx.measureText(line + ch).width > maxWidth) {
+                lines.push(line);
+                line = ch;
+            } else {
+                line += ch;
+            }
+        }
+        lines.push(line);
+    }
+    return lines.filter(l => l.trim()).slice(-PREVIEW_LINES);
+}
+
+app.registerExtension({
+    name: "ben.GLMNodeBen",
+
+    async setup() {
+        api.addEventListener(PROGRESS_EVENT, ({ detail }) => {
+            const node = app.graph.getNodeById(Number(detail.node)) || app.graph.getNodeById(detail.node);
+            if (!node) return;
+            node.glmProgress = detail;
+            node.setDirtyCanvas(true, false);
+        });
+        // 新的一次执行开始时清除上次的进度
+        api.addEventListener("execution_start", () => {
+            for (const node of app.graph._nodes || []) {
+                if (node.glmProgress) {
+                    node.glmProgress = null;
+                    node.setDirtyCanvas(true, false);
+                }
+            }
+        });
+    },
+
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (nodeData.name !== "GLMNodeBen") return;
+
+        const origDraw = nodeType.prototype.onDrawForeground;
+        nodeType.prototype.onDrawForeground = function (ctx) {
+            if (origDraw) origDraw.apply(this, arguments);
+            const detail = this.glmProgress;
+            if (!detail || this.flags?.collapsed) return;
+
+            const maxWidth = this.size[0] - 20;
+            ctx.save();
+            ctx.font = "11px sans-serif";
+            const lines = [formatStatus(detail), ...tailLines(ctx, detail.text || "", maxWidth)];
+            const top = this.size[1] + 6;
+            ctx.fillStyle = "rgba(0, 0, 0, 0.6)";
+            ctx.fillRect(0, top, this.size[0], lines.length * LINE_HEIGHT + 8);
+            lines.forEach((line, i) => {
+                ctx.fillStyle = i === 0 ? (detail.done ? "#8f8" : "#ffd36b") : "#ddd";
+                ctx.fillText(line, 10, top + 14 + i * LINE_HEIGHT);
+            });
+            ctx.restore();
+        };
+    },
+});
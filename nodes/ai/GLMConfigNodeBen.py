@@ -16,6 +16,18 @@ class GLMConfigNodeBen:
             "presence_penalty": ("FLOAT", {"default": 0.0, "min": -2.0, "max": 2.0, "step": 0.1, "tooltip": "(当前版本不支持) 控制新主题的引入概率，值越大越容易引入新主题。"}),
             "chunk_mode": (["auto", "first_chunk", "all_chunks_summary"], {"default": "auto", "tooltip": "大文件处理模式：auto-自动选择，first_chunk-只处理第一块，all_chunks_summary-分块处理并汇总"}),
             "thinking_enabled": ("BOOLEAN", {"default": True, "tooltip": "是否启用思考功能，启用后模型会展示思考过程，默认开启"}),
+            "chunk_tokens": ("INT", {"default": 96000, "min": 1000, "max": 1000000, "step": 1000, "tooltip": "大文件分块时每块的估算token上限，按模型上下文长度调整（需预留提示词和输出）"}),
+            "chunk_overlap": ("INT", {"default": 200, "min": 0, "max": 10000, "step": 50, "tooltip": "相邻分块重叠的token数，保留跨块的上下文"}),
+            "image_format": (["jpeg", "webp", "png"], {"default": "jpeg", "tooltip": "图片张量上传格式：jpeg/webp 自动选择质量以满足大小上限，png 无损但体积大"}),
+            "image_max_px": ("INT", {"default": 2048, "min": 0, "max": 6000, "step": 64, "tooltip": "上传图片的最大边长，超过时先缩小，0表示保持原尺寸"}),
+            "image_max_mb": ("FLOAT", {"default": 4.0, "min": 0.1, "max": 5.0, "step": 0.1, "tooltip": "单张图片base64后的大小上限（MB）"}),
+            "stream": ("BOOLEAN", {"default": True, "tooltip": "流式接收模型输出，在节点上实时显示生成进度、token数和首token时间，并可随时取消执行"}),
+            "base_url": ("STRING", {"default": "", "placeholder": "默认官方地址", "tooltip": "API服务地址，留空使用官方地址或环境变量ZHIPUAI_BASE_URL"}),
+            "request_timeout": ("INT", {"default": 300, "min": 10, "max": 3600, "step": 10, "tooltip": "单次请求的读取超时（秒），连接超时固定为10秒"}),
+            "connection_pool_size": ("INT", {"default": 0, "min": 0, "max": 128, "step": 1, "tooltip": "复用的HTTP连接数上限，0表示与并发请求数相同"}),
+            "response_cache": ("BOOLEAN", {"default": True, "tooltip": "相同请求（模型、参数、提示词和内容都相同）直接使用磁盘缓存的结果；关闭时总是重新请求，结果仍写入缓存"}),
+            "cache_ttl_hours": ("INT", {"default": 168, "min": 0, "max": 87600, "step": 1, "tooltip": "缓存结果的有效期（小时），0表示不过期"}),
+            "concurrency": ("INT", {"default": 4, "min": 1, "max": 64, "step": 1, "tooltip": "批量图片或列表输入时同时进行的API请求数，1表示逐个请求；过大可能触发接口限流"}),
             }
         }
 
@@ -25,7 +37,7 @@ class GLMConfigNodeBen:
     RETURN_NAMES = ("glm_config",)
     FUNCTION = "create_config"
 
-    def create_config(self, text_model="glm-4.5-flash", vision_model="glm-4.6v-flash", temperature=0.3, max_tokens=2048, top_p=0.7, frequency_penalty=0.0, presence_penalty=0.0, chunk_mode="auto", max_pages=0, thinking_enabled=True):
+    def create_config(self, text_model="glm-4.5-flash", vision_model="glm-4.6v-flash", temperature=0.3, max_tokens=2048, top_p=0.7, frequency_penalty=0.0, presence_penalty=0.0, chunk_mode="auto", max_pages=0, thinking_enabled=True, chunk_tokens=96000, chunk_overlap=200, image_format="jpeg", image_max_px=2048, image_max_mb=4.0, concurrency=4, response_cache=True, cache_ttl_hours=168, stream=True, base_url="", request_timeout=300, connection_pool_size=0):
         # 创建配置字典
         config = {
             "text_model": text_model,
@@ -37,7 +49,19 @@ class GLMConfigNodeBen:
             "presence_penalty": presence_penalty,
             "chunk_mode": chunk_mode,
             "max_pages": max_pages,
-            "thinking_enabled": thinking_enabled
+            "thinking_enabled": thinking_enabled,
+            "chunk_tokens": chunk_tokens,
+            "chunk_overlap": chunk_overlap,
+            "image_format": image_format,
+            "image_max_px": image_max_px,
+            "image_max_mb": image_max_mb,
+            "concurrency": concurrency,
+            "response_cache": response_cache,
+            "cache_ttl_hours": cache_ttl_hours,
+            "stream": stream,
+            "base_url": base_url,
+            "request_timeout": request_timeout,
+            "connection_pool_size": connection_pool_size
         }
         return (config,)
 
@@ -46,6 +70,6 @@ glm_config_type = {
     "GLM_CONFIG": (
         GLMConfigNodeBen,
         "create_config",
-        ["text_model", "vision_model", "temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty", "chunk_mode", "max_pages", "thinking_enabled"]
+        ["text_model", "vision_model", "temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty", "chunk_mode", "max_pages", "thinking_enabled", "chunk_tokens", "chunk_overlap", "image_format", "image_max_px", "image_max_mb", "concurrency", "response_cache", "cache_ttl_hours", "stream", "base_url", "request_timeout", "connection_pool_size"]
     )
 }
@@ -1,12 +1,16 @@
 import os
+import threading
+import time
 import torch
-from zhipuai import ZhipuAI
 from ...utils.constants.constants import any_type
 
 # 导入拆分后的模块
 from .text_processor import TextProcessor
 from .vision_processor import VisionProcessor
 from .office_processor import OfficeProcessor
+from ...utils.system.executor import run_io_tasks, log_executor_stats
+from ...utils.ai.client_pool import glm_client_pool, resolve_base_url
+from ...utils.ai.streaming import is_interrupt
 
 class GLMNodeBen:
     """GLM模型主节点，负责协调各个处理模块"""
@@ -21,6 +25,9 @@ class GLMNodeBen:
                 "input": (any_type, {"default": "", "tooltip": "支持ComfyUI图片、视频数据类型，也可以是文件路径字符串，支持图片、视频、PDF,OFFICE文件。"}),
                 "glm_config": ("GLM_CONFIG", {"default": None, "tooltip": "GLM配置节点，用于选择模型参数和分块模式，不包含API密钥"}),
                 "api_key": ("STRING", {"default": "", "placeholder": "请输入GLM API密钥"}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
@@ -29,9 +36,27 @@ class GLMNodeBen:
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("分析结果",)
     OUTPUT_IS_LIST = (True,)
+    # 列表输入整体传入，由节点自己并发处理，而不是让 ComfyUI 逐项串行调用
+    INPUT_IS_LIST = True
     FUNCTION = "analyze_content"
 
-    def analyze_content(self, prompt="", system_prompt="", input="", glm_config=None, api_key=""):
+    @staticmethod
+    def _as_list(value):
+        return value if isinstance(value, list) else [value]
+
+    def analyze_content(self, prompt="", system_prompt="", input="", glm_config=None, api_key="", unique_id=None):
+        prompts = self._as_list(prompt)
+        inputs = self._as_list(input)
+        # 只有 prompt 和 input 按列表逐项处理，其余输入整次执行共用一个值
+        shared = {"system_prompt": system_prompt, "glm_config": glm_config, "api_key": api_key}
+        for name, value in shared.items():
+            if len(self._as_list(value)) > 1:
+                return ([f"{name} 不支持列表输入（收到 {len(value)} 项），只有 prompt 和 input 可以逐项传入列表"],)
+        system_prompt = self._as_list(system_prompt)[0]
+        glm_config = self._as_list(glm_config)[0]
+        api_key = self._as_list(api_key)[0]
+        unique_id = self._as_list(unique_id)[0]
+
         if not api_key:
             return (["请输入GLM API密钥"],)
 
@@ -45,6 +70,18 @@ class GLMNodeBen:
         presence_penalty = 0.0
         chunk_mode = "auto"
         max_pages = 0
+        image_format = "jpeg"
+        image_max_px = 2048
+        image_max_mb = 4.0
+        concurrency = 4
+        response_cache = True
+        cache_ttl_hours = 168
+        base_url = ""
+        request_timeout = 300
+        connection_pool_size = 0
+        stream = True
+        chunk_tokens = 96000
+        chunk_overlap = 200
         
         if glm_config is not None:
             text_model = glm_config.get("text_model", "glm-4.5-flash")
@@ -56,6 +93,18 @@ class GLMNodeBen:
             presence_penalty = glm_config.get("presence_penalty", 0.0)
             chunk_mode = glm_config.get("chunk_mode", "auto")
             max_pages = glm_config.get("max_pages", 0)
+            image_format = glm_config.get("image_format", "jpeg")
+            image_max_px = glm_config.get("image_max_px", 2048)
+            image_max_mb = glm_config.get("image_max_mb", 4.0)
+            concurrency = glm_config.get("concurrency", 4)
+            response_cache = glm_config.get("response_cache", True)
+            cache_ttl_hours = glm_config.get("cache_ttl_hours", 168)
+            base_url = glm_config.get("base_url", "")
+            request_timeout = glm_config.get("request_timeout", 300)
+            connection_pool_size = glm_config.get("connection_pool_size", 0)
+            stream = glm_config.get("stream", True)
+            chunk_tokens = glm_config.get("chunk_tokens", 96000)
+            chunk_overlap = glm_config.get("chunk_overlap", 200)
         
         # 存储配置参数供各个处理模块使用
         current_config = {
@@ -69,16 +118,68 @@ class GLMNodeBen:
             "frequency_penalty": frequency_penalty,
             "presence_penalty": presence_penalty,
             "chunk_mode": chunk_mode,
-            "max_pages": max_pages
+            "max_pages": max_pages,
+            "image_format": image_format,
+            "image_max_px": image_max_px,
+            "image_max_mb": image_max_mb,
+            "concurrency": concurrency,
+            "response_cache": response_cache,
+            "cache_ttl_hours": cache_ttl_hours,
+            "stream": stream,
+            "chunk_tokens": chunk_tokens,
+            "chunk_overlap": chunk_overlap,
+            # 实际请求的服务地址，响应缓存按地址区分
+            "base_url": resolve_base_url(base_url),
+            # 流式输出的进度推送到当前节点
+            "node_id": unique_id,
+            # 本次执行中所有请求（列表项、批次内各张图片）共用的并发上限
+            "request_limiter": threading.BoundedSemaphore(max(1, concurrency))
         }
         
-        client = ZhipuAI(api_key=api_key)
-        
         # 初始化各个处理模块
         text_processor = TextProcessor(current_config)
         vision_processor = VisionProcessor(current_config)
         office_processor = OfficeProcessor()
-        
+
+        # 按密钥和服务地址复用客户端，保持 keep-alive 连接；文本和视觉处理共用同一个客户端
+        # 执行期间持有客户端，池满淘汰时不会关闭仍在使用的连接
+        with glm_client_pool.lease(api_key, base_url, request_timeout, connection_pool_size or concurrency) as client:
+            return self._analyze_items(client, prompts, inputs, chunk_mode, concurrency, text_processor, vision_processor, office_processor)
+
+    def _analyze_items(self, client, prompts, inputs, chunk_mode, concurrency, text_processor, vision_processor, office_processor):
+        """逐项分析列表输入并按输入顺序合并结果"""
+        # 与 ComfyUI 的列表规则一致：较短的列表重复最后一项
+        count = max(len(prompts), len(inputs))
+        if count <= 1:
+            return self._analyze_item(client, prompts[0], inputs[0], chunk_mode, text_processor, vision_processor, office_processor)
+
+        def analyze_item(i):
+            # 单项失败只影响该项的结果
+            try:
+                return self._analyze_item(client, prompts[min(i, len(prompts) - 1)], inputs[min(i, len(inputs) - 1)],
+                                          chunk_mode, text_processor, vision_processor, office_processor)
+            except Exception as e:
+                if is_interrupt(e):
+                    raise
+                return ([f"处理第{i + 1}项失败: {str(e)}"],)
+
+        start_time = time.time()
+        item_results = run_io_tasks(analyze_item, range(count), concurrency)
+        print(f"列表输入分析时长：{time.time() - start_time:.2f}秒（{count}项）")
+        log_executor_stats()
+
+        # 合并各项输出，保持输入顺序
+        results = []
+        for item_result in item_results:
+            value = item_result[0]
+            if isinstance(value, list):
+                results.extend(value)
+            else:
+                results.append(value)
+        return (results,)
+
+    def _analyze_item(self, client, prompt, input, chunk_mode, text_processor, vision_processor, office_processor):
+        """分析单个输入（文件路径、图片张量、视频或纯文本）"""
         # 检查输入是否为空，需要特殊处理张量类型
         input_is_empty = False
         if input is None:
@@ -161,4 +262,6 @@ class GLMNodeBen:
                 else:
                     return (["不支持的输入类型，请提供有效的文件路径、图片或视频"],)
             except Exception as e:
+                if is_interrupt(e):
+                    raise
                 return ([f"处理错误: {str(e)}"],)
\ No newline at end of file
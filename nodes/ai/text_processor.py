@@ -1,12 +1,22 @@
 import os
 import time
+from contextlib import nullcontext
+from ...utils.ai.response_cache import cached_response, make_request_key
+from ...utils.ai.partial_results import partial_results
+from ...utils.ai.streaming import run_completion, is_interrupt
+from ...utils.system.executor import run_io_tasks
+from ...utils.ai.text_chunker import estimate_tokens, split_into_chunks, LETTER_TOKENS_PER_CHAR
+from ...utils.file.text_reader import read_text
 
 class TextProcessor:
     """文本处理模块，负责处理各种文本文件和内容"""
     
     # GLM-4.5-Flash 的 token 限制（预留一些空间给 prompt 和响应）
-    MAX_CONTENT_CHARS = 100000  # 约 100K 字符，预留空间
-    CHUNK_SIZE = 80000  # 每块大小
+    MAX_CONTENT_CHARS = 100000  # 约 100K 字符，预留空间（汇总提示词的长度上限）
+    CHUNK_TOKENS = 96000  # 每块的估算 token 上限（128K 上下文，预留提示词和输出）
+    CHUNK_OVERLAP_TOKENS = 200  # 相邻块重叠的 token 数
+    REDUCE_HEADER_CHARS = 40  # 汇总时每个部分结果的标题长度
+    REDUCE_MIN_ITEM_CHARS = 2000  # 汇总时每个部分结果至少能保留的字符数
     
     def __init__(self, current_config):
         self.current_config = current_config
@@ -17,130 +27,293 @@ class TextProcessor:
             # 记录文件处理开始时间
             start_time = time.time()
             
-            # 尝试多种编码读取
-            content = None
-            for encoding in ['utf-8', 'gbk', 'gb2312', 'latin-1']:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    break
-                except UnicodeDecodeError:
-                    continue
+            # 只读取当前模式需要的部分：first_chunk 只需第一块，auto 只需判断是否超过两块
+            if chunk_mode == "first_chunk":
+                max_chars = self._max_chunk_chars()
+            elif chunk_mode == "all_chunks_summary":
+                max_chars = None
+            else:
+                max_chars = self._max_chunk_chars() * 2
             
-            if content is None:
-                return ("无法读取文件，请检查文件编码",)
+            # 从有限样本判断编码后增量解码，不再按每种候选编码整文件读取一遍
+            content, encoding, truncated = read_text(file_path, max_chars)
             
             file_name = os.path.basename(file_path)
             
             # 记录文件处理结束时间并打印时长
             file_process_time = time.time() - start_time
-            print(f"文件处理时长：{file_process_time:.2f}秒")
+            print(f"文件处理时长：{file_process_time:.2f}秒（编码 {encoding}，读取{len(content)}字符{'，未读取全部内容' if truncated else ''}）")
             
-            return self.process_text_content(client, content, prompt, chunk_mode, f"文本文件({file_name})")
+            return self.process_text_content(client, content, prompt, chunk_mode, f"文本文件({file_name})", truncated)
             
         except Exception as e:
+            if is_interrupt(e):
+                raise
             return (f"读取文本文件失败: {str(e)}",)
     
-    def process_text_content(self, client, content, prompt, chunk_mode, file_type):
-        """处理文本内容，支持大文件分块"""
+    def process_text_content(self, client, content, prompt, chunk_mode, file_type, truncated=False):
+        """处理文本内容，支持大文件分块；truncated 表示 content 只是文件的开头部分"""
         content_len = len(content)
+        chunk_tokens = self._chunk_tokens()
         
-        # 小文件直接处理
-        if content_len <= self.MAX_CONTENT_CHARS:
+        # 小文件直接处理（按估算的 token 数判断，中文和英文的容量不同）
+        if not truncated and content_len <= self._max_chunk_chars() and estimate_tokens(content) <= chunk_tokens:
             result = self.call_text_api(client, f"{file_type}内容:\n{content}", prompt)
             return ([result[0]],)
         
         # 大文件分块处理
-        print(f"文件较大({content_len}字符)，启用分块处理模式: {chunk_mode}")
+        print(f"文件较大({'至少' if truncated else ''}{content_len}字符)，启用分块处理模式: {chunk_mode}")
         
         if chunk_mode == "first_chunk":
             # 只处理第一块
-            chunk = content[:self.CHUNK_SIZE]
-            result = self.call_text_api(client, f"{file_type}内容(前{self.CHUNK_SIZE}字符):\n{chunk}", prompt)
+            chunk = self.first_chunk(content)
+            result = self.call_text_api(client, f"{file_type}内容(前{len(chunk)}字符):\n{chunk}", prompt)
             return ([result[0]],)
         
         elif chunk_mode == "all_chunks_summary":
-            # 分块处理并汇总
-            chunks = self.split_text_into_chunks(content)
-            results = []
-            
-            for i, chunk in enumerate(chunks):
-                print(f"处理第 {i+1}/{len(chunks)} 块...")
-                chunk_prompt = f"这是{file_type}的第{i+1}部分(共{len(chunks)}部分)，请分析:\n{prompt}"
-                result = self.call_text_api(client, f"内容:\n{chunk}", chunk_prompt)
-                results.append(f"=== 第{i+1}部分分析 ===\n{result[0]}")
-            
-            # 汇总所有结果
-            combined = "\n\n".join(results)
-            summary_prompt = f"以下是对{file_type}各部分的分析结果，请给出综合总结:\n\n{combined}"
-            final_result = self.call_text_api(client, "", summary_prompt)
-            
-            return ([f"{combined}\n\n=== 综合总结 ===\n{final_result[0]}"],)
+            return self.summarize_chunks(client, content, prompt, file_type)
         
         else:  # auto 模式
-            # 自动选择：如果不太大就处理第一块，否则提示用户
-            if content_len <= self.CHUNK_SIZE * 2:
-                chunk = content[:self.CHUNK_SIZE]
-                return self.call_text_api(client, f"{file_type}内容(前{self.CHUNK_SIZE}字符，文件较大已截断):\n{chunk}", prompt)
+            # 自动选择：如果不太大（不超过两块）就处理第一块，否则提示用户
+            if not truncated and estimate_tokens(content) <= chunk_tokens * 2:
+                chunk = self.first_chunk(content)
+                return self.call_text_api(client, f"{file_type}内容(前{len(chunk)}字符，文件较大已截断):\n{chunk}", prompt)
             else:
-                return ([f"文件过大({content_len}字符)，请选择处理模式:\n- first_chunk: 只分析前{self.CHUNK_SIZE}字符\n- all_chunks_summary: 分块分析并汇总(会多次调用API)"],)
+                size_text = f"超过{content_len}字符" if truncated else f"{content_len}字符"
+                return ([f"文件过大({size_text})，请选择处理模式:\n- first_chunk: 只分析第一块(约{chunk_tokens} tokens)\n- all_chunks_summary: 分块分析并汇总(会多次调用API)"],)
     
+    def _chunk_tokens(self):
+        return self.current_config.get('chunk_tokens', self.CHUNK_TOKENS)
+
+    def _max_chunk_chars(self):
+        """一块最多可能包含的字符数（全部是估算系数最小的英文字母时）"""
+        return int(self._chunk_tokens() / LETTER_TOKENS_PER_CHAR)
+
     def split_text_into_chunks(self, text):
-        """将文本分割成多个块"""
-        chunks = []
-        for i in range(0, len(text), self.CHUNK_SIZE):
-            chunks.append(text[i:i + self.CHUNK_SIZE])
-        return chunks
+        """按估算的 token 数把文本分成尽量填满预算的块，优先在段落、行、句子边界切分"""
+        return split_into_chunks(
+            text,
+            self._chunk_tokens(),
+            self.current_config.get('chunk_overlap', self.CHUNK_OVERLAP_TOKENS),
+        )
+
+    def first_chunk(self, text):
+        """只切出第一块；第一块不会超过 _max_chunk_chars 个字符，无需处理整个文本"""
+        return split_into_chunks(text[:self._max_chunk_chars()], self._chunk_tokens(), 0)[0]
     
+    def summarize_chunks(self, client, content, prompt, file_type):
+        """
+        分块并发分析后逐层合并汇总（map-reduce）
+        每次合并的输入都不超过 MAX_CONTENT_CHARS；汇总失败时已完成的部分结果保留在内存中，重新执行会跳过这些请求，
+        生成最终总结后清除本次用到的部分结果，之后的执行按响应缓存设置正常请求
+        """
+        # 分析要求过长时汇总提示词放不下两个部分结果，逐层合并无法收敛，在发出任何请求之前报错
+        item_budget = self._reduce_item_budget(prompt)
+        if item_budget < self.REDUCE_MIN_ITEM_CHARS:
+            return ([f"分析要求过长({len(prompt)}字符)，汇总时没有足够空间容纳各部分结果，请缩短到{self._max_reduce_prompt_chars()}字符以内"],)
+
+        chunks = self.split_text_into_chunks(content)
+        total = len(chunks)
+        concurrency = self.current_config.get('concurrency', 4)
+        start_time = time.time()
+        # 本次执行各请求的摘要，成功生成总结后从部分结果中清除
+        run_keys = []
+
+        def analyze_chunk(i):
+            chunk_prompt = f"这是{file_type}的第{i+1}部分(共{total}部分)，请分析:\n{prompt}"
+            return self._request_text(client, f"内容:\n{chunks[i]}", chunk_prompt, resume_keys=run_keys)
+
+        partials = self._run_isolated(analyze_chunk, range(total), concurrency)
+        sections = [f"=== 第{i+1}部分分析 ===\n{text}" for i, (text, _) in enumerate(partials)]
+        combined = "\n\n".join(sections)
+        print(f"分块分析时长：{time.time() - start_time:.2f}秒（{total}块）")
+
+        failed = [i + 1 for i, (_, ok) in enumerate(partials) if not ok]
+        if failed:
+            # 已完成的部分保存在内存中，重新执行只会请求失败的部分
+            return ([f"{combined}\n\n=== 综合总结 ===\n第{'、'.join(map(str, failed))}部分分析失败，未生成总结；重新执行将只请求失败的部分"],)
+
+        # 逐层合并，直到只剩一个结果；每项记录覆盖的部分范围
+        level = [((i + 1, i + 1), text) for i, (text, _) in enumerate(partials)]
+        depth = 0
+        while len(level) > 1:
+            depth += 1
+            # 超出单项预算的结果先单独压缩，而不是直接截断
+            level, failed = self._shrink_items(client, level, prompt, item_budget, concurrency, run_keys)
+            if failed:
+                return ([f"{combined}\n\n=== 综合总结 ===\n汇总失败: {failed[0]}；重新执行将复用已完成的部分"],)
+            groups = self._group_for_reduce(level, prompt)
+            print(f"第{depth}层汇总：{len(level)}个结果合并为{len(groups)}组")
+
+            def reduce_group(group):
+                if len(group) == 1:
+                    return group[0][1]
+                parts = "\n\n".join(f"=== {self._span_label(span)}分析 ===\n{text}" for span, text in group)
+                reduce_prompt = self._reduce_prompt(file_type, prompt, is_final=len(groups) == 1)
+                return self._request_text(client, "", f"{reduce_prompt}\n\n{parts}", resume_keys=run_keys)
+
+            reduced = self._run_isolated(reduce_group, groups, concurrency)
+            failed = [text for text, ok in reduced if not ok]
+            if failed:
+                return ([f"{combined}\n\n=== 综合总结 ===\n汇总失败: {failed[0]}；重新执行将复用已完成的部分"],)
+            level = [((group[0][0][0], group[-1][0][1]), text) for group, (text, _) in zip(groups, reduced)]
+
+        partial_results.discard(run_keys)
+        print(f"分块汇总总时长：{time.time() - start_time:.2f}秒")
+        return ([f"{combined}\n\n=== 综合总结 ===\n{level[0][1]}"],)
+
+    def _reduce_prompt(self, file_type, prompt, is_final):
+        if is_final:
+            return f"以下是对{file_type}各部分的分析结果，请结合分析要求给出综合总结。\n分析要求：{prompt}"
+        return f"以下是对{file_type}连续几个部分的分析结果，请合并为一份分析，保留与分析要求相关的要点。\n分析要求：{prompt}"
+
+    def _span_label(self, span):
+        first, last = span
+        return f"第{first}部分" if first == last else f"第{first}-{last}部分"
+
+    def _reduce_budget(self, prompt):
+        """一次汇总请求中各部分结果可用的字符数（预留汇总说明的长度）"""
+        return self.MAX_CONTENT_CHARS - len(prompt) - 200
+
+    def _reduce_item_budget(self, prompt):
+        """单个部分结果的字符上限：预算的一半，保证每组至少容纳两个结果，层数随结果数对数增长"""
+        return self._reduce_budget(prompt) // 2 - self.REDUCE_HEADER_CHARS
+
+    def _max_reduce_prompt_chars(self):
+        return self.MAX_CONTENT_CHARS - 200 - 2 * (self.REDUCE_MIN_ITEM_CHARS + self.REDUCE_HEADER_CHARS)
+
+    def _shrink_items(self, client, items, prompt, item_budget, concurrency, run_keys):
+        """
+        把超过 item_budget 字符的结果请求模型压缩到预算以内，返回 (新的结果列表, 失败信息列表)
+        压缩后仍然过长时截断并注明，保证每项都不超过预算
+        """
+        long_items = [i for i, (_, text) in enumerate(items) if len(text) > item_budget]
+        if not long_items:
+            return items, []
+        print(f"{len(long_items)}个结果超过{item_budget}字符，先压缩再汇总")
+        marker = "\n……（内容过长，以下已截断）"
+
+        def shrink(i):
+            span, text = items[i]
+            shrink_prompt = (f"以下是{self._span_label(span)}的分析结果，请在保留与分析要求相关要点的前提下压缩到{item_budget // 2}字以内。\n"
+                             f"分析要求：{prompt}")
+            # 待压缩的结果本身也可能超出单次请求的上限
+            source = text if len(text) <= self._reduce_budget(prompt) else text[:self._reduce_budget(prompt) - len(marker)] + marker
+            shrunk = self._request_text(client, "", f"{shrink_prompt}\n\n{source}", resume_keys=run_keys)
+            if len(shrunk) > item_budget:
+                shrunk = shrunk[:item_budget - len(marker)] + marker
+            return shrunk
+
+        shrunk = self._run_isolated(shrink, long_items, concurrency)
+        failed = [text for text, ok in shrunk if not ok]
+        if failed:
+            return items, failed
+        items = list(items)
+        for i, (text, _) in zip(long_items, shrunk):
+            items[i] = (items[i][0], text)
+        return items, []
+
+    def _group_for_reduce(self, items, prompt):
+        """
+        把相邻的结果分组，使每组合并后的提示词不超过 MAX_CONTENT_CHARS
+        各项已由 _shrink_items 限制在单项预算以内，每组至少容纳两个结果，每层结果数至少减半
+        """
+        budget = self._reduce_budget(prompt)
+        groups = []
+        current = []
+        used = 0
+        for span, text in items:
+            cost = len(text) + self.REDUCE_HEADER_CHARS
+            if current and used + cost > budget:
+                groups.append(current)
+                current = []
+                used = 0
+            current.append((span, text))
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+
+    def _run_isolated(self, fn, items, concurrency):
+        """并发执行，返回 [(结果文本, 是否成功)]，单项失败不影响其他项"""
+        def run(item):
+            try:
+                return (fn(item), True)
+            except Exception as e:
+                if is_interrupt(e):
+                    raise
+                return (f"API调用失败: {str(e)}", False)
+        return run_io_tasks(run, items, concurrency)
+
     def call_text_api(self, client, content, prompt):
         """调用文本API"""
         try:
-            # 获取配置的模型参数和系统提示词
-            config = self.current_config
-            text_model = config.get('text_model', 'glm-4.5-flash')
-            system_prompt = config.get('system_prompt', '你是一个专业的内容分析助手，请仔细分析用户提供的内容并给出详细的分析结果。')
-            temperature = config.get('temperature', 0.7)
-            max_tokens = config.get('max_tokens', 2048)
-            top_p = config.get('top_p', 0.9)
-            frequency_penalty = config.get('frequency_penalty', 0.0)
-            presence_penalty = config.get('presence_penalty', 0.0)
-            
-            # 构建用户内容
-            user_content = ""
-            if content:
-                if prompt.strip():
-                    user_content = f"{prompt}\n\n{content}"
-                else:
-                    user_content = f"请分析这个内容：\n{content}"
-            else:
-                user_content = prompt.strip() if prompt.strip() else "请分析这个内容"
-            
-            # 构建消息列表，包含系统提示词和用户提示词
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ]
-            
-            # 记录API请求开始时间
-            api_start_time = time.time()
-            
-            # 构建thinking参数
-            thinking_enabled = config.get('thinking_enabled', True)
-            thinking_param = {"type": "enabled"} if thinking_enabled else {"type": "disabled"}
-            
-            response = client.chat.completions.create(
-                model=text_model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                thinking=thinking_param
-            )
-            
-            # 记录API请求结束时间并打印时长
-            api_end_time = time.time()
-            print(f"API请求时长：{api_end_time - api_start_time:.2f}秒")
-            
-            return (response.choices[0].message.content,)
+            return (self._request_text(client, content, prompt),)
         except Exception as e:
+            if is_interrupt(e):
+                raise
             return (f"API调用失败: {str(e)}",)
+
+    def _request_text(self, client, content, prompt, resume_keys=None):
+        """
+        发送文本请求并返回模型输出，失败时抛出异常
+        resume_keys 为列表时（分块汇总的各个请求）成功的结果保存在内存中，请求摘要追加到列表；
+        上次汇总失败留下的结果优先复用（即使关闭了响应缓存），汇总成功后由调用方清除
+        """
+        # 获取配置的模型参数和系统提示词
+        config = self.current_config
+        text_model = config.get('text_model', 'glm-4.5-flash')
+        system_prompt = config.get('system_prompt', '你是一个专业的内容分析助手，请仔细分析用户提供的内容并给出详细的分析结果。')
+        temperature = config.get('temperature', 0.7)
+        max_tokens = config.get('max_tokens', 2048)
+        top_p = config.get('top_p', 0.9)
+        frequency_penalty = config.get('frequency_penalty', 0.0)
+        presence_penalty = config.get('presence_penalty', 0.0)
+        
+        # 构建用户内容
+        user_content = ""
+        if content:
+            if prompt.strip():
+                user_content = f"{prompt}\n\n{content}"
+            else:
+                user_content = f"请分析这个内容：\n{content}"
+        else:
+            user_content = prompt.strip() if prompt.strip() else "请分析这个内容"
+        
+        # 构建消息列表，包含系统提示词和用户提示词
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        
+        # 构建thinking参数
+        thinking_enabled = config.get('thinking_enabled', True)
+        thinking_param = {"type": "enabled"} if thinking_enabled else {"type": "disabled"}
+        
+        request_params = {
+            "model": text_model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            "thinking": thinking_param
+        }
+
+        def request():
+            # 同一次执行的所有请求共用一个并发上限；流式模式下向界面推送进度并记录首token时间
+            with config.get('request_limiter') or nullcontext():
+                return run_completion(client, request_params, config, text_model)
+
+        resume_key = None
+        if resume_keys is not None:
+            resume_key = make_request_key(config.get('base_url', ''), request_params)
+            resume_keys.append(resume_key)
+            text = partial_results.get(resume_key)
+            if text is not None:
+                return text
+
+        # 相同请求（模型、参数、系统提示词和内容都相同）直接返回缓存结果
+        text = cached_response(request_params, request, config.get('response_cache', True), config.get('cache_ttl_hours', 168), config.get('base_url', ''))
+        if resume_key is not None:
+            partial_results.put(resume_key, text)
+        return text
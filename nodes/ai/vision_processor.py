@@ -1,8 +1,11 @@
 import os
 import time
 import base64
-from PIL import Image
-import io
+from contextlib import nullcontext
+from ...utils.image.image_utils import tensor_batch_to_base64
+from ...utils.system.executor import run_io_tasks
+from ...utils.ai.response_cache import cached_response
+from ...utils.ai.streaming import run_completion, is_interrupt
 
 class VisionProcessor:
     """视觉处理模块，负责处理图片、PDF、视频等视觉内容"""
@@ -49,28 +52,30 @@ class VisionProcessor:
                 {"role": "user", "content": content_list}
             ]
             
-            # 记录API请求开始时间
-            api_start_time = time.time()
-            
             # 构建thinking参数
             thinking_enabled = config.get('thinking_enabled', True)
             thinking_param = {"type": "enabled"} if thinking_enabled else {"type": "disabled"}
             
-            response = client.chat.completions.create(
-                model=vision_model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                thinking=thinking_param
-            )
-            
-            # 记录API请求结束时间并打印时长
-            api_end_time = time.time()
-            print(f"API请求时长：{api_end_time - api_start_time:.2f}秒")
-            
-            return ([response.choices[0].message.content],)
+            request_params = {
+                "model": vision_model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "top_p": top_p,
+                "thinking": thinking_param
+            }
+
+            def request():
+                # 同一次执行的所有请求共用一个并发上限；流式模式下向界面推送进度并记录首token时间
+                with config.get('request_limiter') or nullcontext():
+                    return run_completion(client, request_params, config, vision_model)
+
+            # 缓存键包含消息中图片/视频的 base64 数据，相同内容的重复请求直接返回缓存结果
+            text = cached_response(request_params, request, config.get('response_cache', True), config.get('cache_ttl_hours', 168), config.get('base_url', ''))
+            return ([text],)
         except Exception as e:
+            if is_interrupt(e):
+                raise
             return ([f"API调用失败: {str(e)}"],)
     
     def process_image_file(self, client, file_path, prompt):
@@ -86,38 +91,49 @@ class VisionProcessor:
     def process_image_tensor(self, client, image_tensor, prompt):
         """处理图片张量（支持批量处理）"""
         tensor_shape = image_tensor.shape
-        results = []
         
         # 处理4D张量 (batch_size, height, width, channels)
         if len(tensor_shape) == 4:
             batch_size = tensor_shape[0]
-            for i in range(batch_size):
-                # 提取单个批次的图片张量
-                single_tensor = image_tensor[i]
+            # 先并行编码整个批次（缩小到最大边长并压缩到大小预算内）
+            start_time = time.time()
+            try:
+                data_urls = self.image_tensor_to_data_urls(image_tensor)
+            except Exception as e:
+                return ([f"处理图片批次失败: {str(e)}"],)
+            print(f"图片编码时长：{time.time() - start_time:.2f}秒（{batch_size}张）")
+
+            def analyze_frame(i):
+                # 单张失败只影响该张的结果
                 try:
-                    base64_str = self.image_tensor_to_base64(single_tensor)
                     content = [
                         {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_str}"}}
+                        {"type": "image_url", "image_url": {"url": data_urls[i]}}
                     ]
-                    # 调用API并获取结果
-                    result = self.call_vision_api(client, content)
-                    results.append(result[0])
+                    return self.call_vision_api(client, content)[0][0]
                 except Exception as e:
-                    results.append(f"处理图片批次{i}失败: {str(e)}")
-            # 返回批量结果
+                    if is_interrupt(e):
+                        raise
+                    return f"处理图片批次{i}失败: {str(e)}"
+
+            # 多张图片同时请求，结果保持输入顺序
+            start_time = time.time()
+            results = run_io_tasks(analyze_frame, range(batch_size), self.current_config.get('concurrency', 4))
+            print(f"批量分析时长：{time.time() - start_time:.2f}秒（{batch_size}张）")
             return (results,)
         
         # 处理3D张量 (height, width, channels)
         elif len(tensor_shape) == 3:
             try:
-                base64_str = self.image_tensor_to_base64(image_tensor)
+                data_url = self.image_tensor_to_data_urls(image_tensor)[0]
                 content = [
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_str}"}}
+                    {"type": "image_url", "image_url": {"url": data_url}}
                 ]
                 return self.call_vision_api(client, content)
             except Exception as e:
+                if is_interrupt(e):
+                    raise
                 return (f"处理图片失败: {str(e)}",)
         else:
             return (f"不支持的张量维度: {tensor_shape}",)
@@ -197,22 +213,18 @@ class VisionProcessor:
             {"type": "video_url", "video_url": {"url": f"data:video/mp4;base64,{video_base}"}}  # 使用视频方式发送
         ]
         return self.call_vision_api(client, content)
-    def image_tensor_to_base64(self, image_tensor):
-        """将ComfyUI的IMAGE张量转换为base64"""
-        # 获取张量的维度
+    def image_tensor_to_data_urls(self, image_tensor):
+        """
+        将ComfyUI的IMAGE张量（3D或4D）逐帧编码为 base64 data URL 列表
+        按配置缩小到最大边长，并选择 JPEG/WebP 质量使每张图片不超过大小预算
+        """
         tensor_shape = image_tensor.shape
-        
-        # 处理4D张量 (batch_size, height, width, channels) -> (height, width, channels)
-        if len(tensor_shape) == 4:
-            # 取第一个批次
-            image_tensor = image_tensor[0]
-        
-        # 处理3D张量 (height, width, channels)
-        if len(image_tensor.shape) == 3:
-            image_tensor = (image_tensor * 255).byte()
-            pil_image = Image.fromarray(image_tensor.cpu().numpy(), mode='RGB')
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format="PNG")
-            return base64.b64encode(buffer.getvalue()).decode('utf-8')
-        else:
-            raise ValueError(f"不支持的张量维度: {tensor_shape}")
\ No newline at end of file
+        if len(tensor_shape) not in (3, 4):
+            raise ValueError(f"不支持的张量维度: {tensor_shape}")
+        config = self.current_config
+        return tensor_batch_to_base64(
+            image_tensor,
+            max_size_mb=config.get('image_max_mb', 4.0),
+            max_px=config.get('image_max_px', 2048),
+            image_format=config.get('image_format', 'jpeg'),
+        )
\ No newline at end of file
@@ -1,10 +1,13 @@
 ﻿import os
 import folder_paths
-from typing import Tuple
 import torch
-from PIL import Image
 import numpy as np
+from typing import Tuple
+from PIL import Image
 from ...utils.constants.constants import any_type
+from ...utils.image.image_utils import process_image_for_comfy
+from ...utils.image.decode_planner import plan_decode
+from ...utils.image.decode_cache import file_cache_key, decoded_image_cache
 
 # 尝试导入 ComfyUI 的标准 VIDEO 类型
 try:
@@ -34,6 +37,9 @@ class FileUploaderBen:
         return {
             "required": {
                 "file": ("STRING", {"default": "", "multiline": False}),
+            },
+            "optional": {
+                "max_side": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8, "tooltip": "图片最长边上限，超过时在解码阶段直接缩小（JPEG按1/2、1/4、1/8解码）；0表示保持原图尺寸"}),
             }
         }
     
@@ -43,7 +49,7 @@ class FileUploaderBen:
     CATEGORY = "BenNodes/文件"
     OUTPUT_NODE = False
 
-    def upload_file(self, file: str):
+    def upload_file(self, file: str, max_side: int = 0):
         if not file:
             raise ValueError("请选择文件")
         
@@ -58,10 +64,29 @@ class FileUploaderBen:
         
         if file_ext in self.IMAGE_EXTENSIONS:
             try:
-                img = Image.open(file_path).convert("RGB")
-                img_np = np.array(img).astype(np.float32) / 255.0
+                img = Image.open(file_path)
+                cache_key = file_cache_key(file_path)
+                if max_side > 0 and max(img.size) > max_side:
+                    # 按最长边等比缩小，解码阶段先按整数倍缩小再做最终重采样
+                    # 与原尺寸输出一致：只取第一帧、不按EXIF旋转、丢弃alpha
+                    decode_plan = plan_decode(img, "contain", max_side, max_side, cache_key=cache_key, exif_transpose=False)
+                    img_tensor, _, w, h = process_image_for_comfy(
+                        img, "contain", max_side, max_side, decode_plan=decode_plan,
+                        frame_count=1, keep_alpha=False, cache_key=cache_key, exif_transpose=False
+                    )
+                    print(f"已加载图片: {file_path} (大小: {file_size} 字节, 尺寸: {img.size} -> {(w, h)})")
+                    return (img_tensor,)
+                # 原尺寸输出：直接 convert("RGB")，转换结果与其他节点共用解码缓存
+                frame_key = (cache_key, "convert_rgb")
+                cached = decoded_image_cache.get(frame_key)
+                if cached is not None:
+                    rgb = cached[0]
+                else:
+                    rgb = img.convert("RGB")
+                    decoded_image_cache.put(frame_key, rgb, False)
+                img_np = np.array(rgb).astype(np.float32) / 255.0
                 img_tensor = torch.from_numpy(img_np)[None,]
-                print(f"已加载图片: {file_path} (大小: {file_size} 字节, 尺寸: {img.size})")
+                print(f"已加载图片: {file_path} (大小: {file_size} 字节, 尺寸: {rgb.size})")
                 return (img_tensor,)
             except Exception as e:
                 raise ValueError(f"图片加载失败: {e}")
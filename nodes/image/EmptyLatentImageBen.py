@@ -1,10 +1,7 @@
-import torch
 from ...utils.base.base_node import BaseResolutionNode
+from ...utils.image.latent_factory import LATENT_LAYOUTS, create_empty_latent, resolve_latent_layout
 
 class EmptyLatentImageBen(BaseResolutionNode):
-    def __init__(self):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
     @classmethod
     def INPUT_TYPES(cls):
         """定义输入参数"""
@@ -17,6 +14,10 @@ class EmptyLatentImageBen(BaseResolutionNode):
                 "batch_size": ("INT", {"default": 1, "min": 1, "max": 4096}),
             },
             "optional": {
+                "latent_layout": (list(LATENT_LAYOUTS.keys()), {"default": "4ch (SD1.5/SDXL)", "tooltip": "Latent 通道布局，选择自定义时使用下面的通道数和下采样倍数"}),
+                "channels": ("INT", {"default": 4, "min": 1, "max": 256, "tooltip": "自定义通道数"}),
+                "downscale_ratio": ("INT", {"default": 8, "min": 1, "max": 64, "tooltip": "自定义空间下采样倍数"}),
+                "expand": ("BOOLEAN", {"default": False, "tooltip": "只分配一个样本，批次维度为零步长视图，大批次几乎不占内存；下游节点需要原地修改Latent时请关闭"}),
             }
         }
     
@@ -29,7 +30,9 @@ class EmptyLatentImageBen(BaseResolutionNode):
 
     # 继承基类的calculate_dimensions 方法，无需重写
 
-    def generate(self, resolution, aspect_ratio, width, height, batch_size=1):
+    def generate(self, resolution, aspect_ratio, width, height, batch_size=1, latent_layout="4ch (SD1.5/SDXL)", channels=4, downscale_ratio=8, expand=False):
         calc_width, calc_height = self.calculate_dimensions(resolution, aspect_ratio, width, height)
-        latent = torch.zeros([batch_size, 4, calc_height // 8, calc_width // 8], device=self.device)
+        # 执行时才在中间设备上分配，节点构造时不占用显存
+        latent_channels, ratio = resolve_latent_layout(latent_layout, channels, downscale_ratio)
+        latent = create_empty_latent(batch_size, calc_width, calc_height, latent_channels, ratio, expand)
         return ({"samples": latent},)
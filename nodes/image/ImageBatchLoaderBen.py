@@ -1,13 +1,51 @@
 import os
+import math
 import torch
 import numpy as np
+import psutil
 from PIL import Image
 from ...utils.base.base_node import BaseResolutionNode
 import folder_paths
 from typing import List, Tuple
-import concurrent.futures
-import multiprocessing
-from ...utils.image.image_utils import process_image_for_comfy
+from ...utils.image.image_utils import ImageScaleUtils, feather_mask_cache, process_image_for_comfy, select_frame_indices
+from ...utils.image.decode_planner import plan_decode
+from ...utils.image.image_manifest import get_folder_manifest, oriented_size, stat_key
+from ...utils.image.decode_cache import file_cache_key
+from ...utils.image.tensor_cache import get_tensor_cache, make_cache_key
+from ...utils.system.executor import get_executor, log_executor_stats
+from ...utils.file.directory_index import directory_index
+
+# 每帧输出：float32 的 3 通道图片 + 1 通道遮罩
+OUTPUT_BYTES_PER_PIXEL = (3 + 1) * 4
+
+
+def _load_image_into_buffer(img_path, resize_mode, target_width, target_height, feathering, upscale_method, position, out_image, out_mask, frame_start, frame_stride, tensor_cache_entry=None):
+    """
+    解码并缩放一个文件，结果直接写入输出缓冲区中自己的位置，返回写入的帧数
+    tensor_cache_entry 为 (缓存键, 校正方向后的原图尺寸) 时优先从磁盘张量缓存读取
+    """
+    if tensor_cache_entry is not None:
+        tensor_key, source_size = tensor_cache_entry
+        if get_tensor_cache().load_into(tensor_key, out_image):
+            # 不读取 alpha 时遮罩只取决于缩放布局，按布局重建即可与解码结果完全一致
+            layout = ImageScaleUtils.compute_layout(resize_mode, source_size[0], source_size[1], target_width, target_height, position)
+            out_mask.copy_(feather_mask_cache.get(resize_mode, layout, feathering).expand_as(out_mask))
+            return out_image.shape[0]
+
+    img = Image.open(img_path)
+    # 先规划解码尺寸再加载像素（JPEG可直接以缩小尺寸解码）
+    cache_key = file_cache_key(img_path)
+    decode_plan = plan_decode(img, resize_mode, target_width, target_height, position, cache_key)
+    img_tensor, _, _, _ = process_image_for_comfy(
+        img, resize_mode, target_width, target_height, feathering, upscale_method, position,
+        decode_plan=decode_plan, out_image=out_image, out_mask=out_mask,
+        frame_start=frame_start, frame_count=out_image.shape[0], frame_stride=frame_stride,
+        keep_alpha=False, cache_key=cache_key
+    )
+    if tensor_cache_entry is not None and img_tensor.shape[0] == out_image.shape[0]:
+        get_tensor_cache().store(tensor_cache_entry[0], img_tensor)
+    return img_tensor.shape[0]
+
 
 class ImageLoaderBatchBen(BaseResolutionNode):
     """图片加载批次节点"""
@@ -16,20 +54,31 @@ class ImageLoaderBatchBen(BaseResolutionNode):
     def INPUT_TYPES(cls):
         """定义输入参数"""
         input_dir = folder_paths.get_input_directory()
-        input_folders = [f for f in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, f))]
+        input_folders = directory_index.dirs(input_dir)
         
         return {
             "required": {
-                "resize_mode": (cls.SCALE_MODES, {"default": "none"}),
+                "resize_mode": (cls.SCALE_MODES + ["bucket"], {"default": "none", "tooltip": "bucket: 按宽高比把图片分到 ASPECT_RATIOS 中最接近的比例，每个分桶输出一个批次（列表输出），分桶像素数不超过分辨率设置"}),
                 "position": (cls.SCALE_POSITIONS, {"default": "center"}),
                 "resolution": (list(cls.RESOLUTIONS.keys()), {"default": "720p"}),
                 "aspect_ratio": (list(cls.ASPECT_RATIOS.keys()), {"default": "16:9"}),
                 "width": ("INT", {"default": 1080, "min": 16, "max": 32768, "step": 8}),
                 "height": ("INT", {"default": 720, "min": 16, "max": 32768, "step": 8}),
-                "folder_path": (sorted(input_folders), {"default": "", "label": "文件夹路径"}),
+                "folder_path": (input_folders, {"default": "", "label": "文件夹路径"}),
                 "feathering": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1}),
                 "upscale_method": (cls.UPSCALE_METHODS, {"default": "bicubic"}),
             },
+            "optional": {
+                "frame_start": ("INT", {"default": 0, "min": 0, "max": 100000, "step": 1, "tooltip": "动图（GIF/WebP/APNG）从第几帧开始读取"}),
+                "frame_count": ("INT", {"default": 1, "min": 0, "max": 100000, "step": 1, "tooltip": "每个文件读取的帧数，0表示读取到最后一帧，默认只读取第一帧"}),
+                "frame_stride": ("INT", {"default": 1, "min": 1, "max": 1000, "step": 1, "tooltip": "每隔几帧读取一帧"}),
+                "start_index": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "tooltip": "从排序后的第几个文件开始加载（用于分页）"}),
+                "max_images": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "tooltip": "本次最多加载的文件数，0表示加载到最后"}),
+                "sample_n": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "tooltip": "在窗口内均匀抽取的文件数，0表示不抽样"}),
+                "memory_budget_mb": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 64, "tooltip": "输出批次的内存上限（MB），0表示不限制（预估超出当前可用内存时只打印警告）"}),
+                "over_budget": (["error", "shrink"], {"default": "error", "tooltip": "预估内存超出预算时：error 拒绝加载；shrink 只加载预算内的前几个文件并打印警告"}),
+                "disk_cache": ("BOOLEAN", {"default": False, "tooltip": "把缩放后的图片缓存到磁盘（.npy），相同文件和缩放参数再次加载时直接内存映射读取，服务器重启后仍有效"}),
+            },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
             }
@@ -37,24 +86,68 @@ class ImageLoaderBatchBen(BaseResolutionNode):
     
     RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT", "STRING")
     RETURN_NAMES = ("图片", "遮罩", "宽度", "高度", "文件名")
+    # 列表输出：bucket 模式每个分桶一项，其他模式只有一项
+    OUTPUT_IS_LIST = (True, True, True, True, True)
     FUNCTION = "load_and_process_images"
     CATEGORY = "BenNodes/图像"
 
-    def _process_image_task(self, img_path: str, resize_mode: str, target_width: int, target_height: int, feathering: int, upscale_method: str, position: str = "center"):
+    def _process_image_task(self, img_path: str, resize_mode: str, target_width: int, target_height: int, feathering: int, upscale_method: str, position: str = "center", out_image=None, out_mask=None, frame_start: int = 0, frame_stride: int = 1, tensor_cache_entry=None) -> int:
         """
-        处理单张图像的任务函数（用于多线程）
+        处理单张图像的任务函数（用于多线程），结果直接写入批次缓冲区中自己的位置
+        返回实际写入的帧数，失败时返回0
         """
         try:
-            img = Image.open(img_path).convert("RGB")
-            img_tensor, mask_tensor, _, _ = process_image_for_comfy(
-                img, resize_mode, target_width, target_height, feathering, upscale_method, position
-            )
-            return img_tensor[0], mask_tensor[0]
+            return _load_image_into_buffer(img_path, resize_mode, target_width, target_height, feathering, upscale_method, position, out_image, out_mask, frame_start, frame_stride, tensor_cache_entry)
         except Exception as e:
             print(f"Error processing {img_path}: {e}")
-            return None, None
+            return 0
+
+    def _get_output_size(self, image_infos, resize_mode: str, target_width: int, target_height: int, position: str = "center") -> Tuple[int, int]:
+        """按清单中第一张图片的缩放布局计算输出尺寸"""
+        source_width, source_height = oriented_size(image_infos[0])
+        layout = ImageScaleUtils.compute_layout(resize_mode, source_width, source_height, target_width, target_height, position)
+        return layout.canvas_size
     
-    def load_and_process_images(self, resize_mode, position, resolution, aspect_ratio, width, height, folder_path="", feathering=0, upscale_method="bicubic", unique_id=None):
+    def _select_window(self, image_paths: List[str], start_index: int, max_images: int, sample_n: int) -> List[str]:
+        """按起始位置和数量截取文件窗口，再在窗口内均匀抽样（确定性，便于复现）"""
+        window = image_paths[start_index:]
+        if max_images > 0:
+            window = window[:max_images]
+        if 0 < sample_n < len(window):
+            step = len(window) / sample_n
+            window = [window[int(i * step)] for i in range(sample_n)]
+        return window
+
+    def _fit_memory_budget(self, file_bytes: List[int], memory_budget_mb: int, over_budget: str) -> int:
+        """
+        按每个文件的 帧数×H×W×(3+1)×4 字节预估输出大小，返回预算内能加载的文件数
+        memory_budget_mb 为0时不限制，全部加载；over_budget 为 "error" 时超出预算直接报错
+        """
+        total_bytes = sum(file_bytes)
+        if memory_budget_mb <= 0:
+            available = psutil.virtual_memory().available
+            if total_bytes > available:
+                print(f"⚠ 预计需要 {total_bytes / 1024 ** 2:.0f}MB 内存，超出当前可用内存 {available / 1024 ** 2:.0f}MB，可设置 memory_budget_mb 或分页加载")
+            return len(file_bytes)
+        budget_bytes = memory_budget_mb * 1024 * 1024
+        if total_bytes <= budget_bytes:
+            return len(file_bytes)
+        message = f"预计需要 {total_bytes / 1024 ** 2:.0f}MB 内存，超出预算 {budget_bytes / 1024 ** 2:.0f}MB"
+        if over_budget == "error":
+            raise ValueError(f"{message}，请减小 max_images 或分页加载")
+        used_bytes = 0
+        for file_count, size in enumerate(file_bytes):
+            if used_bytes + size > budget_bytes:
+                break
+            used_bytes += size
+        else:
+            file_count = len(file_bytes)
+        if file_count == 0:
+            raise ValueError(f"{message}，单个文件已超出预算")
+        print(f"⚠ {message}，只加载前 {file_count} 个文件（共 {len(file_bytes)} 个）")
+        return file_count
+
+    def load_and_process_images(self, resize_mode, position, resolution, aspect_ratio, width, height, folder_path="", feathering=0, upscale_method="bicubic", unique_id=None, frame_start=0, frame_count=1, frame_stride=1, start_index=0, max_images=0, sample_n=0, memory_budget_mb=0, over_budget="error", disk_cache=False):
         """加载并处理图片（支持多线程处理）"""
         if not folder_path:
             raise ValueError("请选择要加载的文件夹")
@@ -66,18 +159,33 @@ class ImageLoaderBatchBen(BaseResolutionNode):
             raise ValueError(f"文件夹不存在: {full_folder_path}")
         
         # 获取文件夹中的所有图片文件
-        image_paths = [os.path.join(full_folder_path, f) for f in os.listdir(full_folder_path) 
-                      if os.path.isfile(os.path.join(full_folder_path, f)) 
-                      and f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.bmp'))]
+        folder_files = directory_index.files(full_folder_path)
+        image_names = [f for f in folder_files if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.bmp'))]
         
-        if not image_paths:
+        if not image_names:
             raise ValueError(f"文件夹中没有找到图片文件: {full_folder_path}")
         
+        # 只处理窗口内的文件，窗口外的文件不读取
+        folder_total = len(image_names)
+        image_names = self._select_window(image_names, start_index, max_images, sample_n)
+        if not image_names:
+            raise ValueError(f"起始位置 {start_index} 超出范围（共 {folder_total} 个图片文件）")
+        
+        # 从文件夹清单获取尺寸、帧数等信息（只有新增或修改过的文件才读取文件头），跳过无法识别的文件
+        image_infos = []
+        for info in get_folder_manifest(full_folder_path).refresh(image_names, folder_files):
+            if info.error is not None:
+                print(f"Error reading {os.path.join(full_folder_path, info.name)}: {info.error}")
+            else:
+                image_infos.append(info)
+        if not image_infos:
+            raise ValueError("未能成功加载任何图片")
+        image_paths = [os.path.join(full_folder_path, info.name) for info in image_infos]
+        
         # 计算目标分辨率
         if resize_mode == "none":
             # 不进行缩放，使用第一张图片的尺寸作为参考
-            first_img = Image.open(image_paths[0]).convert("RGB")
-            target_width, target_height = first_img.size
+            target_width, target_height = image_infos[0].width, image_infos[0].height
         else:
             target_width, target_height = self.calculate_dimensions(resolution, aspect_ratio, width, height)
         
@@ -87,53 +195,154 @@ class ImageLoaderBatchBen(BaseResolutionNode):
             resize_mode = "pad"
             print(f"多张图片加载时自动使用{resize_mode} 模式确保尺寸一致")
         
-        processed_images = []
-        processed_masks = []
-        image_names = []
+        # 每个文件按帧选择参数输出的帧数
+        frames_per_file = [len(select_frame_indices(info.n_frames, frame_start, frame_count, frame_stride)) for info in image_infos]
+        if sum(frames_per_file) == 0:
+            raise ValueError("未能成功加载任何图片")
         
-        # 并行或串行处理
-        if len(image_paths) > 1:
-            cpu_count = multiprocessing.cpu_count()
-            max_workers = cpu_count
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {}
-                for img_path in image_paths:
-                    future = executor.submit(
-                        self._process_image_task, 
-                        img_path, resize_mode, target_width, target_height, feathering, upscale_method, position
-                    )
-                    futures[future] = img_path
-                
-                for future in concurrent.futures.as_completed(futures):
-                    img_path = futures[future]
-                    img_tensor, mask_tensor = future.result()
-                    if img_tensor is not None:
-                        processed_images.append(img_tensor)
-                        processed_masks.append(mask_tensor)
-                        image_names.append(os.path.basename(img_path))
+        # 分组：bucket 模式按宽高比分桶，每桶一个批次；其他模式整个窗口一个批次
+        # 每组为 (缩放模式, 目标宽, 目标高, 组内文件序号)
+        if resize_mode == "bucket":
+            groups = [
+                ("pad", bucket_width, bucket_height, members)
+                for bucket_width, bucket_height, members in self._assign_buckets(image_infos, target_width * target_height)
+            ]
         else:
-            for img_path in image_paths:
-                img_tensor, mask_tensor = self._process_image_task(img_path, resize_mode, target_width, target_height, feathering, upscale_method, position)
-                if img_tensor is not None:
-                    processed_images.append(img_tensor)
-                    processed_masks.append(mask_tensor)
-                    image_names.append(os.path.basename(img_path))
-        
-        if not processed_images:
+            groups = [(resize_mode, target_width, target_height, list(range(len(image_infos))))]
+        
+        # 先确定每组的输出尺寸，预估内存并按预算确定实际加载的文件（按窗口顺序截断）
+        output_sizes = [
+            self._get_output_size([image_infos[i] for i in members], mode, group_width, group_height, position)
+            for mode, group_width, group_height, members in groups
+        ]
+        file_bytes = [0] * len(image_infos)
+        for (_, _, _, members), (out_width, out_height) in zip(groups, output_sizes):
+            for i in members:
+                file_bytes[i] = frames_per_file[i] * out_width * out_height * OUTPUT_BYTES_PER_PIXEL
+        file_count = self._fit_memory_budget(file_bytes, memory_budget_mb, over_budget)
+        print(f"加载第 {start_index} 起的 {file_count} 个文件（文件夹共 {folder_total} 个）")
+        
+        images_list, masks_list, width_list, height_list, names_list = [], [], [], [], []
+        for (mode, group_width, group_height, members), (out_width, out_height) in zip(groups, output_sizes):
+            members = [i for i in members if i < file_count]
+            if not members:
+                continue
+            if resize_mode == "bucket":
+                self._report_bucket_waste([image_infos[i] for i in members], [frames_per_file[i] for i in members], out_width, out_height, position)
+            try:
+                images_tensor, masks_tensor, group_names = self._load_group(
+                    [image_infos[i] for i in members], [image_paths[i] for i in members], [frames_per_file[i] for i in members],
+                    mode, group_width, group_height, out_width, out_height, feathering, upscale_method, position,
+                    frame_start, frame_stride, disk_cache
+                )
+            except ValueError as e:
+                # 分桶时某一桶全部失败不影响其他桶
+                if len(groups) > 1:
+                    print(f"跳过 {out_width}x{out_height} 分桶: {e}")
+                    continue
+                raise
+            images_list.append(images_tensor)
+            masks_list.append(masks_tensor)
+            width_list.append(out_width)
+            height_list.append(out_height)
+            names_list.append(group_names)
+        if disk_cache:
+            get_tensor_cache().trim()
+        if not images_list:
             raise ValueError("未能成功加载任何图片")
+        
+        # 返回处理后的图片、遮罩和尺寸信息，以及文件名列表（列表输出：每个分桶一项，非分桶模式只有一项）
+        return (images_list, masks_list, width_list, height_list, names_list)
+
+    def _assign_buckets(self, image_infos, pixel_budget: int):
+        """
+        按宽高比把图片分到 ASPECT_RATIOS 中最接近的比例（对数距离），
+        每个比例的分桶尺寸在像素预算内取 8 的倍数。
+        返回 [(桶宽, 桶高, 组内文件序号)]，只包含用到的桶，按 ASPECT_RATIOS 顺序排列
+        """
+        ratios = list(self.ASPECT_RATIOS.values())
+        members_by_bucket = {}
+        for i, info in enumerate(image_infos):
+            source_width, source_height = oriented_size(info)
+            log_ratio = math.log(source_width / source_height)
+            best = min(range(len(ratios)), key=lambda k: abs(math.log(ratios[k][0] / ratios[k][1]) - log_ratio))
+            members_by_bucket.setdefault(best, []).append(i)
+        buckets = []
+        for k in sorted(members_by_bucket):
+            ratio_w, ratio_h = ratios[k]
+            bucket_width = max(8, int(math.sqrt(pixel_budget * ratio_w / ratio_h)) // 8 * 8)
+            bucket_height = max(8, int(math.sqrt(pixel_budget * ratio_h / ratio_w)) // 8 * 8)
+            buckets.append((bucket_width, bucket_height, members_by_bucket[k]))
+        return buckets
+
+    def _report_bucket_waste(self, image_infos, frames_per_file: List[int], bucket_width: int, bucket_height: int, position: str):
+        """打印分桶中填充像素所占的比例"""
+        content_pixels = 0
+        for info, frames in zip(image_infos, frames_per_file):
+            source_width, source_height = oriented_size(info)
+            layout = ImageScaleUtils.compute_layout("pad", source_width, source_height, bucket_width, bucket_height, position)
+            x0, y0, x1, y1 = layout.paste_box
+            content_pixels += (x1 - x0) * (y1 - y0) * frames
+        total_pixels = bucket_width * bucket_height * sum(frames_per_file)
+        waste = 1.0 - content_pixels / total_pixels if total_pixels else 0.0
+        print(f"分桶 {bucket_width}x{bucket_height}: {len(image_infos)} 个文件, 填充像素占 {waste:.1%}")
 
-        # 转换为torch张量
-        images_tensor = torch.stack(processed_images)
-        masks_tensor = torch.stack(processed_masks)
+    def _load_group(self, image_infos, image_paths: List[str], frames_per_file: List[int], resize_mode: str, target_width: int, target_height: int, final_width: int, final_height: int, feathering: int, upscale_method: str, position: str, frame_start: int, frame_stride: int, disk_cache: bool):
+        """把一组同尺寸输出的文件解码到一个批次，返回 (图片, 遮罩, 文件名列表)"""
+        offsets = [0]
+        for count in frames_per_file:
+            offsets.append(offsets[-1] + count)
+        total_count = offsets[-1]
         
-        # 获取最终的宽度和高度
-        final_width = processed_images[0].shape[1] # H, W, C -> [1] is Width? 
-        # Wait, PyTorch tensor. shape is [H, W, C]. shape[0] is H, shape[1] is W.
-        # ImgLoaderSingle output was [1, H, W, C].
-        # In _process_image_task I took [0], so it is [H, W, C].
-        # So shape[0] is H, shape[1] is W.
+        # 一次性分配整批图片和遮罩，各任务直接写入自己的位置
+        images_tensor = torch.empty((total_count, final_height, final_width, 3), dtype=torch.float32)
+        masks_tensor = torch.empty((total_count, final_height, final_width), dtype=torch.float32)
+        # 磁盘缓存键：文件 stat 标识 + 影响像素的全部参数（羽化只影响遮罩，遮罩按布局重建）
+        tensor_cache_entries = [None] * len(image_infos)
+        if disk_cache:
+            tensor_cache_entries = [
+                (make_cache_key(stat_key(image_paths[i], info), resize_mode, target_width, target_height, position, upscale_method,
+                                final_width, final_height, frame_start, frame_stride, frames_per_file[i]),
+                 oriented_size(info))
+                for i, info in enumerate(image_infos)
+            ]
+        tasks = [
+            (img_path, offsets[i], frames_per_file[i], tensor_cache_entries[i])
+            for i, img_path in enumerate(image_paths) if frames_per_file[i] > 0
+        ]
+        
+        # 并行或串行处理（使用常驻的共享线程池）
+        if len(tasks) > 1:
+            executor = get_executor()
+            futures = [
+                executor.submit(
+                    self._process_image_task,
+                    img_path, resize_mode, target_width, target_height, feathering, upscale_method, position,
+                    images_tensor[offset:offset + count], masks_tensor[offset:offset + count], frame_start, frame_stride, cache_entry
+                )
+                for img_path, offset, count, cache_entry in tasks
+            ]
+            # 按文件顺序收集结果
+            written = [future.result() for future in futures]
+            log_executor_stats()
+        else:
+            written = [
+                self._process_image_task(img_path, resize_mode, target_width, target_height, feathering, upscale_method, position, images_tensor[offset:offset + count], masks_tensor[offset:offset + count], frame_start, frame_stride, cache_entry)
+                for img_path, offset, count, cache_entry in tasks
+            ]
+        
+        loaded_indices = []
+        image_names = []
+        for (img_path, offset, _, _), frame_total in zip(tasks, written):
+            loaded_indices.extend(range(offset, offset + frame_total))
+            image_names.extend([os.path.basename(img_path)] * frame_total)
+        if not loaded_indices:
+            raise ValueError("未能成功加载任何图片")
         
-        final_width, final_height = processed_images[0].shape[1], processed_images[0].shape[0]
+        # 只有存在失败的图片时才需要压缩缓冲区
+        if len(loaded_indices) < total_count:
+            index_tensor = torch.tensor(loaded_indices, dtype=torch.long)
+            images_tensor = images_tensor.index_select(0, index_tensor)
+            masks_tensor = masks_tensor.index_select(0, index_tensor)
         
-        # 返回处理后的图片、遮罩和尺寸信息，以及文件名列表
-        return (images_tensor, masks_tensor, final_width, final_height, image_names)
\ No newline at end of file
+        return images_tensor, masks_tensor, image_names
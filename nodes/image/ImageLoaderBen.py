@@ -7,16 +7,23 @@ import folder_paths
 import node_helpers
 from ...utils.base.base_node import BaseResolutionNode
 from ...utils.image.image_utils import process_image_for_comfy
+from ...utils.image.decode_planner import plan_decode
+from ...utils.image.decode_cache import file_cache_key
+from ...utils.file.fingerprint import file_fingerprint
+from ...utils.file.directory_index import directory_index
 
 class LoadImageBen(BaseResolutionNode):
     @classmethod
     def INPUT_TYPES(s):
         input_dir = folder_paths.get_input_directory()
-        files = [f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))]
-        files = folder_paths.filter_files_content_types(files, ["image"])
+        # 目录列表和图片过滤结果按目录 mtime 缓存
+        files = directory_index.derived(
+            input_dir, "image_files",
+            lambda listing: sorted(folder_paths.filter_files_content_types(listing.files, ["image"]))
+        )
         return {
             "required": {
-                "image": (sorted(files), {"image_upload": True}),
+                "image": (files, {"image_upload": True}),
                 "resize_mode": (s.SCALE_MODES, {"default": "none"}),
                 "position": (s.SCALE_POSITIONS, {"default": "center"}),
                 "resolution": (list(s.RESOLUTIONS.keys()), {"default": "720p"}),
@@ -25,6 +32,11 @@ class LoadImageBen(BaseResolutionNode):
                 "height": ("INT", {"default": 720, "min": 16, "max": 32768, "step": 8}),
                 "feathering": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1}),
                 "upscale_method": (s.UPSCALE_METHODS, {"default": "bicubic"}),
+            },
+            "optional": {
+                "frame_start": ("INT", {"default": 0, "min": 0, "max": 100000, "step": 1, "tooltip": "动图（GIF/WebP/APNG）从第几帧开始读取"}),
+                "frame_count": ("INT", {"default": 0, "min": 0, "max": 100000, "step": 1, "tooltip": "读取的帧数，0表示读取到最后一帧"}),
+                "frame_stride": ("INT", {"default": 1, "min": 1, "max": 1000, "step": 1, "tooltip": "每隔几帧读取一帧"}),
             }
         }
 
@@ -35,7 +47,7 @@ class LoadImageBen(BaseResolutionNode):
     RETURN_NAMES = ("图片", "遮罩", "宽度", "高度", "文件名")
     FUNCTION = "load_image"
     
-    def load_image(self, image, resize_mode, position, resolution, aspect_ratio, width, height, feathering=0, upscale_method="bicubic"):
+    def load_image(self, image, resize_mode, position, resolution, aspect_ratio, width, height, feathering=0, upscale_method="bicubic", frame_start=0, frame_count=0, frame_stride=1):
         image_path = folder_paths.get_annotated_filepath(image)
 
         # 计算目标分辨率
@@ -47,9 +59,15 @@ class LoadImageBen(BaseResolutionNode):
 
         img = node_helpers.pillow(Image.open, image_path)
 
-        # 使用公共工具处理图像
+        # 目标尺寸远小于原图时在解码阶段直接缩小
+        cache_key = file_cache_key(image_path)
+        decode_plan = plan_decode(img, resize_mode, target_width, target_height, position, cache_key)
+
+        # 使用公共工具处理图像（动图只解码选中的帧；只改缩放参数时直接使用缓存的解码结果）
         output_image, output_mask, w, h = process_image_for_comfy(
-            img, resize_mode, target_width, target_height, feathering, upscale_method, position
+            img, resize_mode, target_width, target_height, feathering, upscale_method, position, decode_plan=decode_plan,
+            frame_start=frame_start, frame_count=frame_count, frame_stride=frame_stride,
+            cache_key=cache_key
         )
 
         # 提取文件名（不含路径）
@@ -57,11 +75,11 @@ class LoadImageBen(BaseResolutionNode):
         return (output_image, output_mask, w, h, filename)
 
     @classmethod
-    def IS_CHANGED(s, image, resize_mode=None, position=None, resolution=None, aspect_ratio=None, width=None, height=None, feathering=None, upscale_method=None):
+    def IS_CHANGED(s, image, resize_mode=None, position=None, resolution=None, aspect_ratio=None, width=None, height=None, feathering=None, upscale_method=None, frame_start=None, frame_count=None, frame_stride=None):
         image_path = folder_paths.get_annotated_filepath(image)
         m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
+        # 文件内容摘要按 stat 记忆，文件未变化时不再整文件读取
+        m.update(file_fingerprint(image_path).encode('utf-8'))
         # 加入所有可能影响输出的参数
         m.update(str(resize_mode).encode('utf-8'))
         m.update(str(position).encode('utf-8'))
@@ -71,10 +89,13 @@ class LoadImageBen(BaseResolutionNode):
         m.update(str(height).encode('utf-8'))
         m.update(str(feathering).encode('utf-8'))
         m.update(str(upscale_method).encode('utf-8'))
+        m.update(str(frame_start).encode('utf-8'))
+        m.update(str(frame_count).encode('utf-8'))
+        m.update(str(frame_stride).encode('utf-8'))
         return m.digest().hex()
 
     @classmethod
-    def VALIDATE_INPUTS(s, image, resize_mode=None, position=None, resolution=None, aspect_ratio=None, width=None, height=None, feathering=None, upscale_method=None):
+    def VALIDATE_INPUTS(s, image, resize_mode=None, position=None, resolution=None, aspect_ratio=None, width=None, height=None, feathering=None, upscale_method=None, frame_start=None, frame_count=None, frame_stride=None):
         if not folder_paths.exists_annotated_filepath(image):
             return "Invalid image file: {}".format(image)
 
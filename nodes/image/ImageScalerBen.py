@@ -3,10 +3,10 @@ import torch
 import numpy as np
 from PIL import Image
 from ...utils.base.base_node import BaseResolutionNode
-import concurrent.futures
-import multiprocessing
 from typing import List, Tuple
-from ...utils.image.image_utils import process_image_for_comfy
+from ...utils.image.image_utils import ImageScaleUtils, process_image_for_comfy
+from ...utils.image.tensor_scaler import scale_image_batch, supports_tensor_engine
+from ...utils.system.executor import get_executor
 
 class ImageScalerBen(BaseResolutionNode):
     # 使用继承自BaseResolutionNode的SCALE_MODES常量
@@ -25,6 +25,9 @@ class ImageScalerBen(BaseResolutionNode):
                 "upscale_method": (s.UPSCALE_METHODS, {"default": "bicubic"}),
                 "pad_color": ("STRING", {"default": "127,127,127", "placeholder": "R,G,B (例如: 255,0,0)"}),
             },
+            "optional": {
+                "resize_engine": (["torch", "pil"], {"default": "torch", "tooltip": "torch: 整批张量缩放，不经过PIL转换；pil: 逐帧PIL缩放。lanczos插值和带alpha通道的图像始终使用pil"}),
+            },
             "hidden": {
                 "node_id": "UNIQUE_ID",
             }
@@ -38,71 +41,85 @@ class ImageScalerBen(BaseResolutionNode):
 
     # 继承基类的calculate_dimensions 方法，无需重写
 
-    def _process_single_pil_image(self, pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position="center", pad_color=(127, 127, 127)):
-        """处理单张PIL图像"""
+    def _process_single_pil_image(self, pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position="center", pad_color=(127, 127, 127), out_image=None, out_mask=None):
+        """处理单张PIL图像，结果直接写入预分配的输出切片"""
         try:
-            img_tensor, mask_tensor, fw, fh = process_image_for_comfy(
-                pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color
+            _, _, fw, fh = process_image_for_comfy(
+                pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color,
+                out_image=out_image, out_mask=out_mask
             )
-            return img_tensor[0], mask_tensor[0], fw, fh
+            return fw, fh
         except Exception as e:
             print(f"Error processing image in scaler: {e}")
-            return torch.zeros((target_height, target_width, 3)), torch.zeros((target_height, target_width)), target_width, target_height
+            out_image.zero_()
+            out_mask.zero_()
+            return target_width, target_height
 
-    def process(self, image, resolution, aspect_ratio, width, height, resize_mode, position, feathering, upscale_method="bicubic", node_id=None, pad_color="127,127,127"):
-        target_width, target_height = self.calculate_dimensions(resolution, aspect_ratio, width, height)
-        batch_size = image.shape[0]
-        result_images = []
-        result_masks = []
+    def _process_with_pil(self, image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color_tuple):
+        """逐帧PIL缩放路径"""
+        batch_size, img_height, img_width = image.shape[0], image.shape[1], image.shape[2]
         final_width = target_width
         final_height = target_height
-        
-        # 解析pad_color参数 (格式: "R,G,B")
-        try:
-            color_parts = pad_color.split(",")
-            if len(color_parts) == 3:
-                pad_color_tuple = (int(color_parts[0].strip()), int(color_parts[1].strip()), int(color_parts[2].strip()))
-            else:
-                pad_color_tuple = (127, 127, 127)  # 默认灰色
-        except (ValueError, AttributeError):
-            pad_color_tuple = (127, 127, 127)  # 默认灰色
-        
+
+        # 先按布局确定输出尺寸，一次性分配整批输出，各帧直接写入自己的位置
+        layout = ImageScaleUtils.compute_layout(resize_mode, img_width, img_height, target_width, target_height, position)
+        out_width, out_height = layout.canvas_size
+        output_image = torch.empty((batch_size, out_height, out_width, 3), dtype=torch.float32)
+        output_mask = torch.empty((batch_size, out_height, out_width), dtype=torch.float32)
+
         # 批量转换为PIL图像
         # image tensor is [B, H, W, C]. Range 0..1.
         img_arrays = (image.cpu().numpy() * 255).clip(0, 255).astype(np.uint8)
         pil_images = [Image.fromarray(img_arrays[i]) for i in range(batch_size)]
         
         if batch_size > 1:
-            cpu_count = multiprocessing.cpu_count()
-            with concurrent.futures.ThreadPoolExecutor(max_workers=cpu_count) as executor:
-                results = list(executor.map(
-                    self._process_single_pil_image,
-                    pil_images,
-                    [resize_mode] * batch_size,
-                    [target_width] * batch_size,
-                    [target_height] * batch_size,
-                    [feathering] * batch_size,
-                    [upscale_method] * batch_size,
-                    [position] * batch_size,
-                    [pad_color_tuple] * batch_size
-                ))
+            results = get_executor().map(
+                self._process_single_pil_image,
+                pil_images,
+                [resize_mode] * batch_size,
+                [target_width] * batch_size,
+                [target_height] * batch_size,
+                [feathering] * batch_size,
+                [upscale_method] * batch_size,
+                [position] * batch_size,
+                [pad_color_tuple] * batch_size,
+                [output_image[i:i + 1] for i in range(batch_size)],
+                [output_mask[i:i + 1] for i in range(batch_size)]
+            )
                 
-            for i, (img_tensor, mask_tensor, fw, fh) in enumerate(results):
-                result_images.append(img_tensor)
-                result_masks.append(mask_tensor)
+            for i, (fw, fh) in enumerate(results):
                 if i == (batch_size - 1):
                     final_width, final_height = fw, fh
         else:
             for i, pil_image in enumerate(pil_images):
-                img_tensor, mask_tensor, fw, fh = self._process_single_pil_image(pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color_tuple)
-                result_images.append(img_tensor)
-                result_masks.append(mask_tensor)
+                fw, fh = self._process_single_pil_image(pil_image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color_tuple, output_image[i:i + 1], output_mask[i:i + 1])
                 if i == (batch_size - 1):
                     final_width, final_height = fw, fh
         
-        # 使用torch.stack批量合并结果
-        output_image = torch.stack(result_images, dim=0)
-        output_mask = torch.stack(result_masks, dim=0)
+        return output_image, output_mask, final_width, final_height
+
+    def process(self, image, resolution, aspect_ratio, width, height, resize_mode, position, feathering, upscale_method="bicubic", node_id=None, pad_color="127,127,127", resize_engine="torch"):
+        target_width, target_height = self.calculate_dimensions(resolution, aspect_ratio, width, height)
+        
+        # 解析pad_color参数 (格式: "R,G,B")
+        try:
+            color_parts = pad_color.split(",")
+            if len(color_parts) == 3:
+                pad_color_tuple = (int(color_parts[0].strip()), int(color_parts[1].strip()), int(color_parts[2].strip()))
+            else:
+                pad_color_tuple = (127, 127, 127)  # 默认灰色
+        except (ValueError, AttributeError):
+            pad_color_tuple = (127, 127, 127)  # 默认灰色
+        
+        if resize_engine == "torch" and supports_tensor_engine(image, upscale_method):
+            # 张量引擎：整批缩放，无需逐帧转换为PIL图像
+            output_image, output_mask, final_width, final_height = scale_image_batch(
+                image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color_tuple
+            )
+        else:
+            output_image, output_mask, final_width, final_height = self._process_with_pil(
+                image, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color_tuple
+            )
         
         return {
             "ui": {
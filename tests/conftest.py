@@ -0,0 +1,78 @@
+"""
+pytest 配置：在 ComfyUI 之外运行测试
+只在 ComfyUI 中存在的模块（folder_paths、node_helpers、server、comfy.model_management）未安装时提供最小替身，
+接口与 ComfyUI 一致；插件目录注册为 bennodes 包，单元测试通过它导入各模块，不执行插件的 __init__.py
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import types
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 替身 folder_paths 使用的输入和用户目录（磁盘缓存写在用户目录下）
+HOST_DIRECTORY = tempfile.mkdtemp(prefix="bennodes-tests-")
+
+
+def _available(name):
+    if name in sys.modules:
+        return True
+    try:
+        importlib.import_module(name)
+        return True
+    except ImportError:
+        return False
+
+
+def _install(name, **attrs):
+    if _available(name):
+        return
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+
+
+def _directory(name):
+    path = os.path.join(HOST_DIRECTORY, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _pillow(fn, arg):
+    # 与 ComfyUI 一致：只向 fn 传一个参数
+    return fn(arg)
+
+
+class InterruptProcessingException(Exception):
+    pass
+
+
+_install(
+    "folder_paths",
+    get_input_directory=lambda: _directory("input"),
+    get_output_directory=lambda: _directory("output"),
+    get_user_directory=lambda: _directory("user"),
+    get_annotated_filepath=lambda name, default_dir=None: os.path.join(default_dir or _directory("input"), name),
+    exists_annotated_filepath=lambda name: os.path.exists(os.path.join(_directory("input"), name)),
+    filter_files_content_types=lambda files, content_types: files,
+)
+_install("node_helpers", pillow=_pillow)
+_install("server", PromptServer=types.SimpleNamespace(instance=None))
+_install("comfy")
+_install(
+    "comfy.model_management",
+    InterruptProcessingException=InterruptProcessingException,
+    processing_interrupted=lambda: False,
+    intermediate_device=lambda: "cpu",
+    soft_empty_cache=lambda *args, **kwargs: None,
+    unload_all_models=lambda: None,
+)
+
+if "bennodes" not in sys.modules:
+    package = types.ModuleType("bennodes")
+    package.__path__ = [PROJECT_ROOT]
+    sys.modules["bennodes"] = package
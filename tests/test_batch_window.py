@@ -0,0 +1,102 @@
+"""
+批量加载的窗口、抽样和内存预算测试
+"""
+import os
+import uuid
+
+import folder_paths
+import pytest
+from PIL import Image
+
+from bennodes.nodes.image.ImageBatchLoaderBen import OUTPUT_BYTES_PER_PIXEL, ImageLoaderBatchBen
+
+NAMES = [f"{i:02d}.png" for i in range(10)]
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def loader():
+    return ImageLoaderBatchBen()
+
+
+@pytest.mark.parametrize("start, max_images, sample_n, expected", [
+    (0, 0, 0, NAMES),
+    (3, 0, 0, NAMES[3:]),
+    (2, 4, 0, NAMES[2:6]),
+    (8, 5, 0, NAMES[8:]),
+    (12, 0, 0, []),
+    (0, 0, 5, NAMES[0::2]),
+    (0, 0, 3, ["00.png", "03.png", "06.png"]),
+    (4, 6, 2, ["04.png", "07.png"]),
+    (0, 4, 10, NAMES[:4]),
+])
+def test_select_window(loader, start, max_images, sample_n, expected):
+    assert loader._select_window(NAMES, start, max_images, sample_n) == expected
+
+
+def test_sampling_is_deterministic(loader):
+    first = loader._select_window(NAMES * 10, 5, 80, 7)
+    assert first == loader._select_window(NAMES * 10, 5, 80, 7)
+    assert len(first) == 7
+
+
+def test_within_budget_loads_everything(loader):
+    assert loader._fit_memory_budget([MB, MB, MB], 3, "error") == 3
+    # 0 表示不限制
+    assert loader._fit_memory_budget([MB] * 3, 0, "error") == 3
+
+
+def test_over_budget_error(loader):
+    with pytest.raises(ValueError, match="超出预算"):
+        loader._fit_memory_budget([MB, MB, MB], 2, "error")
+
+
+def test_over_budget_shrink_keeps_leading_files(loader):
+    assert loader._fit_memory_budget([MB, MB, MB], 2, "shrink") == 2
+    # 按窗口顺序截断，不跳过中间的大文件去装后面的小文件
+    assert loader._fit_memory_budget([MB, 2 * MB, MB // 2], 2, "shrink") == 1
+
+
+def test_single_file_over_budget(loader):
+    with pytest.raises(ValueError, match="单个文件已超出预算"):
+        loader._fit_memory_budget([3 * MB, MB], 2, "shrink")
+
+
+@pytest.fixture
+def folder():
+    name = f"window-{uuid.uuid4().hex}"
+    path = os.path.join(folder_paths.get_input_directory(), name)
+    os.makedirs(path)
+    for i, file_name in enumerate(NAMES):
+        Image.new("RGB", (32, 32), (i * 20, 0, 0)).save(os.path.join(path, file_name))
+    return name
+
+
+def _load(loader, folder, size=64, **kwargs):
+    images, masks, widths, heights, names = loader.load_and_process_images(
+        "fill", "center", "自定义", "1:1", size, size, folder_path=folder, **kwargs
+    )
+    return images[0], names[0]
+
+
+def test_loads_only_window(loader, folder):
+    images, names = _load(loader, folder, start_index=2, max_images=4, sample_n=2)
+    assert images.shape == (2, 64, 64, 3)
+    assert "02.png" in names and "04.png" in names
+    assert "03.png" not in names
+
+
+def test_shrink_loads_files_within_budget(loader, folder):
+    # 每个文件输出 1MB，预算只够前 3 个
+    assert 256 * 256 * OUTPUT_BYTES_PER_PIXEL == MB
+    images, names = _load(loader, folder, size=256, memory_budget_mb=3, over_budget="shrink")
+    assert images.shape[0] == 3
+    assert "02.png" in names and "03.png" not in names
+
+    with pytest.raises(ValueError, match="超出预算"):
+        _load(loader, folder, size=256, memory_budget_mb=3)
+
+
+def test_start_beyond_folder(loader, folder):
+    with pytest.raises(ValueError, match="超出范围"):
+        _load(loader, folder, start_index=len(NAMES))
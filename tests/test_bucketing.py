@@ -0,0 +1,57 @@
+"""
+宽高比分桶测试：按对数距离归入最接近的比例，桶尺寸为 8 的倍数且不超过像素预算
+"""
+import math
+
+from bennodes.nodes.image.ImageBatchLoaderBen import ImageLoaderBatchBen
+from bennodes.utils.image.image_manifest import ImageInfo
+
+PIXEL_BUDGET = 1024 * 1024
+
+
+def _info(name, width, height, orientation=1):
+    return ImageInfo(name, 0, 0, width, height, "RGB", "PNG", 1, orientation, None)
+
+
+def _assign(infos):
+    return ImageLoaderBatchBen()._assign_buckets(infos, PIXEL_BUDGET)
+
+
+def test_groups_by_nearest_ratio():
+    infos = [
+        _info("wide", 1920, 1080),
+        _info("square", 512, 512),
+        _info("wide_small", 640, 360),
+        _info("portrait", 1080, 1920),
+        _info("almost_square", 1000, 980),
+    ]
+    groups = {(width, height): members for width, height, members in _assign(infos)}
+    assert len(groups) == 3
+    by_member = {i: size for size, members in groups.items() for i in members}
+    assert by_member[0] == by_member[2]
+    assert by_member[1] == by_member[4] == (1024, 1024)
+    assert by_member[3][0] < by_member[3][1]
+
+
+def test_buckets_follow_aspect_ratio_order():
+    infos = [_info("portrait", 900, 1600), _info("square", 300, 300), _info("wide", 1600, 900)]
+    ratios = list(ImageLoaderBatchBen.ASPECT_RATIOS.values())
+    buckets = _assign(infos)
+    order = [min(range(len(ratios)), key=lambda k: abs(ratios[k][0] / ratios[k][1] - width / height)) for width, height, _ in buckets]
+    assert order == sorted(order)
+    assert sorted(i for _, _, members in buckets for i in members) == [0, 1, 2]
+
+
+def test_bucket_sizes_fit_budget():
+    infos = [_info(str(i), width, height) for i, (width, height) in enumerate(ImageLoaderBatchBen.ASPECT_RATIOS.values())]
+    for width, height, members in _assign([_info(info.name, info.width * 100, info.height * 100) for info in infos]):
+        assert width % 8 == 0 and height % 8 == 0
+        assert width * height <= PIXEL_BUDGET
+        assert len(members) == 1
+
+
+def test_uses_exif_oriented_size():
+    """EXIF 方向为旋转90度时按校正后的宽高分桶"""
+    (width, height, members), = _assign([_info("rotated", 1920, 1080, orientation=6)])
+    assert width < height
+    assert abs(math.log(width / height) - math.log(9 / 16)) < 0.05
@@ -0,0 +1,68 @@
+"""
+GLM 客户端池测试：复用、淘汰时不关闭仍在使用的客户端
+"""
+import pytest
+
+pytest.importorskip("zhipuai")
+
+from bennodes.utils.ai.client_pool import BASE_URL_ENV, DEFAULT_BASE_URL, GLMClientPool, _PooledClient, resolve_base_url
+
+
+class FakeHttpClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = GLMClientPool(max_clients=1)
+    monkeypatch.setattr(pool, "_create", lambda *args: _PooledClient(object(), FakeHttpClient()))
+    return pool
+
+
+def _http_client(pool, client):
+    return next(entry.http_client for entry in pool._clients.values() if entry.client is client)
+
+
+def test_reuses_client_for_same_settings(pool):
+    with pool.lease("key", "", 300, 4) as first:
+        pass
+    with pool.lease("key", "", 300, 4) as second:
+        pass
+    assert first is second
+    assert pool.stats() == {"clients": 1, "created": 1, "reused": 1}
+
+
+def test_eviction_waits_for_release(pool):
+    with pool.lease("a") as client_a:
+        http_a = _http_client(pool, client_a)
+        with pool.lease("b") as client_b:
+            http_b = _http_client(pool, client_b)
+            # a 已被淘汰，但仍在使用中
+            assert not http_a.closed
+        assert not http_b.closed
+    assert http_a.closed
+    assert not http_b.closed
+
+    # 没有使用者的客户端被淘汰时立即关闭
+    with pool.lease("c"):
+        assert http_b.closed
+
+
+def test_close_waits_for_active_users(pool):
+    with pool.lease("a") as client:
+        http_client = _http_client(pool, client)
+        pool.close()
+        assert not http_client.closed
+    assert http_client.closed
+
+
+def test_resolve_base_url(monkeypatch):
+    monkeypatch.delenv(BASE_URL_ENV, raising=False)
+    assert resolve_base_url("") == DEFAULT_BASE_URL
+    assert resolve_base_url(" http://localhost:8000/v1 ") == "http://localhost:8000/v1"
+    monkeypatch.setenv(BASE_URL_ENV, "http://proxy/v4")
+    assert resolve_base_url("") == "http://proxy/v4"
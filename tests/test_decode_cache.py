@@ -0,0 +1,73 @@
+"""
+解码图像缓存测试：按字节预算淘汰，文件被替换后旧条目不再命中
+"""
+import os
+
+from PIL import Image
+
+from bennodes.utils.image.decode_cache import DecodedImageCache, file_cache_key
+
+
+def _frame(width, height):
+    return Image.new("RGB", (width, height))
+
+
+def test_evicts_by_byte_budget():
+    # 每帧 10*10*3 = 300 字节
+    cache = DecodedImageCache(max_bytes=700)
+    for key in ("a", "b"):
+        cache.put(key, _frame(10, 10), False)
+    assert cache.get("a") is not None
+    cache.put("c", _frame(10, 10), True)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c")[1] is True
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 600
+    assert stats["evictions"] == 1
+
+
+def test_oversized_frame_is_not_cached():
+    cache = DecodedImageCache(max_bytes=700)
+    cache.put("a", _frame(10, 10), False)
+    cache.put("big", _frame(20, 20), False)
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+
+
+def test_replacing_entry_updates_bytes():
+    cache = DecodedImageCache(max_bytes=10000)
+    cache.put("a", _frame(10, 10), False)
+    cache.put("a", _frame(20, 10), False)
+    assert cache.stats()["bytes"] == 600
+
+
+def test_set_budget_shrinks():
+    cache = DecodedImageCache(max_bytes=1000)
+    for key in ("a", "b", "c"):
+        cache.put(key, _frame(10, 10), False)
+    cache.set_budget(300)
+    assert cache.stats()["entries"] == 1
+    assert cache.get("c") is not None
+
+
+def test_file_key_changes_when_file_is_rewritten(tmp_path):
+    path = tmp_path / "image.png"
+    _frame(4, 4).save(path)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    key = file_cache_key(path)
+    assert file_cache_key(str(path)) == key
+
+    cache = DecodedImageCache(max_bytes=10000)
+    cache.put(key, _frame(4, 4), False)
+    cache.put_orientation(key, 6)
+
+    Image.new("RGB", (4, 4), (255, 0, 0)).save(path)
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    new_key = file_cache_key(path)
+    assert new_key != key
+    assert cache.get(new_key) is None
+    assert cache.get_orientation(new_key) is None
+    assert cache.get_orientation(key) == 6
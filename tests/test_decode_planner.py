@@ -0,0 +1,90 @@
+"""
+解码规划测试：缩小倍数选择、JPEG draft / reduce，以及与完整解码的输出一致性
+"""
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from bennodes.utils.image.decode_planner import REDUCING_GAP, choose_reduce_factor, get_oriented_size, plan_decode
+from bennodes.utils.image.image_utils import EXIF_ORIENTATION_TAG, process_image_for_comfy
+
+
+def _encoded(size, image_format, orientation=None):
+    x = np.linspace(0, 255, size[0], dtype=np.float32)
+    y = np.linspace(0, 255, size[1], dtype=np.float32)
+    rgb = np.stack([np.broadcast_to(x[None, :], (size[1], size[0])), np.broadcast_to(y[:, None], (size[1], size[0])), np.full((size[1], size[0]), 96, dtype=np.float32)], axis=-1)
+    buffer = io.BytesIO()
+    kwargs = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION_TAG] = orientation
+        kwargs["exif"] = exif
+    Image.fromarray(rgb.astype(np.uint8)).save(buffer, image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+def test_choose_reduce_factor_keeps_reducing_gap():
+    assert choose_reduce_factor((4000, 3000), (250, 187)) == 8
+    assert choose_reduce_factor((4000, 3000), (1000, 750)) == 2
+    assert choose_reduce_factor((4000, 3000), (2001, 1501)) == 1
+    assert choose_reduce_factor((4000, 3000), (0, 0)) == 1
+    # 缩小后至少保留 REDUCING_GAP 倍的目标尺寸
+    for needed in range(50, 2000, 37):
+        factor = choose_reduce_factor((4000, 3000), (needed, needed))
+        assert 3000 / factor >= needed * REDUCING_GAP or factor == 1
+
+
+def test_oriented_size_swaps_for_rotated_exif():
+    assert get_oriented_size(_open(_encoded((80, 40), "JPEG", orientation=6))) == (40, 80)
+    assert get_oriented_size(_open(_encoded((80, 40), "JPEG", orientation=3))) == (80, 40)
+    assert get_oriented_size(_open(_encoded((80, 40), "PNG"))) == (80, 40)
+
+
+def test_plan_without_resize_decodes_full_size():
+    img = _open(_encoded((800, 600), "JPEG"))
+    assert plan_decode(img, "none", 100, 100) == ((800, 600), 1)
+
+
+def test_jpeg_plan_uses_draft():
+    img = _open(_encoded((800, 600), "JPEG"))
+    plan = plan_decode(img, "contain", 100, 100)
+    assert plan == ((800, 600), 1)
+    # draft 生效后解码尺寸缩小为 1/4
+    assert img.size == (200, 150)
+
+
+def test_png_plan_uses_reduce():
+    img = _open(_encoded((800, 600), "PNG"))
+    plan = plan_decode(img, "fill", 100, 75)
+    assert plan == ((800, 600), 4)
+    assert img.size == (800, 600)
+
+
+def test_plan_respects_exif_transpose_flag():
+    data = _encoded((800, 400), "PNG", orientation=6)
+    assert plan_decode(_open(data), "none", 0, 0).source_size == (400, 800)
+    assert plan_decode(_open(data), "none", 0, 0, exif_transpose=False).source_size == (800, 400)
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "PNG"])
+@pytest.mark.parametrize("resize_mode", ["contain", "pad", "crop", "fill"])
+def test_planned_decode_matches_full_decode(image_format, resize_mode):
+    """规划后的输出尺寸与完整解码完全一致，像素只有重采样误差"""
+    data = _encoded((640, 480), image_format, orientation=6)
+
+    full_image, full_mask, full_width, full_height = process_image_for_comfy(_open(data), resize_mode, 64, 48)
+    img = _open(data)
+    plan = plan_decode(img, resize_mode, 64, 48)
+    planned_image, planned_mask, planned_width, planned_height = process_image_for_comfy(img, resize_mode, 64, 48, decode_plan=plan)
+
+    assert (planned_width, planned_height) == (full_width, full_height)
+    assert planned_image.shape == full_image.shape
+    assert torch.equal(planned_mask, full_mask)
+    assert (planned_image - full_image).abs().mean() < 0.005
@@ -0,0 +1,85 @@
+"""
+目录索引缓存测试：目录 mtime 不变时复用列表，增删文件后重新扫描
+"""
+import os
+import time
+
+from bennodes.utils.file.directory_index import MTIME_SETTLE_SECONDS, DirectoryIndex
+
+
+def _settle(path):
+    # 把目录修改时间设到足够早，缓存才会被信任
+    old = time.time() - MTIME_SETTLE_SECONDS - 10
+    os.utime(path, (old, old))
+
+
+def test_listing_is_sorted_and_split(tmp_path):
+    (tmp_path / "b.png").write_bytes(b"")
+    (tmp_path / "a.jpg").write_bytes(b"")
+    (tmp_path / "sub").mkdir()
+    index = DirectoryIndex()
+    assert index.files(tmp_path) == ["a.jpg", "b.png"]
+    assert index.dirs(tmp_path) == ["sub"]
+
+
+def test_reuses_settled_listing(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    _settle(tmp_path)
+    index = DirectoryIndex()
+    index.files(tmp_path)
+    index.files(tmp_path)
+    index.dirs(str(tmp_path))
+    assert index.stats() == {"directories": 1, "scans": 1, "hits": 2}
+
+
+def test_rescans_recently_modified_directory(tmp_path):
+    """刚修改过的目录不信任缓存：同一 mtime 刻度内的后续修改可能不改变 mtime"""
+    index = DirectoryIndex()
+    index.files(tmp_path)
+    index.files(tmp_path)
+    assert index.stats()["scans"] == 2
+
+
+def test_rescans_after_change(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    _settle(tmp_path)
+    index = DirectoryIndex()
+    assert index.files(tmp_path) == ["a.png"]
+
+    (tmp_path / "b.png").write_bytes(b"")
+    assert index.files(tmp_path) == ["a.png", "b.png"]
+    os.remove(tmp_path / "a.png")
+    assert index.files(tmp_path) == ["b.png"]
+
+
+def test_derived_results_follow_listing(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"")
+    (tmp_path / "notes.txt").write_bytes(b"")
+    _settle(tmp_path)
+    index = DirectoryIndex()
+    calls = []
+
+    def images(listing):
+        calls.append(1)
+        return [name for name in listing.files if name.endswith(".png")]
+
+    assert index.derived(tmp_path, "images", images) == ["a.png"]
+    result = index.derived(tmp_path, "images", images)
+    result.append("mutated.png")
+    assert index.derived(tmp_path, "images", images) == ["a.png"]
+    assert len(calls) == 1
+
+    (tmp_path / "c.png").write_bytes(b"")
+    assert index.derived(tmp_path, "images", images) == ["a.png", "c.png"]
+    assert len(calls) == 2
+
+
+def test_invalidate(tmp_path):
+    _settle(tmp_path)
+    index = DirectoryIndex()
+    index.files(tmp_path)
+    index.invalidate(tmp_path)
+    index.files(tmp_path)
+    index.invalidate()
+    index.files(tmp_path)
+    assert index.stats()["scans"] == 3
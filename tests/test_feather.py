@@ -0,0 +1,36 @@
+"""
+矩形解析羽化与 scipy 距离变换版本的一致性测试
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from bennodes.utils.image.image_utils import ImageScaleUtils
+
+pytestmark = pytest.mark.skipif(not ImageScaleUtils.HAS_SCIPY, reason="需要 scipy 作为参照")
+
+
+def _edt_feather(canvas_size, box, feathering):
+    mask = Image.new("L", canvas_size, 255)
+    mask.paste(0, box)
+    return np.array(ImageScaleUtils.apply_feather(mask, feathering))
+
+
+@pytest.mark.parametrize("canvas_size, box", [
+    ((64, 48), (8, 4, 56, 44)),     # 四边都有补边
+    ((64, 48), (0, 6, 64, 42)),     # 只有上下补边
+    ((64, 48), (10, 0, 54, 48)),    # 只有左右补边
+    ((64, 48), (0, 0, 40, 48)),     # 只有右侧补边
+    ((30, 30), (1, 1, 29, 29)),     # 内容区域小于两倍羽化宽度
+])
+@pytest.mark.parametrize("feathering", [1, 5, 20])
+def test_matches_distance_transform(canvas_size, box, feathering):
+    analytic = ImageScaleUtils.rect_feather_array(canvas_size, box, feathering)
+    assert analytic.dtype == np.uint8
+    assert np.array_equal(analytic, _edt_feather(canvas_size, box, feathering))
+
+
+def test_build_mask_without_padding_is_white():
+    """非 pad 模式没有补边，羽化不改变全白遮罩"""
+    layout = ImageScaleUtils.compute_layout("crop", 100, 50, 40, 40)
+    assert np.all(np.array(ImageScaleUtils.build_mask(layout, 10)) == 255)
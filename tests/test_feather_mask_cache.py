@@ -0,0 +1,35 @@
+"""
+羽化遮罩缓存测试
+"""
+import numpy as np
+import torch
+
+from bennodes.utils.image.image_utils import FeatherMaskCache, ImageScaleUtils
+
+
+def test_mask_cache_shares_entries():
+    cache = FeatherMaskCache(max_entries=2)
+    layout = ImageScaleUtils.compute_layout("pad", 100, 50, 64, 64)
+    first = cache.get("pad", layout, 4)
+    assert cache.get("pad", layout, 4) is first
+
+    expected = ImageScaleUtils.rect_feather_array(layout.canvas_size, layout.paste_box, 4)
+    assert torch.equal(first, torch.from_numpy(expected.astype(np.float32) / 255.0))
+
+    # 单帧返回副本，多帧沿批次维度广播
+    single = cache.get_batch("pad", layout, 4, 1)
+    single.zero_()
+    assert torch.equal(cache.get("pad", layout, 4), first)
+    assert cache.get_batch("pad", layout, 4, 3).stride(0) == 0
+
+
+def test_mask_cache_evicts_least_recently_used():
+    cache = FeatherMaskCache(max_entries=2)
+    layouts = [ImageScaleUtils.compute_layout("pad", 100, 50, size, size) for size in (32, 48, 64)]
+    first = cache.get("pad", layouts[0], 4)
+    cache.get("pad", layouts[1], 4)
+    cache.get("pad", layouts[0], 4)
+    cache.get("pad", layouts[2], 4)
+    assert cache.get("pad", layouts[0], 4) is first
+    assert len(cache._entries) == 2
+    assert ("pad", layouts[1].canvas_size, layouts[1].paste_box, 4, ImageScaleUtils.feather_backend()) not in cache._entries
@@ -0,0 +1,66 @@
+"""
+文件指纹服务测试：stat 不变时不重新读取文件，内容或 stat 变化后重新计算
+"""
+import os
+
+from bennodes.utils.file.fingerprint import FileFingerprintService, file_stat_key, hash_file
+
+
+def _write(path, data, mtime_ns=None):
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_hash_file_depends_on_content(tmp_path):
+    first = tmp_path / "a.bin"
+    second = tmp_path / "b.bin"
+    _write(first, b"x" * 3000000)
+    _write(second, b"x" * 3000000)
+    assert hash_file(first) == hash_file(second)
+    _write(second, b"x" * 2999999 + b"y")
+    assert hash_file(first) != hash_file(second)
+    assert ":" in hash_file(first)
+
+
+def test_memoized_until_stat_changes(tmp_path, monkeypatch):
+    path = tmp_path / "image.png"
+    _write(path, b"first", mtime_ns=1_000_000_000)
+    service = FileFingerprintService()
+    digest = service.fingerprint(path)
+
+    # stat 不变时直接返回记忆的摘要，不读取文件
+    def fail(_path):
+        raise AssertionError("不应重新读取文件")
+    monkeypatch.setattr("bennodes.utils.file.fingerprint.hash_file", fail)
+    assert service.fingerprint(path) == digest
+    assert service.fingerprint(str(path)) == digest
+    assert service.stats()["hits"] == 2
+    monkeypatch.undo()
+
+    # 同样大小的内容被覆盖、修改时间改变后重新计算
+    _write(path, b"other", mtime_ns=2_000_000_000)
+    assert service.fingerprint(path) != digest
+    assert service.stats()["misses"] == 2
+
+
+def test_stat_key_uses_absolute_path(tmp_path, monkeypatch):
+    path = tmp_path / "a.txt"
+    _write(path, b"data")
+    monkeypatch.chdir(tmp_path)
+    assert file_stat_key("a.txt") == file_stat_key(path)
+    assert file_stat_key("a.txt")[0] == str(path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    service = FileFingerprintService(max_entries=2)
+    paths = [tmp_path / f"{i}.bin" for i in range(3)]
+    for i, path in enumerate(paths):
+        _write(path, bytes([i]))
+    for path in (paths[0], paths[1], paths[0], paths[2]):
+        service.fingerprint(path)
+    assert service.stats()["entries"] == 2
+    service.fingerprint(paths[0])
+    assert service.stats()["hits"] == 2
+    service.fingerprint(paths[1])
+    assert service.stats()["misses"] == 4
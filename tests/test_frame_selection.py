@@ -0,0 +1,59 @@
+"""
+动图帧范围与步长选择测试
+"""
+import io
+
+import pytest
+import torch
+from PIL import Image
+
+from bennodes.utils.image.image_utils import process_image_for_comfy, select_frame_indices
+
+FRAME_COUNT = 10
+
+
+def _animated_gif():
+    # 每帧是不同的纯色灰度，解码后可以从像素值还原帧序号
+    frames = [Image.new("RGB", (16, 12), (i * 20, i * 20, i * 20)) for i in range(FRAME_COUNT)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:], duration=40, loop=0)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def _frame_numbers(image):
+    return [round(float(frame[0, 0, 0]) * 255 / 20) for frame in image]
+
+
+@pytest.mark.parametrize("start, count, stride, expected", [
+    (0, 0, 1, list(range(10))),
+    (3, 0, 1, list(range(3, 10))),
+    (0, 4, 1, [0, 1, 2, 3]),
+    (1, 0, 3, [1, 4, 7]),
+    (2, 2, 4, [2, 6]),
+    (8, 5, 1, [8, 9]),
+    (12, 0, 1, []),
+    (-3, 2, 0, [0, 1]),
+])
+def test_select_frame_indices(start, count, stride, expected):
+    assert list(select_frame_indices(FRAME_COUNT, start, count, stride)) == expected
+
+
+def test_decodes_only_selected_frames():
+    image, mask, width, height = process_image_for_comfy(_animated_gif(), "none", 0, 0, frame_start=1, frame_count=3, frame_stride=3)
+    assert image.shape == (3, 12, 16, 3)
+    assert mask.shape == (3, 12, 16)
+    assert _frame_numbers(image) == [1, 4, 7]
+
+
+def test_out_buffer_limits_frames():
+    """预分配缓冲区只容纳前 N 帧，其余帧不解码"""
+    out_image = torch.empty((2, 12, 16, 3))
+    out_mask = torch.empty((2, 12, 16))
+    process_image_for_comfy(_animated_gif(), "none", 0, 0, frame_start=5, out_image=out_image, out_mask=out_mask)
+    assert _frame_numbers(out_image) == [5, 6]
+
+
+def test_start_beyond_last_frame_raises():
+    with pytest.raises(ValueError):
+        process_image_for_comfy(_animated_gif(), "none", 0, 0, frame_start=FRAME_COUNT)
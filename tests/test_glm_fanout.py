@@ -0,0 +1,100 @@
+"""
+GLMNodeBen 列表输入测试：并发处理后保持输入顺序、单项失败不影响其他项、共享输入不接受列表
+"""
+import random
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+import pytest
+
+from bennodes.nodes.ai import GLMNodeBen as glm_module
+from bennodes.nodes.ai.GLMNodeBen import GLMNodeBen
+from bennodes.utils.ai import response_cache
+from bennodes.utils.ai.response_cache import ResponseCache
+
+CONFIG = {"stream": False, "concurrency": 4, "response_cache": False}
+
+
+class EchoClient:
+    """随机延迟后返回用户消息，消息包含 "失败" 时抛出异常"""
+
+    def __init__(self):
+        self.threads = set()
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **params):
+        content = params["messages"][-1]["content"]
+        with self._lock:
+            self.threads.add(threading.get_ident())
+            delay = self._rng.random() * 0.02
+        time.sleep(delay)
+        if "失败" in content:
+            raise RuntimeError("服务暂时不可用")
+        message = types.SimpleNamespace(content=f"回答:{content}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    client = EchoClient()
+
+    @contextmanager
+    def lease(*args, **kwargs):
+        yield client
+
+    monkeypatch.setattr(glm_module, "glm_client_pool", types.SimpleNamespace(lease=lease))
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+    return client
+
+
+def _analyze(**kwargs):
+    kwargs.setdefault("glm_config", [CONFIG])
+    kwargs.setdefault("api_key", ["key"])
+    return GLMNodeBen().analyze_content(**kwargs)[0]
+
+
+def test_results_keep_input_order(client):
+    prompts = [f"问题{i}" for i in range(12)]
+    assert _analyze(prompt=prompts, input=[""]) == [f"回答:问题{i}" for i in range(12)]
+    assert len(client.threads) > 1
+
+
+def test_failed_item_does_not_affect_others(client):
+    results = _analyze(prompt=["问题0", "请求失败", "问题2"], input=[""])
+    assert results[0] == "回答:问题0"
+    assert results[1].startswith("API调用失败")
+    assert results[2] == "回答:问题2"
+
+
+def test_item_exception_is_reported_in_place(client, monkeypatch):
+    original = GLMNodeBen._analyze_item
+
+    def analyze_item(self, client, prompt, *args):
+        if prompt == "异常":
+            raise ValueError("无法处理")
+        return original(self, client, prompt, *args)
+    monkeypatch.setattr(GLMNodeBen, "_analyze_item", analyze_item)
+
+    results = _analyze(prompt=["问题0", "异常", "问题2"], input=[""])
+    assert results == ["回答:问题0", "处理第2项失败: 无法处理", "回答:问题2"]
+
+
+def test_shorter_list_repeats_last_item(client):
+    assert _analyze(prompt=["总结"], input=["", ""]) == ["回答:总结", "回答:总结"]
+
+
+@pytest.mark.parametrize("name, value", [
+    ("system_prompt", ["系统1", "系统2"]),
+    ("glm_config", [CONFIG, CONFIG]),
+    ("api_key", ["key1", "key2"]),
+])
+def test_shared_inputs_reject_lists(client, name, value):
+    results = _analyze(prompt=["问题"], input=[""], **{name: value})
+    assert len(results) == 1
+    assert results[0].startswith(f"{name} 不支持列表输入（收到 2 项）")
+    assert client.threads == set()
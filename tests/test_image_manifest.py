@@ -0,0 +1,104 @@
+"""
+文件夹图片清单测试：只重新读取 stat 变化的文件，清单跨实例持久化
+"""
+import io
+import os
+import struct
+import zlib
+
+from PIL import Image
+
+from bennodes.utils.image import image_manifest
+from bennodes.utils.image.image_manifest import FolderManifest, oriented_size, stat_key
+
+
+def _save(path, size, mtime_ns):
+    Image.new("RGB", size).save(path)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _count_reads(monkeypatch):
+    reads = []
+    original = image_manifest.read_image_info
+
+    def counting(path, st=None):
+        reads.append(os.path.basename(path))
+        return original(path, st)
+    monkeypatch.setattr(image_manifest, "read_image_info", counting)
+    return reads
+
+
+def test_only_changed_files_are_read(tmp_path, monkeypatch):
+    _save(tmp_path / "a.png", (40, 30), 1_000_000_000)
+    _save(tmp_path / "b.png", (20, 10), 1_000_000_000)
+    reads = _count_reads(monkeypatch)
+
+    manifest = FolderManifest(tmp_path)
+    infos = manifest.refresh(["a.png", "b.png"])
+    assert [(info.name, info.width, info.height) for info in infos] == [("a.png", 40, 30), ("b.png", 20, 10)]
+    assert sorted(reads) == ["a.png", "b.png"]
+
+    _save(tmp_path / "b.png", (60, 50), 2_000_000_000)
+    infos = manifest.refresh(["a.png", "b.png"])
+    assert (infos[1].width, infos[1].height) == (60, 50)
+    assert sorted(reads) == ["a.png", "b.png", "b.png"]
+
+
+def test_manifest_persists_outside_folder(tmp_path, monkeypatch):
+    _save(tmp_path / "a.png", (40, 30), 1_000_000_000)
+    folder_mtime = os.stat(tmp_path).st_mtime_ns
+    FolderManifest(tmp_path).refresh(["a.png"])
+
+    # 清单写在缓存目录中，输入文件夹不变
+    assert os.listdir(tmp_path) == ["a.png"]
+    assert os.stat(tmp_path).st_mtime_ns == folder_mtime
+    assert os.path.exists(image_manifest.manifest_path(tmp_path))
+
+    reads = _count_reads(monkeypatch)
+    infos = FolderManifest(tmp_path).refresh(["a.png"])
+    assert reads == []
+    assert (infos[0].width, infos[0].height) == (40, 30)
+
+
+def test_removed_and_missing_files(tmp_path):
+    _save(tmp_path / "a.png", (4, 4), 1_000_000_000)
+    _save(tmp_path / "b.png", (4, 4), 1_000_000_000)
+    manifest = FolderManifest(tmp_path)
+    manifest.refresh(["a.png", "b.png"])
+
+    os.remove(tmp_path / "b.png")
+    assert [info.name for info in manifest.refresh(["a.png", "b.png"], existing=["a.png"])] == ["a.png"]
+    assert sorted(manifest.entries) == ["a.png"]
+
+
+def test_unreadable_file_is_recorded(tmp_path):
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    info = FolderManifest(tmp_path).refresh(["broken.png"])[0]
+    assert info.error is not None
+    assert info.n_frames == 0
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def test_png_exif_after_pixel_data(tmp_path):
+    """eXIf 块位于像素数据之后时只按块长度跳读获得方向"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 20)).save(buffer, "PNG")
+    data = buffer.getvalue()
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    iend = data.rindex(b"IEND") - 4
+    path = tmp_path / "rotated.png"
+    path.write_bytes(data[:iend] + _png_chunk(b"eXIf", exif.tobytes()) + data[iend:])
+
+    info = FolderManifest(tmp_path).refresh(["rotated.png"])[0]
+    assert info.orientation == 6
+    assert oriented_size(info) == (20, 40)
+
+
+def test_stat_key(tmp_path):
+    _save(tmp_path / "a.png", (4, 4), 1_000_000_000)
+    info = FolderManifest(tmp_path).refresh(["a.png"])[0]
+    assert stat_key(tmp_path / "a.png", info) == (str(tmp_path / "a.png"), info.size, 1_000_000_000)
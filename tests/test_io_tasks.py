@@ -0,0 +1,71 @@
+"""
+I/O 并发执行测试：结果保持输入顺序、失败后不再领取新项、嵌套调用在当前线程执行
+"""
+import random
+import threading
+import time
+
+import pytest
+
+from bennodes.utils.system.executor import run_io_tasks
+
+
+def test_results_keep_input_order():
+    rng = random.Random(0)
+    delays = [rng.random() * 0.01 for _ in range(40)]
+
+    def task(i):
+        time.sleep(delays[i])
+        return i * i
+
+    assert run_io_tasks(task, range(40), 8) == [i * i for i in range(40)]
+
+
+def test_uses_at_most_max_workers_threads():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def task(i):
+        with lock:
+            active.append(i)
+            peak.append(len(active))
+        time.sleep(0.005)
+        with lock:
+            active.remove(i)
+        return i
+
+    run_io_tasks(task, range(30), 3)
+    assert max(peak) <= 3
+
+
+def test_failure_stops_new_items():
+    started = []
+
+    def task(i):
+        started.append(i)
+        if i == 2:
+            raise RuntimeError("失败")
+        time.sleep(0.01)
+        return i
+
+    with pytest.raises(RuntimeError):
+        run_io_tasks(task, range(100), 4)
+    assert len(started) < 100
+
+
+def test_nested_calls_run_inline():
+    """I/O 线程内的嵌套调用直接在当前线程执行，不会等待已被占满的线程池"""
+    def inner(j):
+        return threading.get_ident()
+
+    def outer(i):
+        return threading.get_ident(), run_io_tasks(inner, range(4), 4)
+
+    for outer_thread, inner_threads in run_io_tasks(outer, range(8), 8):
+        assert inner_threads == [outer_thread] * 4
+
+
+def test_single_item_runs_in_caller_thread():
+    assert run_io_tasks(lambda i: threading.get_ident(), [0], 8) == [threading.get_ident()]
+    assert run_io_tasks(lambda i: threading.get_ident(), range(3), 1) == [threading.get_ident()] * 3
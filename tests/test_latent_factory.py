@@ -0,0 +1,60 @@
+"""
+空 Latent 创建测试：布局预设、expand 零步长批次、中间设备
+"""
+import comfy.model_management
+import pytest
+import torch
+
+from bennodes.nodes.image.EmptyLatentImageBen import EmptyLatentImageBen
+from bennodes.utils.image.latent_factory import LATENT_LAYOUTS, create_empty_latent, resolve_latent_layout
+
+
+@pytest.mark.parametrize("layout, expected", [
+    ("4ch (SD1.5/SDXL)", (4, 8)),
+    ("16ch (SD3/Flux)", (16, 8)),
+    ("自定义", (32, 16)),
+])
+def test_resolve_layout(layout, expected):
+    assert resolve_latent_layout(layout, 32, 16) == expected
+
+
+def test_presets_ignore_custom_values():
+    for layout, preset in LATENT_LAYOUTS.items():
+        if preset is not None:
+            assert resolve_latent_layout(layout, 99, 99) == preset
+
+
+@pytest.mark.parametrize("channels, ratio", [(4, 8), (16, 8), (3, 4)])
+def test_shape_and_dtype(channels, ratio):
+    latent = create_empty_latent(2, 1024, 576, channels, ratio)
+    assert latent.shape == (2, channels, 576 // ratio, 1024 // ratio)
+    assert latent.dtype == torch.float32
+    assert latent.is_contiguous()
+    assert torch.count_nonzero(latent) == 0
+
+
+def test_expand_shares_one_sample():
+    latent = create_empty_latent(64, 512, 512, expand=True)
+    assert latent.shape == (64, 4, 64, 64)
+    assert latent.stride(0) == 0
+    assert latent.untyped_storage().nbytes() == 4 * 64 * 64 * 4
+    # 零步长视图不能原地写入
+    with pytest.raises(RuntimeError):
+        latent.add_(1)
+
+
+def test_expand_single_sample_is_writable():
+    latent = create_empty_latent(1, 512, 512, expand=True)
+    latent.add_(1)
+    assert latent.stride(0) != 0
+
+
+def test_uses_intermediate_device(monkeypatch):
+    monkeypatch.setattr(comfy.model_management, "intermediate_device", lambda: torch.device("meta"))
+    assert create_empty_latent(2, 64, 64).device.type == "meta"
+    assert create_empty_latent(2, 64, 64, device="cpu").device.type == "cpu"
+
+
+def test_node_output():
+    latent, = EmptyLatentImageBen().generate("自定义", "1:1", 768, 512, batch_size=3, latent_layout="16ch (SD3/Flux)")
+    assert latent["samples"].shape == (3, 16, 64, 96)
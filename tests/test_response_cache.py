@@ -0,0 +1,99 @@
+"""
+模型响应缓存测试：请求键、过期时间、按最近使用时间淘汰
+"""
+import os
+import time
+
+import pytest
+
+from bennodes.utils.ai import response_cache
+from bennodes.utils.ai.response_cache import ResponseCache, cached_response, make_request_key
+
+
+def _params(**overrides):
+    params = {"model": "glm-4", "temperature": 0.7, "messages": [{"role": "user", "content": "你好"}]}
+    params.update(overrides)
+    return params
+
+
+def test_request_key_covers_all_params():
+    key = make_request_key(_params())
+    assert key == make_request_key(dict(reversed(list(_params().items()))))
+    assert key != make_request_key(_params(temperature=0.8))
+    assert key != make_request_key(_params(messages=[{"role": "user", "content": "您好"}]))
+
+
+def test_ttl_expires_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("key", "回答")
+    assert cache.get("key", ttl=60) == "回答"
+    assert cache.get("key") == "回答"
+
+    now = time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 120)
+    assert cache.get("key", ttl=60) is None
+    # 过期条目被删除
+    assert cache.get("key") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    (tmp_path / "bad.json").write_text("{", encoding="utf-8")
+    assert cache.get("bad") is None
+
+
+def test_trim_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, "x" * 100)
+        os.utime(tmp_path / f"{key}.json", ns=(i * 1_000_000_000 + 1, i * 1_000_000_000 + 1))
+    assert cache.get("a") is not None
+
+    # 条目中的创建时间长度不固定，按实际大小设置容量
+    cache.max_bytes = os.path.getsize(tmp_path / "a.json") + os.path.getsize(tmp_path / "c.json")
+    cache.trim()
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cached_response(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+    calls = []
+
+    def request():
+        calls.append(1)
+        return f"回答{len(calls)}"
+
+    assert cached_response(_params(), request) == "回答1"
+    assert cached_response(_params(), request) == "回答1"
+    # 关闭读取时重新请求，新结果覆盖旧条目
+    assert cached_response(_params(), request, use_cache=False) == "回答2"
+    assert cached_response(_params(), request) == "回答2"
+    assert len(calls) == 2
+
+
+def test_failed_request_is_not_cached(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+
+    def fail():
+        raise RuntimeError("请求失败")
+
+    with pytest.raises(RuntimeError):
+        cached_response(_params(), fail)
+    assert os.listdir(tmp_path) == []
+
+
+def test_endpoints_do_not_share_responses(tmp_path, monkeypatch):
+    """不同服务地址上的同名模型各自缓存"""
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 20)
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+
+    assert cached_response(_params(), lambda: "官方", base_url="https://open.bigmodel.cn/api/paas/v4") == "官方"
+    assert cached_response(_params(), lambda: "代理", base_url="http://localhost:8000/v1") == "代理"
+    assert cached_response(_params(), lambda: "未使用", base_url="https://open.bigmodel.cn/api/paas/v4") == "官方"
@@ -0,0 +1,120 @@
+"""
+流式请求取消测试：读取中途设置取消标志后，监视线程关闭阻塞的连接并抛出取消异常
+"""
+import socket
+import threading
+import time
+import types
+
+import comfy.model_management
+import pytest
+
+from bennodes.utils.ai import streaming
+from bennodes.utils.ai.streaming import run_completion
+
+
+def _chunk(text):
+    delta = types.SimpleNamespace(content=text, reasoning_content=None)
+    return types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(delta=delta)])
+
+
+class SocketStream:
+    """
+    模拟 SDK 的流式响应：每收到一行数据产生一个增量块，阻塞在 recv 上等待下一行。
+    连接被关闭（recv 返回空或报错）时像 httpx 一样抛出异常
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.closed = False
+        # 产生第一个增量块后设置
+        self.started = threading.Event()
+        network_stream = types.SimpleNamespace(get_extra_info=lambda name: sock if name == "socket" else None)
+        self.response = types.SimpleNamespace(extensions={"network_stream": network_stream}, close=self._close)
+
+    def _close(self):
+        self.closed = True
+        self.sock.close()
+
+    def __iter__(self):
+        buffer = b""
+        while True:
+            data = self.sock.recv(1024)
+            if not data:
+                raise ConnectionError("连接已关闭")
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                yield _chunk(line.decode("utf-8"))
+                self.started.set()
+
+
+class FakeClient:
+    def __init__(self, stream):
+        self.stream = stream
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, stream, **params):
+        assert stream is True
+        return self.stream
+
+
+@pytest.fixture
+def interrupt_flag(monkeypatch):
+    flag = threading.Event()
+    monkeypatch.setattr(comfy.model_management, "processing_interrupted", flag.is_set)
+    return flag
+
+
+@pytest.fixture
+def socket_pair():
+    server, client = socket.socketpair()
+    # 监视线程失效时读取超时报错，测试失败而不是一直阻塞
+    client.settimeout(5)
+    yield server, client
+    server.close()
+    client.close()
+
+
+def test_completes_without_interrupt(interrupt_flag, socket_pair):
+    server, client = socket_pair
+    stream = SocketStream(client)
+    server.sendall("你好\n世界\n".encode("utf-8"))
+    server.shutdown(socket.SHUT_WR)
+
+    with pytest.raises(ConnectionError):
+        # 服务端关闭连接时没有取消标志，按普通错误抛出
+        run_completion(FakeClient(stream), {}, {"stream": True})
+    assert stream.closed
+
+
+def test_interrupt_aborts_blocked_stream(interrupt_flag, socket_pair):
+    server, client = socket_pair
+    stream = SocketStream(client)
+
+    def interrupt_after_first_chunk():
+        server.sendall("第一块\n".encode("utf-8"))
+        # 第一块被读取后设置取消标志；服务端不再发送数据，读取线程阻塞在 recv 上
+        stream.started.wait(2)
+        interrupt_flag.set()
+
+    threading.Thread(target=interrupt_after_first_chunk, daemon=True).start()
+    start = time.time()
+    with pytest.raises(comfy.model_management.InterruptProcessingException):
+        run_completion(FakeClient(stream), {}, {"stream": True})
+
+    # 监视线程按轮询间隔发现取消并 shutdown 连接，读取线程随即结束
+    assert time.time() - start < 1.0
+    assert stream.started.is_set()
+    assert stream.closed
+    assert stream not in streaming._open_streams
+
+
+def test_no_request_after_interrupt(interrupt_flag):
+    interrupt_flag.set()
+
+    def create(**params):
+        raise AssertionError("取消后不应发出请求")
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    with pytest.raises(comfy.model_management.InterruptProcessingException):
+        run_completion(client, {}, {"stream": True})
@@ -0,0 +1,55 @@
+"""
+预处理张量磁盘缓存测试：无损往返、形状校验、按最近使用时间淘汰
+"""
+import os
+
+import torch
+
+from bennodes.utils.image.tensor_cache import TensorDiskCache, make_cache_key
+
+
+def _image(seed, frames=1):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randint(0, 256, (frames, 8, 6, 3), generator=generator).float() / 255.0
+
+
+def test_round_trip_is_lossless(tmp_path):
+    cache = TensorDiskCache(str(tmp_path), max_bytes=1 << 20)
+    image = _image(0, frames=2)
+    key = make_cache_key(("a.png", 10, 1), "fill", 6, 8)
+    cache.store(key, image)
+
+    out = torch.empty_like(image)
+    assert cache.load_into(key, out)
+    assert torch.equal(out, image)
+    assert cache.stats()["hits"] == 1
+
+
+def test_shape_mismatch_is_a_miss(tmp_path):
+    cache = TensorDiskCache(str(tmp_path), max_bytes=1 << 20)
+    cache.store("key", _image(0))
+    assert not cache.load_into("key", torch.empty(2, 8, 6, 3))
+    assert not cache.load_into("missing", torch.empty(1, 8, 6, 3))
+    assert cache.stats()["misses"] == 2
+
+
+def test_key_covers_file_and_params():
+    key = make_cache_key(("a.png", 10, 1), "fill", 6, 8)
+    assert key == make_cache_key(("a.png", 10, 1), "fill", 6, 8)
+    assert key != make_cache_key(("a.png", 10, 2), "fill", 6, 8)
+    assert key != make_cache_key(("a.png", 10, 1), "crop", 6, 8)
+
+
+def test_trim_removes_least_recently_used(tmp_path):
+    cache = TensorDiskCache(str(tmp_path), max_bytes=1 << 20)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.store(key, _image(i))
+        os.utime(tmp_path / f"{key}.npy", ns=(i * 1_000_000_000 + 1, i * 1_000_000_000 + 1))
+    # 读取会刷新修改时间，a 成为最近使用的条目
+    assert cache.load_into("a", torch.empty(1, 8, 6, 3))
+
+    entry_size = os.path.getsize(tmp_path / "a.npy")
+    cache.max_bytes = entry_size * 2
+    cache.trim()
+    assert sorted(os.listdir(tmp_path)) == ["a.npy", "c.npy"]
+    assert cache.stats()["evictions"] == 1
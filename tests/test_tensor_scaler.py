@@ -0,0 +1,62 @@
+"""
+张量缩放引擎与 PIL 路径的一致性测试
+"""
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from bennodes.utils.image.image_utils import process_image_for_comfy
+from bennodes.utils.image.tensor_scaler import scale_image_batch, supports_tensor_engine
+
+SOURCE_SIZE = (96, 64)
+TARGETS = [(48, 48), (160, 90), (64, 128)]
+
+
+def _source_image():
+    # 平滑渐变：重采样误差只来自插值核的差异，不受高频噪声放大
+    x = np.linspace(0, 1, SOURCE_SIZE[0], dtype=np.float32)
+    y = np.linspace(0, 1, SOURCE_SIZE[1], dtype=np.float32)
+    rgb = np.stack([
+        np.broadcast_to(x[None, :], (SOURCE_SIZE[1], SOURCE_SIZE[0])),
+        np.broadcast_to(y[:, None], (SOURCE_SIZE[1], SOURCE_SIZE[0])),
+        np.outer(y, x),
+    ], axis=-1)
+    return (rgb * 255).round().astype(np.uint8)
+
+
+@pytest.mark.parametrize("resize_mode", ["contain", "pad", "crop", "fill", "none"])
+@pytest.mark.parametrize("target", TARGETS)
+@pytest.mark.parametrize("position", ["center", "top", "right"])
+def test_matches_pil(resize_mode, target, position):
+    """输出尺寸、遮罩完全一致，像素误差不超过两级灰度"""
+    array = _source_image()
+    batch = torch.from_numpy(array.astype(np.float32) / 255.0)[None,]
+
+    pil_image, pil_mask, pil_width, pil_height = process_image_for_comfy(
+        Image.fromarray(array), resize_mode, target[0], target[1], feathering=6, position=position
+    )
+    tensor_image, tensor_mask, tensor_width, tensor_height = scale_image_batch(
+        batch, resize_mode, target[0], target[1], feathering=6, position=position
+    )
+
+    assert (tensor_width, tensor_height) == (pil_width, pil_height)
+    assert tensor_image.shape == pil_image.shape
+    assert torch.equal(tensor_mask, pil_mask)
+    assert (tensor_image - pil_image).abs().mean() < 0.003
+    assert (tensor_image - pil_image).abs().max() < 2 / 255
+
+
+def test_batch_mask_is_broadcast():
+    """整批共用一张遮罩，批次维度不复制数据"""
+    batch = torch.rand(3, 32, 48, 3)
+    image, mask, width, height = scale_image_batch(batch, "pad", 64, 64, feathering=4)
+    assert image.shape == (3, 64, 64, 3)
+    assert mask.shape == (3, 64, 64)
+    assert mask.stride(0) == 0
+
+
+def test_supports_tensor_engine():
+    assert supports_tensor_engine(torch.rand(1, 8, 8, 3), "bicubic")
+    assert not supports_tensor_engine(torch.rand(1, 8, 8, 4), "bicubic")
+    assert not supports_tensor_engine(torch.rand(1, 8, 8, 3), "lanczos")
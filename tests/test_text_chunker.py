@@ -0,0 +1,67 @@
+"""
+文本分块测试：拼接还原原文、每块不超出 token 预算、优先在边界切分
+"""
+import random
+
+import pytest
+
+from bennodes.utils.ai.text_chunker import estimate_tokens, split_into_chunks
+
+SAMPLE_PIECES = [
+    "第一段说明了背景。", "这是第二句！", "English sentence here. ", "Numbers 1234567890 ",
+    "符号：（）【】!?;", "\n", "\n\n", "超长无标点中文" * 40, "x" * 300, "émoji 😀 ",
+]
+
+
+def _random_text(seed, pieces=200):
+    rng = random.Random(seed)
+    return "".join(rng.choice(SAMPLE_PIECES) for _ in range(pieces))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("中" * 100) == 71
+    assert estimate_tokens("a" * 100) == 26
+    assert estimate_tokens("a b") == estimate_tokens("ab")
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("max_tokens", [8, 50, 300])
+def test_round_trip_and_budget(seed, max_tokens):
+    text = _random_text(seed)
+    chunks = split_into_chunks(text, max_tokens)
+    assert "".join(chunks) == text
+    assert all(chunk and estimate_tokens(chunk) <= max_tokens for chunk in chunks)
+
+
+@pytest.mark.parametrize("overlap_tokens", [10, 30, 60])
+def test_overlap_stays_within_budget(overlap_tokens):
+    # 每句内容不同，重叠部分在原文中的位置唯一
+    text = "".join(f"第{i}句话说明了一件事情。" + ("\n" if i % 40 == 39 else "") for i in range(300))
+    chunks = split_into_chunks(text, 120, overlap_tokens=overlap_tokens)
+    assert all(estimate_tokens(chunk) <= 120 for chunk in chunks)
+    # 每块开头重复上一块末尾的完整句子，去掉重复部分后拼接还原原文
+    end = len(chunks[0])
+    for chunk in chunks[1:]:
+        start = text.index(chunk)
+        assert start <= end < start + len(chunk)
+        assert estimate_tokens(text[start:end]) <= overlap_tokens or start == end
+        end = start + len(chunk)
+    assert end == len(text)
+
+
+def test_prefers_paragraph_boundaries():
+    paragraphs = ["这是一个完整的段落，内容不长。" * 3 + "\n\n" for _ in range(6)]
+    text = "".join(paragraphs)
+    chunks = split_into_chunks(text, estimate_tokens(paragraphs[0]) * 2 + 2)
+    assert len(chunks) == 3
+    assert all(chunk.endswith("\n\n") for chunk in chunks)
+
+
+def test_unbreakable_mixed_text_is_hard_cut():
+    """没有任何边界的中英混排长串按字符权重硬切，每块仍在预算内"""
+    text = ("中a" * 5000) + ("b" * 5000)
+    chunks = split_into_chunks(text, 100)
+    assert "".join(chunks) == text
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 100
+    assert len(chunks) < 200
@@ -0,0 +1,64 @@
+"""
+文本文件读取测试：编码检测、大文件抽样、按字符数截断
+"""
+import codecs
+
+import pytest
+
+from bennodes.utils.file import text_reader
+from bennodes.utils.file.text_reader import HEAD_SAMPLE_BYTES, detect_encoding, read_text
+
+CHINESE = "中文内容测试，包含标点符号。\n"
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"plain ascii text\n", "utf-8"),
+    (CHINESE.encode("utf-8"), "utf-8"),
+    (CHINESE.encode("gbk"), "gbk"),
+    (codecs.BOM_UTF8 + CHINESE.encode("utf-8"), "utf-8-sig"),
+    (CHINESE.encode("utf-16"), "utf-16"),
+    (bytes([0x81, 0x20, 0xff, 0xfe, 0x20]), "latin-1"),
+])
+def test_detect_encoding(data, expected):
+    assert detect_encoding(data) == expected
+
+
+def test_head_truncated_in_multibyte_character():
+    """开头样本截断在多字节字符中间时仍判断为 UTF-8"""
+    data = ("中" * (HEAD_SAMPLE_BYTES // 3 + 10)).encode("utf-8")
+    assert len(data) > HEAD_SAMPLE_BYTES and HEAD_SAMPLE_BYTES % 3 != 0
+    assert detect_encoding(data) == "utf-8"
+
+
+def test_spread_samples_catch_non_utf8_tail():
+    """开头是纯 ASCII、后半部分是 GBK 的大文件不能判断为 UTF-8"""
+    data = b"a" * (HEAD_SAMPLE_BYTES * 2) + (CHINESE * 20000).encode("gbk")
+    assert detect_encoding(data) == "gbk"
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "gbk", "utf-16", "utf-8-sig"])
+def test_read_text_round_trip(tmp_path, encoding, monkeypatch):
+    # 缩小解码块，覆盖多字节字符跨块的情况
+    monkeypatch.setattr(text_reader, "DECODE_BLOCK_BYTES", 7)
+    path = tmp_path / "a.txt"
+    content = CHINESE * 50
+    path.write_bytes(content.encode(encoding))
+    text, detected, truncated = read_text(path)
+    assert text == content
+    assert not truncated
+    assert codecs.lookup(detected) == codecs.lookup(encoding)
+
+
+def test_read_text_stops_at_max_chars(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_reader, "DECODE_BLOCK_BYTES", 64)
+    path = tmp_path / "a.txt"
+    content = CHINESE * 100
+    path.write_bytes(content.encode("utf-8"))
+    assert read_text(path, max_chars=30) == (content[:30], "utf-8", True)
+    assert read_text(path, max_chars=len(content)) == (content, "utf-8", False)
+
+
+def test_read_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert read_text(path) == ("", "utf-8", False)
@@ -0,0 +1,127 @@
+"""
+分块汇总（map-reduce）测试：汇总提示词不超过上限、失败后只重新请求失败的部分、
+汇总成功后不再复用部分结果
+"""
+import threading
+import types
+
+import pytest
+
+from bennodes.nodes.ai.text_processor import TextProcessor
+from bennodes.utils.ai import response_cache
+from bennodes.utils.ai.partial_results import partial_results
+from bennodes.utils.ai.response_cache import ResponseCache
+
+
+class SmallTextProcessor(TextProcessor):
+    """缩小各项上限，少量文本即可触发多层汇总和压缩"""
+    MAX_CONTENT_CHARS = 3000
+    REDUCE_MIN_ITEM_CHARS = 200
+
+
+class FakeClient:
+    """记录每个请求的用户消息，按 reply(消息) 返回固定文本，fail(消息) 为 True 时抛出异常"""
+
+    def __init__(self, reply, fail=None):
+        self.reply = reply
+        self.fail = fail
+        self.requests = []
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **params):
+        content = params["messages"][-1]["content"]
+        with self._lock:
+            self.requests.append(content)
+        if self.fail is not None and self.fail(content):
+            raise RuntimeError("服务暂时不可用")
+        message = types.SimpleNamespace(content=self.reply(content))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_bytes=1 << 30)
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+    partial_results.clear()
+    yield
+    partial_results.clear()
+
+
+def _processor(**config):
+    return SmallTextProcessor(dict({"stream": False, "chunk_tokens": 100, "chunk_overlap": 0, "concurrency": 3}, **config))
+
+
+def _content(paragraphs=12):
+    return "".join(f"第{i}段内容。" * 12 + "\n\n" for i in range(paragraphs))
+
+
+def _is_chunk_request(content):
+    return "部分(共" in content
+
+
+def _summary(result):
+    return result[0][0].split("=== 综合总结 ===\n", 1)[1]
+
+
+def test_reduce_prompts_stay_within_limit():
+    # 每个部分结果都接近单项预算，需要多层汇总，超出预算的结果先压缩
+    client = FakeClient(lambda content: "要点" * 700)
+    processor = _processor()
+    result = processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+
+    assert _summary(result) == "要点" * 700
+    chunk_requests = [content for content in client.requests if _is_chunk_request(content)]
+    other_requests = [content for content in client.requests if not _is_chunk_request(content)]
+    assert len(chunk_requests) == len(processor.split_text_into_chunks(_content()))
+    assert any(content.startswith("以下是对") for content in other_requests)
+    assert any("压缩到" in content for content in other_requests)
+    assert all(len(content) <= SmallTextProcessor.MAX_CONTENT_CHARS for content in other_requests)
+
+
+def test_rerun_only_requests_failed_chunks():
+    failing = {"第3部分"}
+    client = FakeClient(
+        lambda content: "部分结论",
+        fail=lambda content: any(f"这是文本文件的{part}(" in content for part in failing),
+    )
+    processor = _processor(response_cache=False)
+
+    result = processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+    assert "第3部分分析失败" in result[0][0]
+    total = len(processor.split_text_into_chunks(_content()))
+    assert len([content for content in client.requests if _is_chunk_request(content)]) == total
+
+    failing.clear()
+    client.requests.clear()
+    result = processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+    assert _summary(result) == "部分结论"
+    chunk_requests = [content for content in client.requests if _is_chunk_request(content)]
+    assert len(chunk_requests) == 1
+    assert "这是文本文件的第3部分(" in chunk_requests[0]
+
+
+def test_prompt_too_long_fails_before_requests():
+    client = FakeClient(lambda content: "结论")
+    processor = _processor()
+    prompt = "要求" * processor._max_reduce_prompt_chars()
+    result = processor.summarize_chunks(client, _content(), prompt, "文本文件")
+    assert result[0][0].startswith("分析要求过长")
+    assert client.requests == []
+
+
+def test_response_cache_off_requests_again_after_success():
+    client = FakeClient(lambda content: "结论")
+    processor = _processor()
+    processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+    first_run = len(client.requests)
+    assert first_run > 0
+    assert len(partial_results) == 0
+
+    # 开启响应缓存时相同请求直接命中缓存
+    processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+    assert len(client.requests) == first_run
+
+    processor = _processor(response_cache=False)
+    processor.summarize_chunks(client, _content(), "总结要点", "文本文件")
+    assert len(client.requests) == first_run * 2
@@ -0,0 +1,87 @@
+"""
+视觉请求图片编码测试：字节预算内的质量二分搜索、继续缩小的循环在小图和极宽图上终止
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from bennodes.utils.image import image_utils
+from bennodes.utils.image.image_utils import UPLOAD_MAX_QUALITY, UPLOAD_MIN_QUALITY, encode_image_for_upload
+
+
+def _noise(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def _decoded_size(data):
+    return Image.open(io.BytesIO(data)).size
+
+
+def _record_qualities(monkeypatch):
+    calls = []
+    original = image_utils._encode_upload
+
+    def recording(pil_image, pil_format, quality):
+        data = original(pil_image, pil_format, quality)
+        calls.append((pil_image.size, quality, len(data)))
+        return data
+    monkeypatch.setattr(image_utils, "_encode_upload", recording)
+    return calls
+
+
+def test_fits_without_reencoding():
+    data, mime_type = encode_image_for_upload(_noise(64, 48), 10 * 1024 * 1024)
+    assert mime_type == "image/jpeg"
+    assert _decoded_size(data) == (64, 48)
+
+
+def test_limits_longest_side():
+    data, _ = encode_image_for_upload(_noise(400, 100), 10 * 1024 * 1024, max_px=200)
+    assert _decoded_size(data) == (200, 50)
+
+
+@pytest.mark.parametrize("image_format", ["jpeg", "webp"])
+def test_quality_search_meets_budget(monkeypatch, image_format):
+    image = _noise(256, 256)
+    full = len(image_utils._encode_upload(image, image_format.upper(), UPLOAD_MAX_QUALITY))
+    lowest = len(image_utils._encode_upload(image, image_format.upper(), UPLOAD_MIN_QUALITY))
+    max_bytes = (full + lowest) // 2
+    calls = _record_qualities(monkeypatch)
+
+    data, _ = encode_image_for_upload(image, max_bytes, image_format=image_format)
+    assert len(data) <= max_bytes
+    # 只降低质量，不缩小尺寸；选中的是搜索过程中预算内的最高质量
+    assert _decoded_size(data) == (256, 256)
+    fitting = [quality for _, quality, size in calls if size <= max_bytes]
+    assert fitting and all(size > max_bytes for _, quality, size in calls if quality > max(fitting))
+    # 二分搜索：请求次数随质量范围对数增长
+    assert len(calls) <= 1 + (UPLOAD_MAX_QUALITY - UPLOAD_MIN_QUALITY).bit_length()
+
+
+def test_shrinks_when_lowest_quality_is_too_large():
+    image = _noise(512, 512)
+    lowest = len(image_utils._encode_upload(image, "JPEG", UPLOAD_MIN_QUALITY))
+    data, _ = encode_image_for_upload(image, lowest // 3)
+    assert len(data) <= lowest // 3
+    width, height = _decoded_size(data)
+    assert width == height < 512
+
+
+def test_png_shrinks_until_within_budget():
+    image = _noise(256, 256)
+    data, mime_type = encode_image_for_upload(image, 40 * 1024, image_format="png")
+    assert mime_type == "image/png"
+    assert len(data) <= 40 * 1024
+    assert _decoded_size(data)[0] < 256
+
+
+@pytest.mark.parametrize("size", [(1, 1), (16, 16), (20000, 20), (24, 6000)])
+def test_shrink_loop_stops_on_tiny_or_thin_images(size):
+    """预算无法满足时在短边缩到 16 像素以内后停止，返回当时的编码结果"""
+    data, _ = encode_image_for_upload(_noise(*size), 1, max_px=0)
+    width, height = _decoded_size(data)
+    assert min(width, height) <= 16 or min(width, height) == min(size)
+    assert width / height == pytest.approx(size[0] / size[1], rel=0.2)
@@ -0,0 +1,121 @@
+"""
+ComfyUI-BenNodes GLM 客户端池
+按 API 密钥、服务地址和连接参数复用 ZhipuAI 客户端及其底层 httpx 连接池，
+同一次执行中的分块、批量请求以及之后的执行都复用已建立的 keep-alive 连接，不再每次握手。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import httpx
+from zhipuai import ZhipuAI
+
+# 未配置服务地址时与 ZhipuAI SDK 相同：先读环境变量，再使用官方地址
+BASE_URL_ENV = "ZHIPUAI_BASE_URL"
+DEFAULT_BASE_URL = "https://open.bigmodel.cn/api/paas/v4"
+# 连接超时单独设置较短，读取超时使用配置值（思考模式的长回答可能需要数分钟）
+CONNECT_TIMEOUT = 10.0
+# 空闲连接保留时间（秒）
+KEEPALIVE_EXPIRY = 60.0
+# 最多保留的客户端数量（不同密钥/地址/参数的组合），超出时淘汰最久未用的
+MAX_CLIENTS = 16
+
+
+def resolve_base_url(base_url=""):
+    """实际请求的服务地址，客户端和响应缓存键都使用它"""
+    return (base_url or "").strip() or os.environ.get(BASE_URL_ENV) or DEFAULT_BASE_URL
+
+
+class _PooledClient:
+    """池中的一个客户端：ZhipuAI 客户端、它使用的 httpx 连接池，以及正在使用它的执行数"""
+
+    def __init__(self, client, http_client):
+        self.client = client
+        self.http_client = http_client
+        self.users = 0
+        # 已被淘汰：最后一个使用者归还时关闭
+        self.retired = False
+
+
+class GLMClientPool:
+    """线程安全的客户端池；httpx.Client 本身可被多个线程同时使用"""
+
+    def __init__(self, max_clients=MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @contextmanager
+    def lease(self, api_key, base_url="", timeout=300, pool_size=8):
+        """
+        在 with 块内使用复用的客户端；pool_size 为最多同时保持的连接数
+        被淘汰的客户端等所有使用者都退出 with 块后才关闭连接，不会中断其他线程上进行中的请求
+        """
+        pool_size = max(1, int(pool_size))
+        base_url = resolve_base_url(base_url)
+        key = (api_key, base_url, float(timeout), pool_size)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients.move_to_end(key)
+                self.reused += 1
+            else:
+                entry = self._create(api_key, base_url, timeout, pool_size)
+                self._clients[key] = entry
+                self.created += 1
+                while len(self._clients) > self.max_clients:
+                    _, evicted = self._clients.popitem(last=False)
+                    self._retire(evicted)
+            entry.users += 1
+        try:
+            yield entry.client
+        finally:
+            with self._lock:
+                entry.users -= 1
+                close_now = entry.retired and entry.users == 0
+            if close_now:
+                entry.http_client.close()
+
+    def _retire(self, entry):
+        """从池中移除后调用（持有锁）：没有使用者时立即关闭，否则交给最后一个使用者关闭"""
+        entry.retired = True
+        if entry.users == 0:
+            entry.http_client.close()
+
+    def _create(self, api_key, base_url, timeout, pool_size):
+        http_client = httpx.Client(
+            timeout=httpx.Timeout(float(timeout), connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        client = ZhipuAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=httpx.Timeout(float(timeout), connect=CONNECT_TIMEOUT),
+            http_client=http_client,
+        )
+        return _PooledClient(client, http_client)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    def close(self):
+        with self._lock:
+            for entry in self._clients.values():
+                self._retire(entry)
+            self._clients.clear()
+
+
+glm_client_pool = GLMClientPool()
@@ -0,0 +1,51 @@
+"""
+ComfyUI-BenNodes 分块汇总的部分结果
+分块分析、压缩和逐层汇总中每个成功的请求结果按请求摘要保存在内存中（条目数有上限，最久未用的先淘汰）。
+中途失败或被中断后重新执行时只请求尚未完成的部分；汇总成功后清除，与可关闭的响应磁盘缓存相互独立。
+"""
+
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+
+
+class PartialResults:
+    """请求摘要 → 模型输出文本的 LRU 表"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, keys):
+        """删除一次汇总用到的全部条目"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# 全局实例
+partial_results = PartialResults()
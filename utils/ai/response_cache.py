@@ -0,0 +1,102 @@
+"""
+ComfyUI-BenNodes 模型响应磁盘缓存
+按服务地址和请求内容（模型、采样参数、thinking 开关、系统提示词和消息，消息中包含图片/视频的 base64 数据）的摘要保存模型返回的文本。
+图中其他部分变化导致重新执行时，相同请求直接返回缓存结果，服务器重启后依然有效。
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from ..file.disk_cache import DiskCache, LazyInstance, budget_from_env, cache_directory, touch
+
+# 缓存目录和容量（MB）可通过环境变量调整
+CACHE_DIR_ENV = "BENNODES_RESPONSE_CACHE_DIR"
+CACHE_BUDGET_ENV = "BENNODES_RESPONSE_CACHE_MB"
+DEFAULT_BUDGET_MB = 256
+# 每写入这么多条目检查一次容量
+TRIM_INTERVAL = 64
+# 缓存格式变化时递增，旧条目自然失效
+CACHE_VERSION = 2
+CACHE_SUFFIX = ".json"
+
+
+def make_request_key(*params):
+    """由决定模型输出的全部请求参数生成缓存键"""
+    raw = json.dumps((CACHE_VERSION,) + params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(DiskCache):
+    """每个响应保存为一个 JSON 文件，按过期时间和最近使用时间淘汰"""
+
+    suffix = CACHE_SUFFIX
+    label = "响应缓存"
+
+    def __init__(self, directory, max_bytes):
+        super().__init__(directory, max_bytes, trim_interval=TRIM_INTERVAL)
+        self.expired = 0
+
+    def get(self, key, ttl=None):
+        """命中且未超过 ttl 秒时返回缓存的文本，否则返回 None；ttl 为 None 或 0 表示不过期"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            text = entry["text"]
+            created = entry.get("created", 0)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._count("misses")
+            return None
+        if ttl and time.time() - created > ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+                self.expired += 1
+            return None
+        touch(path)
+        self._count("hits")
+        return text
+
+    def put(self, key, text):
+        entry = {"created": time.time(), "text": text}
+        self._write(key, lambda f: json.dump(entry, f, ensure_ascii=False), binary=False)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats["expired"] = self.expired
+        return stats
+
+
+def _create_response_cache():
+    # 启动时按容量清理一次
+    cache = ResponseCache(cache_directory(CACHE_DIR_ENV, "responses"), budget_from_env(CACHE_BUDGET_ENV, DEFAULT_BUDGET_MB))
+    cache.trim()
+    return cache
+
+
+# 返回全局响应缓存（首次使用时创建目录并按容量清理一次）
+get_response_cache = LazyInstance(_create_response_cache)
+
+
+def cached_response(request_params, request_fn, use_cache=True, ttl_hours=0, base_url=""):
+    """
+    带缓存的模型请求：request_params 为决定输出的全部请求参数，request_fn 无参数、返回模型输出文本
+    base_url 为实际请求的服务地址，不同服务上同名模型的响应互不命中
+    use_cache 为 False 时跳过读取、总是重新请求，但结果仍写入缓存；只缓存成功的响应（request_fn 抛出异常时不写入）
+    """
+    cache = get_response_cache()
+    key = make_request_key(base_url, request_params)
+    if use_cache:
+        text = cache.get(key, ttl=ttl_hours * 3600 if ttl_hours else None)
+        if text is not None:
+            print("命中响应缓存，跳过API请求")
+            return text
+    text = request_fn()
+    cache.put(key, text)
+    return text
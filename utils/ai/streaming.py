@@ -0,0 +1,197 @@
+"""
+ComfyUI-BenNodes GLM 请求执行
+流式模式下逐块读取模型输出，把部分文本和 token 数通过 PromptServer 推送到前端节点，
+记录首 token 时间（TTFT）和总时长；用户在界面中取消执行时立即关闭所有打开的连接，不再等待整段回答生成完毕。
+"""
+
+import socket
+import threading
+import time
+
+try:
+    from server import PromptServer
+    PROMPT_SERVER_AVAILABLE = True
+except ImportError:
+    PROMPT_SERVER_AVAILABLE = False
+
+try:
+    import comfy.model_management
+    INTERRUPT_AVAILABLE = True
+except ImportError:
+    INTERRUPT_AVAILABLE = False
+
+# 前端监听的事件名
+PROGRESS_EVENT = "bennodes.glm.progress"
+# 推送间隔（秒），避免每个 token 都发一次消息
+PROGRESS_INTERVAL = 0.25
+# 推送给前端的文本只保留末尾部分
+PROGRESS_TAIL_CHARS = 2000
+# 有流式请求进行时检查取消标志的间隔（秒）
+INTERRUPT_POLL_INTERVAL = 0.1
+
+
+def is_interrupt(error):
+    """是否为用户取消执行（需要继续向上抛出，不能当作普通请求失败处理）"""
+    return INTERRUPT_AVAILABLE and isinstance(error, comfy.model_management.InterruptProcessingException)
+
+
+def interrupted():
+    """
+    是否已取消执行。只读取标志而不清除：同时进行的多个请求都要能看到取消，
+    throw_exception_if_processing_interrupted 会在第一个请求抛出时清除标志，其余请求继续生成
+    """
+    return INTERRUPT_AVAILABLE and comfy.model_management.processing_interrupted()
+
+
+def _check_interrupt():
+    if interrupted():
+        raise comfy.model_management.InterruptProcessingException()
+
+
+# 当前打开的流式请求；取消执行时由监视线程统一关闭，阻塞在读取上的请求也会立即结束
+_open_streams = set()
+_streams_lock = threading.Lock()
+_watcher = None
+
+
+def _abort_stream(stream):
+    """
+    从其他线程中止流式读取：关闭连接不会唤醒阻塞在 recv 上的线程，需要先 shutdown 底层 socket。
+    读取线程随即报错退出，并在自己的 finally 中关闭响应
+    """
+    network_stream = stream.response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+    else:
+        stream.response.close()
+
+
+def _close_open_streams():
+    with _streams_lock:
+        streams = list(_open_streams)
+    for stream in streams:
+        try:
+            _abort_stream(stream)
+        except Exception:
+            pass
+
+
+def _watch_streams():
+    """有打开的流时定期检查取消标志，没有打开的流时退出"""
+    global _watcher
+    while True:
+        time.sleep(INTERRUPT_POLL_INTERVAL)
+        with _streams_lock:
+            if not _open_streams:
+                _watcher = None
+                return
+        if interrupted():
+            _close_open_streams()
+
+
+def _register_stream(stream):
+    global _watcher
+    with _streams_lock:
+        _open_streams.add(stream)
+        if _watcher is None and INTERRUPT_AVAILABLE:
+            _watcher = threading.Thread(target=_watch_streams, name="BenNodes-stream-watch", daemon=True)
+            _watcher.start()
+
+
+def _unregister_stream(stream):
+    with _streams_lock:
+        _open_streams.discard(stream)
+
+
+def _send_progress(node_id, data):
+    if not PROMPT_SERVER_AVAILABLE or node_id is None:
+        return
+    try:
+        PromptServer.instance.send_sync(PROGRESS_EVENT, dict(data, node=node_id))
+    except Exception:
+        # 界面推送失败不影响请求本身
+        pass
+
+
+def run_completion(client, request_params, config, label=""):
+    """
+    执行一次对话请求并返回模型输出文本
+    config 中 stream 为 True 时使用流式请求并推送进度（node_id 为推送目标节点）；否则一次性请求
+    """
+    # 已取消时不再发出新的请求（并发执行中排在后面的请求）
+    _check_interrupt()
+    start_time = time.time()
+    if not config.get('stream', True):
+        response = client.chat.completions.create(**request_params)
+        print(f"API请求时长：{time.time() - start_time:.2f}秒")
+        return response.choices[0].message.content
+
+    node_id = config.get('node_id')
+    stream = client.chat.completions.create(stream=True, **request_params)
+    _register_stream(stream)
+    content = []
+    reasoning_chars = 0
+    tokens = 0
+    usage_tokens = None
+    first_token_time = None
+    last_sent = 0.0
+    try:
+        for chunk in stream:
+            _check_interrupt()
+            if chunk.usage is not None:
+                usage_tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if not delta.content and not delta.reasoning_content:
+                continue
+            if first_token_time is None:
+                first_token_time = time.time()
+            # 每个增量块约对应一个 token，结束时以接口返回的 usage 为准
+            tokens += 1
+            if delta.reasoning_content:
+                reasoning_chars += len(delta.reasoning_content)
+            if delta.content:
+                content.append(delta.content)
+            now = time.time()
+            if now - last_sent >= PROGRESS_INTERVAL:
+                last_sent = now
+                _send_progress(node_id, {
+                    "label": label,
+                    "text": "".join(content)[-PROGRESS_TAIL_CHARS:],
+                    "thinking": not content,
+                    "reasoning_chars": reasoning_chars,
+                    "tokens": tokens,
+                    "ttft": first_token_time - start_time,
+                    "elapsed": now - start_time,
+                    "done": False,
+                })
+    except Exception as e:
+        # 连接被监视线程关闭时读取会报错，按取消处理，不作为普通请求失败
+        if not is_interrupt(e) and interrupted():
+            raise comfy.model_management.InterruptProcessingException() from e
+        raise
+    finally:
+        # 正常结束时连接归还连接池；取消或出错时关闭连接，服务端停止生成
+        _unregister_stream(stream)
+        stream.response.close()
+    # 流被关闭后迭代也可能直接结束，不能把不完整的输出当作结果返回（并写入缓存）
+    _check_interrupt()
+
+    text = "".join(content)
+    total_time = time.time() - start_time
+    ttft = first_token_time - start_time if first_token_time is not None else total_time
+    tokens = usage_tokens if usage_tokens is not None else tokens
+    _send_progress(node_id, {
+        "label": label,
+        "text": text[-PROGRESS_TAIL_CHARS:],
+        "thinking": False,
+        "reasoning_chars": reasoning_chars,
+        "tokens": tokens,
+        "ttft": ttft,
+        "elapsed": total_time,
+        "done": True,
+    })
+    print(f"API请求时长：{total_time:.2f}秒（首token {ttft:.2f}秒，{tokens} tokens）")
+    return text
@@ -0,0 +1,140 @@
+"""
+ComfyUI-BenNodes 文本分块
+按文字类别估算 token 数（中日韩文字每个字约 0.7 token，英文约 4 个字母 1 token），
+优先在段落、行、句子边界切分，把每块尽量填满模型的 token 预算，相邻块之间可保留少量重叠。
+"""
+
+import re
+from functools import lru_cache
+
+# 各类字符的 token 估算系数（偏保守，宁可多分一块也不超出上下文）
+CJK_TOKENS_PER_CHAR = 0.7
+LETTER_TOKENS_PER_CHAR = 0.25
+DIGIT_TOKENS_PER_CHAR = 0.4
+SYMBOL_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.5
+
+_CJK_RE = re.compile("[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+_LETTER_RE = re.compile(r"[A-Za-z]")
+_DIGIT_RE = re.compile(r"[0-9]")
+_SYMBOL_RE = re.compile(r"[!-/:-@\[-`{-~]")
+_SPACE_RE = re.compile(r"\s")
+
+# 依次尝试的切分边界：段落、行、句子（分隔符保留在前一段末尾，拼接后与原文完全一致）
+_PARAGRAPH_RE = re.compile(r"(?<=\n\n)")
+_LINE_RE = re.compile(r"(?<=\n)")
+_SENTENCE_RE = re.compile(r"(?<=[。！？；!?;])|(?<=\.)(?=\s)")
+
+
+def estimate_tokens(text):
+    """按文字类别估算 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    letters = len(_LETTER_RE.findall(text))
+    digits = len(_DIGIT_RE.findall(text))
+    symbols = len(_SYMBOL_RE.findall(text))
+    spaces = len(_SPACE_RE.findall(text))
+    other = len(text) - cjk - letters - digits - symbols - spaces
+    return int(
+        cjk * CJK_TOKENS_PER_CHAR
+        + letters * LETTER_TOKENS_PER_CHAR
+        + digits * DIGIT_TOKENS_PER_CHAR
+        + symbols * SYMBOL_TOKENS_PER_CHAR
+        + other * OTHER_TOKENS_PER_CHAR
+    ) + 1
+
+
+@lru_cache(maxsize=65536)
+def _char_tokens(ch):
+    """单个字符的 token 估算系数，与 estimate_tokens 的分类一致"""
+    if _CJK_RE.match(ch):
+        return CJK_TOKENS_PER_CHAR
+    if _LETTER_RE.match(ch):
+        return LETTER_TOKENS_PER_CHAR
+    if _DIGIT_RE.match(ch):
+        return DIGIT_TOKENS_PER_CHAR
+    if _SYMBOL_RE.match(ch):
+        return SYMBOL_TOKENS_PER_CHAR
+    if _SPACE_RE.match(ch):
+        return 0
+    return OTHER_TOKENS_PER_CHAR
+
+
+def _hard_cut(piece, max_tokens):
+    """
+    逐字符累加 token 系数切分没有边界可用的片段，中英混排时每段也不会超出预算
+    （estimate_tokens 为累加值取整后加 1，所以每段累加值保持在 max_tokens - 1 以内）
+    """
+    limit = max_tokens - 1
+    parts = []
+    start = 0
+    used = 0.0
+    for i, ch in enumerate(piece):
+        weight = _char_tokens(ch)
+        if used + weight > limit and i > start:
+            parts.append(piece[start:i])
+            start = i
+            used = 0.0
+        used += weight
+    parts.append(piece[start:])
+    return parts
+
+
+def _split_keep(text, pattern):
+    return [part for part in pattern.split(text) if part]
+
+
+def _split_units(text, max_tokens):
+    """把文本拆成每段都不超过 max_tokens 的片段（段落 → 行 → 句子 → 按字符硬切）"""
+    units = []
+    pending = [(text, 0)]
+    patterns = (_PARAGRAPH_RE, _LINE_RE, _SENTENCE_RE)
+    while pending:
+        piece, level = pending.pop()
+        tokens = estimate_tokens(piece)
+        if tokens <= max_tokens:
+            units.append((piece, tokens))
+            continue
+        if level < len(patterns):
+            parts = _split_keep(piece, patterns[level])
+            if len(parts) > 1:
+                # 倒序压栈，保证出栈顺序与原文一致
+                pending.extend((part, level + 1) for part in reversed(parts))
+            else:
+                pending.append((piece, level + 1))
+            continue
+        # 没有可用边界（超长单行或单句）：按字符累加 token 数硬切
+        for part in _hard_cut(piece, max_tokens):
+            units.append((part, estimate_tokens(part)))
+    return units
+
+
+def split_into_chunks(text, max_tokens, overlap_tokens=0):
+    """
+    把文本切成估算 token 数不超过 max_tokens 的块
+    overlap_tokens > 0 时，每块开头重复上一块末尾不超过该 token 数的完整片段，保留上下文衔接
+    """
+    max_tokens = max(1, int(max_tokens))
+    overlap_tokens = max(0, min(int(overlap_tokens), max_tokens // 2))
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece, tokens in _split_units(text, max_tokens):
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(p for p, _ in current))
+            # 从上一块末尾取重叠片段
+            overlap = []
+            overlap_used = 0
+            for prev_piece, prev_tokens in reversed(current):
+                if overlap_used + prev_tokens > overlap_tokens or overlap_used + prev_tokens + tokens > max_tokens:
+                    break
+                overlap.insert(0, (prev_piece, prev_tokens))
+                overlap_used += prev_tokens
+            current = overlap
+            current_tokens = overlap_used
+        current.append((piece, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(p for p, _ in current))
+    return chunks
@@ -0,0 +1,97 @@
+"""
+ComfyUI-BenNodes 目录索引缓存
+用 os.scandir 列出目录并按目录 mtime 缓存，目录内容没有增删时不再重新扫描。
+节点的 INPUT_TYPES 每次构建 /object_info 都会调用，大目录下逐个 isfile 代价很高。
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+# files / dirs: 已排序的文件名和子目录名
+DirectoryListing = namedtuple("DirectoryListing", ["files", "dirs"])
+
+# 目录在这段时间（秒）内刚被修改时不信任缓存：粗粒度 mtime 的文件系统上，
+# 同一时间刻度内的后续修改不会改变 mtime
+MTIME_SETTLE_SECONDS = 2.0
+
+
+def _scan(path):
+    files, dirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                # 大多数文件系统由 d_type 直接给出类型，只有符号链接需要额外 stat
+                if entry.is_file():
+                    files.append(entry.name)
+                elif entry.is_dir():
+                    dirs.append(entry.name)
+            except OSError:
+                continue
+    return DirectoryListing(sorted(files), sorted(dirs))
+
+
+class DirectoryIndex:
+    """目录列表缓存，以 (mtime_ns, inode) 作为版本，派生结果（如按类型过滤）随版本一起失效"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.scans = 0
+        self.hits = 0
+
+    def _get_entry(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry["version"] == version and entry["trusted"]:
+                self.hits += 1
+                return entry
+        listing = _scan(path)
+        settled = time.time() - st.st_mtime_ns / 1e9 > MTIME_SETTLE_SECONDS
+        entry = {"version": version, "trusted": settled, "listing": listing, "derived": {}}
+        with self._lock:
+            self.scans += 1
+            self._entries[path] = entry
+        return entry
+
+    def listing(self, path):
+        """返回目录的 DirectoryListing（缓存对象，调用方不要修改）"""
+        return self._get_entry(path)["listing"]
+
+    def files(self, path):
+        """返回已排序的文件名列表（副本）"""
+        return list(self.listing(path).files)
+
+    def dirs(self, path):
+        """返回已排序的子目录名列表（副本）"""
+        return list(self.listing(path).dirs)
+
+    def derived(self, path, name, compute):
+        """
+        缓存基于目录列表计算出的结果，目录变化后重新计算
+        compute 接收 DirectoryListing，name 区分同一目录的不同派生结果
+        """
+        entry = self._get_entry(path)
+        derived = entry["derived"]
+        if name not in derived:
+            derived[name] = compute(entry["listing"])
+        return list(derived[name])
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {"directories": len(self._entries), "scans": self.scans, "hits": self.hits}
+
+
+# 全局实例，各节点共享
+directory_index = DirectoryIndex()
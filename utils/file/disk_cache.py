@@ -0,0 +1,169 @@
+"""
+ComfyUI-BenNodes 磁盘缓存公共部分
+张量缓存、模型响应缓存和图片清单共用：缓存目录位置、容量环境变量、原子写入、
+按最近使用时间淘汰，以及首次使用时才创建的全局实例。
+"""
+
+import os
+import threading
+
+try:
+    import folder_paths
+    FOLDER_PATHS_AVAILABLE = True
+except ImportError:
+    FOLDER_PATHS_AVAILABLE = False
+
+CACHE_ROOT_NAME = "bennodes_cache"
+
+
+def default_cache_directory(name):
+    """ComfyUI 用户目录下的 bennodes_cache/<name>；不在 ComfyUI 中运行时使用插件目录下的 cache/<name>"""
+    if FOLDER_PATHS_AVAILABLE and hasattr(folder_paths, "get_user_directory"):
+        return os.path.join(folder_paths.get_user_directory(), CACHE_ROOT_NAME, name)
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "cache", name)
+
+
+def cache_directory(env_name, name):
+    """环境变量指定的目录优先，否则使用默认缓存目录"""
+    return os.environ.get(env_name) or default_cache_directory(name)
+
+
+def budget_from_env(env_name, default_mb):
+    """从环境变量读取容量（MB），返回字节数"""
+    try:
+        budget_mb = int(os.environ.get(env_name, default_mb))
+    except ValueError:
+        print(f"{env_name} 不是整数，使用默认值 {default_mb}MB")
+        budget_mb = default_mb
+    return max(0, budget_mb) * 1024 * 1024
+
+
+def write_atomic(path, write_fn, binary=True):
+    """
+    先写入同目录的临时文件再原子替换，读取方不会看到写了一半的文件
+    write_fn 接收打开的文件对象；失败时删除临时文件并抛出 OSError
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if binary:
+            with open(tmp_path, "wb") as f:
+                write_fn(f)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                write_fn(f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def touch(path):
+    """修改时间作为最近使用时间，淘汰时按它排序（atime 常被 noatime 挂载关闭）"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+class DiskCache:
+    """
+    一个目录中每个条目一个文件（文件名为 键 + suffix），记录命中、写入和淘汰次数
+    trim_interval > 0 时每写入这么多条目自动按容量清理一次
+    """
+
+    suffix = ""
+    label = "磁盘缓存"
+
+    def __init__(self, directory, max_bytes, trim_interval=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.trim_interval = trim_interval
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _write(self, key, write_fn, binary=True):
+        """原子写入一个条目，返回是否成功；写入失败只打印提示"""
+        path = self._path(key)
+        try:
+            write_atomic(path, write_fn, binary)
+        except OSError as e:
+            print(f"无法写入{self.label} {path}: {e}")
+            return False
+        with self._lock:
+            self.writes += 1
+            self._writes_since_trim += 1
+            need_trim = 0 < self.trim_interval <= self._writes_since_trim
+            if need_trim:
+                self._writes_since_trim = 0
+        if need_trim:
+            self.trim()
+        return True
+
+    def trim(self):
+        """按最近使用时间删除最旧的条目，直到总大小不超过容量"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._count("evictions")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+class LazyInstance:
+    """首次调用时才由 factory 创建的全局实例（双重检查加锁，只创建一次）"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
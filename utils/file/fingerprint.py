@@ -0,0 +1,98 @@
+"""
+ComfyUI-BenNodes 文件指纹服务
+按 (路径, 大小, 修改时间ns, inode) 记住文件内容摘要，stat 不变时不再读取文件。
+供各节点的 IS_CHANGED 等变化检测使用。
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# 优先使用更快的哈希库，均不可用时退回标准库的 blake2b
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# 流式读取的块大小
+CHUNK_SIZE = 1024 * 1024
+MAX_ENTRIES = 4096
+
+
+def _new_hasher():
+    """返回 (算法名, 哈希对象)"""
+    if XXHASH_AVAILABLE:
+        return "xxh3_128", xxhash.xxh3_128()
+    if BLAKE3_AVAILABLE:
+        return "blake3", blake3.blake3()
+    return "blake2b", hashlib.blake2b(digest_size=32)
+
+
+def file_stat_key(path):
+    """文件的 stat 标识：(绝对路径, 大小, 修改时间ns, inode)"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return (path, st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def hash_file(path):
+    """流式计算文件摘要，返回 "算法:十六进制摘要" """
+    name, hasher = _new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return f"{name}:{hasher.hexdigest()}"
+
+
+class FileFingerprintService:
+    """文件摘要的 LRU 记忆表，stat 改变后自动重新计算"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, path):
+        key = file_stat_key(path)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                self.hits += 1
+                return digest
+            self.misses += 1
+        # 在锁外读文件，不阻塞其他文件的查询
+        digest = hash_file(key[0])
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def clear(self):
+        with self._lock:
+            self._digests.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._digests), "hits": self.hits, "misses": self.misses}
+
+
+# 全局实例
+fingerprint_service = FileFingerprintService()
+
+
+def file_fingerprint(path):
+    """返回文件内容摘要（stat 未变化时直接使用记忆的结果）"""
+    return fingerprint_service.fingerprint(path)
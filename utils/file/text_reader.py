@@ -0,0 +1,96 @@
+"""
+ComfyUI-BenNodes 文本文件读取
+只根据文件开头和分布在文件中的几段有限样本判断编码，然后对内存映射的文件逐块增量解码，
+需要的字符数读够即停止，大文件只分析第一块时不必读取和解码整个文件。
+"""
+
+import codecs
+import mmap
+import os
+
+# 与原先逐个尝试的编码顺序一致（gb2312 是 gbk 的子集，无需单独尝试）
+CANDIDATE_ENCODINGS = ("utf-8", "gbk")
+FALLBACK_ENCODING = "latin-1"
+# 编码检测：文件开头的样本大小，以及在文件其余部分均匀抽取的样本数和大小
+HEAD_SAMPLE_BYTES = 64 * 1024
+SPREAD_SAMPLES = 8
+SPREAD_SAMPLE_BYTES = 16 * 1024
+# 增量解码的块大小
+DECODE_BLOCK_BYTES = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _decodes(data, encoding, at_start):
+    """样本能否用该编码无错误解码；样本首尾可能截断在多字节字符中间"""
+    if encoding == "utf-8" and not at_start:
+        # UTF-8 可自同步：跳过开头不完整字符的后续字节
+        start = 0
+        while start < min(4, len(data)) and (data[start] & 0xC0) == 0x80:
+            start += 1
+        data = data[start:]
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+    try:
+        decoder.decode(data, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(buffer):
+    """根据 BOM 和有限样本判断编码，buffer 为 bytes 或 mmap"""
+    size = len(buffer)
+    head = bytes(buffer[:HEAD_SAMPLE_BYTES])
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    samples = []
+    if size > HEAD_SAMPLE_BYTES:
+        stride = (size - HEAD_SAMPLE_BYTES) // SPREAD_SAMPLES
+        for i in range(1, SPREAD_SAMPLES + 1):
+            offset = min(size - SPREAD_SAMPLE_BYTES, HEAD_SAMPLE_BYTES + i * stride - SPREAD_SAMPLE_BYTES)
+            if offset > HEAD_SAMPLE_BYTES:
+                samples.append(bytes(buffer[offset:offset + SPREAD_SAMPLE_BYTES]))
+
+    for encoding in CANDIDATE_ENCODINGS:
+        if not _decodes(head, encoding, at_start=True):
+            continue
+        # 双字节编码在样本中间起始时无法对齐字符边界，只用开头样本判断
+        if encoding == "utf-8" and not all(_decodes(sample, encoding, at_start=False) for sample in samples):
+            continue
+        return encoding
+    return FALLBACK_ENCODING
+
+
+def read_text(path, max_chars=None):
+    """
+    读取文本文件，返回 (文本, 编码, 是否截断)
+    max_chars 为 None 时读取整个文件；否则最多解码 max_chars 个字符，超出部分不读取
+    样本之外出现的个别非法字节以替换字符代替，不会因此整文件重新读取
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return "", "utf-8", False
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            encoding = detect_encoding(buffer)
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            parts = []
+            decoded = 0
+            offset = 0
+            while offset < size:
+                block = buffer[offset:offset + DECODE_BLOCK_BYTES]
+                offset += len(block)
+                text = decoder.decode(block, final=offset >= size)
+                if max_chars is not None and decoded + len(text) > max_chars:
+                    parts.append(text[:max_chars - decoded])
+                    return "".join(parts), encoding, True
+                parts.append(text)
+                decoded += len(text)
+            return "".join(parts), encoding, False
@@ -0,0 +1,125 @@
+"""
+ComfyUI-BenNodes 解码图像缓存
+进程内共享的 LRU 缓存，保存解码后、缩放前的 uint8 帧（RGB，或 alpha 放在第四通道的 RGBX）。
+只改缩放模式、位置、羽化等参数时不必重新解码源文件。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from ..file.fingerprint import file_stat_key
+
+# 缓存容量（MB），可通过环境变量调整，0 表示禁用
+CACHE_BUDGET_ENV = "BENNODES_DECODE_CACHE_MB"
+DEFAULT_BUDGET_MB = 1024
+# EXIF方向记录很小，只按条数限制
+MAX_ORIENTATION_ENTRIES = 4096
+
+
+def file_cache_key(path):
+    """
+    文件的缓存标识：(绝对路径, 大小, 修改时间ns, inode)
+    文件被覆盖或替换后标识随之改变，旧条目不会再命中，最终被LRU淘汰
+    """
+    return file_stat_key(path)
+
+
+class DecodedImageCache:
+    """按字节预算淘汰的 LRU 缓存，值为 (PIL帧, 是否含alpha)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        # 文件的EXIF方向。PNG 的 eXIf 块可能在像素数据之后，读取方向会触发完整解码，
+        # 记下来才能让缓存命中时完全不读像素
+        self._orientations = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _frame_bytes(frame):
+        return frame.size[0] * frame.size[1] * len(frame.getbands())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, frame, has_alpha):
+        size = self._frame_bytes(frame)
+        if size > self.max_bytes:
+            # 单帧超过整个预算时不缓存，避免把其他条目全部挤出
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (frame, has_alpha, size)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def get_orientation(self, file_key):
+        with self._lock:
+            orientation = self._orientations.get(file_key)
+            if orientation is not None:
+                self._orientations.move_to_end(file_key)
+            return orientation
+
+    def put_orientation(self, file_key, orientation):
+        with self._lock:
+            self._orientations[file_key] = orientation
+            self._orientations.move_to_end(file_key)
+            while len(self._orientations) > MAX_ORIENTATION_ENTRIES:
+                self._orientations.popitem(last=False)
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._orientations.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _budget_from_env():
+    try:
+        budget_mb = int(os.environ.get(CACHE_BUDGET_ENV, DEFAULT_BUDGET_MB))
+    except ValueError:
+        print(f"{CACHE_BUDGET_ENV} 不是整数，使用默认值 {DEFAULT_BUDGET_MB}MB")
+        budget_mb = DEFAULT_BUDGET_MB
+    return max(0, budget_mb) * 1024 * 1024
+
+
+# 全局实例
+decoded_image_cache = DecodedImageCache(_budget_from_env())
@@ -0,0 +1,76 @@
+"""
+ComfyUI-BenNodes 解码规划
+目标尺寸远小于原图时，在解码阶段就按 1/2、1/4、1/8 缩小，避免先完整解码再缩放
+"""
+
+from collections import namedtuple
+
+from .image_utils import ImageScaleUtils, get_exif_orientation
+
+# source_size: 原图（按EXIF方向校正后）的尺寸，布局始终按它计算，保证输出尺寸与完整解码一致
+# reduce_factor: 解码后还需要用 Image.reduce 做的整数倍缩小
+DecodePlan = namedtuple("DecodePlan", ["source_size", "reduce_factor"])
+
+# 解码缩小后至少保留目标尺寸的这么多倍，最终重采样仍有足够的源像素（与 PIL thumbnail 一致）
+REDUCING_GAP = 2.0
+REDUCE_FACTORS = (8, 4, 2)
+
+# EXIF 方向 5~8 表示图像需要旋转90度，宽高互换
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def get_oriented_size(img, cache_key=None):
+    """读取文件头中的尺寸，并按EXIF方向校正宽高"""
+    width, height = img.size
+    if get_exif_orientation(img, cache_key) in TRANSPOSED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def choose_reduce_factor(source_size, needed_size):
+    """选择不损失最终画质的最大缩小倍数"""
+    needed_width, needed_height = needed_size
+    if needed_width <= 0 or needed_height <= 0:
+        return 1
+    ratio = min(source_size[0] / needed_width, source_size[1] / needed_height)
+    for factor in REDUCE_FACTORS:
+        if ratio >= factor * REDUCING_GAP:
+            return factor
+    return 1
+
+
+def plan_decode(img, resize_mode, target_width, target_height, position="center", cache_key=None, exif_transpose=True):
+    """
+    在像素解码之前规划缩小倍数。
+    JPEG 通过 Image.draft 直接以缩小后的尺寸解码；其他格式解码后用 Image.reduce 快速缩小，
+    最终的高质量重采样仍由缩放模式完成。
+
+    Args:
+        img: 刚打开、尚未加载像素的 PIL Image
+        resize_mode: "none", "contain", "pad", "crop", "fill"
+        target_width: Target width
+        target_height: Target height
+        position: Position for crop/pad
+        cache_key: Optional decode_cache.file_cache_key(path), memoizes the EXIF orientation
+        exif_transpose: 与 process_image_for_comfy 的同名参数一致；False 时按文件原始方向规划
+
+    Returns:
+        DecodePlan: 传给 process_image_for_comfy 的 decode_plan 参数
+    """
+    source_size = get_oriented_size(img, cache_key) if exif_transpose else img.size
+    if resize_mode not in ("contain", "crop", "pad", "fill"):
+        return DecodePlan(source_size, 1)
+
+    layout = ImageScaleUtils.compute_layout(resize_mode, source_size[0], source_size[1], target_width, target_height, position)
+    factor = choose_reduce_factor(source_size, layout.resize_size)
+    if factor == 1:
+        return DecodePlan(source_size, 1)
+
+    if img.format == "JPEG":
+        # draft 按文件原始方向工作，请求尺寸向下取整才能让解码器选中该倍数
+        width, height = img.size
+        img.draft(img.mode, (max(1, width // factor), max(1, height // factor)))
+        return DecodePlan(source_size, 1)
+
+    return DecodePlan(source_size, factor)
+
@@ -0,0 +1,189 @@
+"""
+ComfyUI-BenNodes 文件夹图片清单
+为每个输入文件夹在缓存目录中保存一个清单文件，记录每张图片只需读取文件头即可获得的信息
+（尺寸、模式、格式、帧数、EXIF方向）以及大小和修改时间。
+每次使用时只重新读取 stat 发生变化的文件，批量加载前的尺寸计算、帧数统计和
+损坏文件过滤都无需解码像素。清单不写入输入文件夹，不会改变文件夹的修改时间。
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from PIL import Image
+
+from .image_utils import EXIF_ORIENTATION_TAG
+from .decode_planner import TRANSPOSED_ORIENTATIONS
+from ..file.disk_cache import default_cache_directory, write_atomic
+from ..system.executor import get_executor
+
+MANIFEST_SUFFIX = ".json"
+MANIFEST_VERSION = 2
+
+# error 不为 None 表示文件无法识别，stat 不变时不再重复尝试
+ImageInfo = namedtuple("ImageInfo", [
+    "name", "size", "mtime_ns", "width", "height", "mode", "format",
+    "n_frames", "orientation", "error",
+])
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _read_png_exif(path):
+    """
+    逐块跳读 PNG，找到 eXIf 块。Pillow 在 eXIf 位于像素数据之后时需要完整解码才能读到，
+    这里只按块长度 seek，不读取像素数据
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type == b"eXIf":
+                return f.read(length)
+            if chunk_type == b"IEND":
+                return None
+            f.seek(length + 4, os.SEEK_CUR)
+
+
+def _read_orientation(img, path):
+    """只读文件头获取EXIF方向"""
+    try:
+        if img.format == "PNG" and "exif" not in img.info:
+            data = _read_png_exif(path)
+            if data is None:
+                return 1
+            exif = Image.Exif()
+            exif.load(data)
+            return exif.get(EXIF_ORIENTATION_TAG, 1)
+        return img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    except Exception:
+        return 1
+
+
+def read_image_info(path, st=None):
+    """读取单个文件的清单条目（只读文件头）"""
+    st = st or os.stat(path)
+    name = os.path.basename(path)
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            n_frames = 1 if img.format == "MPO" else getattr(img, "n_frames", 1)
+            info = ImageInfo(
+                name, st.st_size, st.st_mtime_ns, width, height, img.mode, img.format,
+                n_frames, _read_orientation(img, path), None,
+            )
+    except Exception as e:
+        info = ImageInfo(name, st.st_size, st.st_mtime_ns, 0, 0, None, None, 0, 1, str(e))
+    return info
+
+
+def stat_key(path, info):
+    """文件的 stat 标识（绝对路径、大小、修改时间），用作派生缓存的键，无需读取文件内容"""
+    return (os.path.abspath(path), info.size, info.mtime_ns)
+
+
+def manifest_path(folder):
+    """文件夹清单在缓存目录中的路径，按文件夹绝对路径的摘要命名"""
+    digest = hashlib.sha256(os.path.abspath(folder).encode("utf-8")).hexdigest()
+    return os.path.join(default_cache_directory("manifests"), digest + MANIFEST_SUFFIX)
+
+
+def oriented_size(info):
+    """按EXIF方向校正后的 (宽, 高)"""
+    if info.orientation in TRANSPOSED_ORIENTATIONS:
+        return info.height, info.width
+    return info.width, info.height
+
+
+class FolderManifest:
+    """单个文件夹的清单，内存中常驻，变化时写回缓存目录中的清单文件"""
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = manifest_path(self.folder)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("folder") == self.folder:
+                self.entries = {name: ImageInfo(name, *values) for name, values in data["entries"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    def _save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "folder": self.folder,
+            "entries": {name: list(info[1:]) for name, info in self.entries.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_atomic(self.path, lambda f: json.dump(data, f, ensure_ascii=False, separators=(",", ":")), binary=False)
+        except OSError as e:
+            # 缓存目录不可写时清单只保存在内存中
+            print(f"无法写入图片清单 {self.path}: {e}")
+
+    def refresh(self, names, existing=None):
+        """
+        返回 names 对应的清单条目（顺序一致，已不存在的文件跳过）
+        只有新增或 stat 变化的文件才重新读取文件头，读取在锁外并行进行。
+        existing 为文件夹中当前的全部文件名，不在其中的条目会被移除
+        """
+        stats = {}
+        for name in names:
+            try:
+                stats[name] = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+
+        stale = []
+        with self._lock:
+            for name, st in stats.items():
+                entry = self.entries.get(name)
+                if entry is None or entry.size != st.st_size or entry.mtime_ns != st.st_mtime_ns:
+                    stale.append(name)
+
+        infos = []
+        if stale:
+            infos = get_executor().map(
+                read_image_info,
+                [os.path.join(self.folder, name) for name in stale],
+                [stats[name] for name in stale],
+            )
+
+        with self._lock:
+            for info in infos:
+                self.entries[info.name] = info
+            existing = set(existing) if existing is not None else set(self.entries)
+            removed = [name for name in self.entries if name not in existing and name not in stats]
+            for name in removed:
+                del self.entries[name]
+            if infos or removed:
+                self._save()
+            return [self.entries[name] for name in names if name in stats]
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_folder_manifest(folder):
+    """返回文件夹的清单对象（同一进程内共享）"""
+    folder = os.path.abspath(folder)
+    with _manifests_lock:
+        manifest = _manifests.get(folder)
+        if manifest is None:
+            manifest = FolderManifest(folder)
+            _manifests[folder] = manifest
+        return manifest
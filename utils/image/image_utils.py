@@ -3,9 +3,17 @@ ComfyUI-BenNodes Shared Utilities
 Contains image scaling logic and common processing functions
 """
 
+import base64
+import io
+import threading
 import torch
 import numpy as np
-from PIL import Image, ImageOps, ImageSequence
+from collections import namedtuple, OrderedDict
+from functools import partial
+from PIL import Image
+
+from .decode_cache import decoded_image_cache
+from ..system.executor import get_executor
 
 try:
     import node_helpers
@@ -19,6 +27,50 @@ except ImportError:
             return func(*args, **kwargs)
     node_helpers = MockNodeHelpers()
 
+# 缩放布局：缩放后尺寸、裁剪框、画布上的粘贴框、最终画布尺寸
+ScaleLayout = namedtuple("ScaleLayout", ["resize_size", "crop_box", "paste_box", "canvas_size"])
+
+# EXIF 方向及对应的转置操作（与 ImageOps.exif_transpose 一致）
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_TRANSPOSE_METHODS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def get_exif_orientation(img, cache_key=None):
+    """
+    读取EXIF方向，没有或无法解析时返回1（正常方向）
+    传入 cache_key（decode_cache.file_cache_key）时结果记录在解码缓存中
+    """
+    if cache_key is not None:
+        orientation = decoded_image_cache.get_orientation(cache_key)
+        if orientation is not None:
+            return orientation
+    try:
+        orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    except Exception:
+        orientation = 1
+    if cache_key is not None:
+        decoded_image_cache.put_orientation(cache_key, orientation)
+    return orientation
+
+
+def select_frame_indices(total_frames, frame_start=0, frame_count=0, frame_stride=1):
+    """
+    按起始帧、帧数和步长选出需要解码的帧序号
+    frame_count 为0表示取到最后一帧
+    """
+    indices = range(max(0, frame_start), total_frames, max(1, frame_stride))
+    if frame_count > 0:
+        indices = indices[:frame_count]
+    return indices
+
 class ImageScaleUtils:
     """
     提供各种图片缩放相关的工具方法
@@ -33,39 +85,139 @@ class ImageScaleUtils:
     from PIL import ImageFilter
     
     @staticmethod
-    def resize_contain(img, target_width, target_height, feathering, upscale_method="bicubic"):
+    def get_resample_method(upscale_method="bicubic"):
+        """根据upscale_method选择PIL插值方法"""
+        if upscale_method == "bilinear":
+            return Image.Resampling.BILINEAR
+        elif upscale_method == "lanczos":
+            return Image.Resampling.LANCZOS
+        return Image.Resampling.BICUBIC
+
+    @staticmethod
+    def compute_layout(scale_mode, img_width, img_height, target_width, target_height, position="center"):
         """
-        contain: 保持原图宽高比，让图像的大边与目标尺寸对齐，小边根据大边的缩放比例计算。
-        返回的是缩放后的图像实际尺寸，而不是包含空白区域的目标尺寸。
+        计算缩放模式的几何布局，PIL路径与张量路径共用同一套尺寸规则。
+
+        Returns:
+            ScaleLayout: resize_size 为缩放后尺寸，crop_box 为缩放后图像上的裁剪框，
+            paste_box 为内容在画布上的位置（仅 pad 模式），canvas_size 为最终输出尺寸
         """
-        img_width, img_height = img.size
+        if scale_mode == "contain":
+            # 根据图像的大边与目标尺寸对齐来计算缩放比例
+            if img_width > img_height:
+                scale_factor = target_width / img_width
+            else:
+                scale_factor = target_height / img_height
+            new_width = int(img_width * scale_factor)
+            new_height = int(img_height * scale_factor)
+            return ScaleLayout((new_width, new_height), None, None, (new_width, new_height))
 
-        # 根据图像的大边与目标尺寸对齐来计算缩放比例
-        if img_width > img_height:
-            scale_factor = target_width / img_width
-        else:
-            scale_factor = target_height / img_height
+        elif scale_mode == "pad":
+            scale_factor = min(target_width / img_width, target_height / img_height)
+            new_width = int(img_width * scale_factor)
+            new_height = int(img_height * scale_factor)
+            position_offsets = {
+                "center": ((target_width - new_width) // 2, (target_height - new_height) // 2),
+                "top": ((target_width - new_width) // 2, 0),
+                "bottom": ((target_width - new_width) // 2, target_height - new_height),
+                "left": (0, (target_height - new_height) // 2),
+                "right": (target_width - new_width, (target_height - new_height) // 2),
+            }
+            x_offset, y_offset = position_offsets.get(position, position_offsets["center"])
+            paste_box = (x_offset, y_offset, x_offset + new_width, y_offset + new_height)
+            return ScaleLayout((new_width, new_height), None, paste_box, (target_width, target_height))
 
-        # 计算新的尺寸
-        new_width = int(img_width * scale_factor)
-        new_height = int(img_height * scale_factor)
+        elif scale_mode == "crop":
+            scale_factor = max(target_width / img_width, target_height / img_height)
+            new_width = int(img_width * scale_factor)
+            new_height = int(img_height * scale_factor)
+            position_offsets = {
+                "center": ((new_width - target_width) // 2, (new_height - target_height) // 2),
+                "top": ((new_width - target_width) // 2, 0),
+                "bottom": ((new_width - target_width) // 2, new_height - target_height),
+                "left": (0, (new_height - target_height) // 2),
+                "right": (new_width - target_width, (new_height - target_height) // 2),
+            }
+            crop_x, crop_y = position_offsets.get(position, position_offsets["center"])
+            crop_box = (crop_x, crop_y, crop_x + target_width, crop_y + target_height)
+            return ScaleLayout((new_width, new_height), crop_box, None, (target_width, target_height))
 
-        # 根据upscale_method选择插值方法
-        resample_method = Image.Resampling.BICUBIC
-        if upscale_method == "bilinear":
-            resample_method = Image.Resampling.BILINEAR
-        elif upscale_method == "lanczos":
-            resample_method = Image.Resampling.LANCZOS
+        elif scale_mode == "fill":
+            return ScaleLayout((target_width, target_height), None, None, (target_width, target_height))
 
-        # 使用指定的插值方法进行缩放
-        resized_img = img.resize((new_width, new_height), resample_method)
+        # none 及未知模式：保持原图尺寸
+        return ScaleLayout((img_width, img_height), None, None, (img_width, img_height))
 
-        # 创建与缩放后图像相同尺寸的全白遮罩
-        mask = Image.new("L", (new_width, new_height), 255)
+    @staticmethod
+    def build_mask(layout, feathering):
+        """
+        按布局生成遮罩：pad 模式下内容区域为0、补边区域为255，其余模式为全白遮罩
+        """
+        mask = Image.new("L", layout.canvas_size, 255)
+        if layout.paste_box is None:
+            # 全白遮罩没有黑色区域，羽化结果不变，无需计算
+            return mask
 
-        # 应用羽化效果
         if feathering > 0:
-            mask = ImageScaleUtils.apply_feather(mask, feathering)
+            # 内容区域总是轴对齐矩形，直接用解析距离羽化，不依赖 scipy
+            return Image.fromarray(ImageScaleUtils.rect_feather_array(layout.canvas_size, layout.paste_box, feathering))
+
+        mask.paste(0, layout.paste_box)
+        return mask
+
+    @staticmethod
+    def rect_feather_array(canvas_size, box, feathering):
+        """
+        矩形内容区域的解析羽化，结果与 apply_feather 的距离变换版本一致。
+
+        矩形内一点到补边区域的最近距离只可能落在某条有补边的边上，
+        因此横纵两个方向各算一条一维距离，二维距离就是两者的逐点最小值。
+        只有距边缘 feathering 像素以内的窄带会得到非零值。
+
+        Args:
+            canvas_size: (width, height)
+            box: 内容区域 (x0, y0, x1, y1)
+            feathering: 羽化像素数，必须大于0
+
+        Returns:
+            np.ndarray: uint8 遮罩，补边区域为255，内容区域从边缘向内渐变到0
+        """
+        canvas_width, canvas_height = canvas_size
+        x0, y0, x1, y1 = box
+
+        def edge_profile(start, end, limit):
+            # 到两侧补边的距离（补边像素本身距离为1）；没有补边的一侧视为无穷远
+            coords = np.arange(start, end, dtype=np.float64)
+            distance = np.full(end - start, np.inf)
+            if start > 0:
+                distance = np.minimum(distance, coords - start + 1)
+            if end < limit:
+                distance = np.minimum(distance, end - coords)
+            feathered = np.clip(distance, 0, feathering)
+            feathered = 255 - (feathered / feathering) * 255
+            return feathered.astype(np.uint8)
+
+        # 羽化值随距离单调递减，所以对一维羽化值取最大等价于对距离取最小
+        profile_x = edge_profile(x0, x1, canvas_width)
+        profile_y = edge_profile(y0, y1, canvas_height)
+
+        result_array = np.full((canvas_height, canvas_width), 255, dtype=np.uint8)
+        np.maximum(profile_y[:, None], profile_x[None, :], out=result_array[y0:y1, x0:x1])
+        return result_array
+
+    @staticmethod
+    def resize_contain(img, target_width, target_height, feathering, upscale_method="bicubic"):
+        """
+        contain: 保持原图宽高比，让图像的大边与目标尺寸对齐，小边根据大边的缩放比例计算。
+        返回的是缩放后的图像实际尺寸，而不是包含空白区域的目标尺寸。
+        """
+        layout = ImageScaleUtils.compute_layout("contain", img.size[0], img.size[1], target_width, target_height)
+
+        # 使用指定的插值方法进行缩放
+        resized_img = img.resize(layout.resize_size, ImageScaleUtils.get_resample_method(upscale_method))
+
+        # 创建与缩放后图像相同尺寸的全白遮罩
+        mask = ImageScaleUtils.build_mask(layout, feathering)
 
         return resized_img, mask
 
@@ -83,38 +235,15 @@ class ImageScaleUtils:
             position: Position for image placement ("center", "top", "bottom", "left", "right")
             pad_color: Color for padding area as RGB tuple, default (127, 127, 127)
         """
-        img_width, img_height = img.size
-
-        scale_factor = min(target_width / img_width, target_height / img_height)
-        new_width = int(img_width * scale_factor)
-        new_height = int(img_height * scale_factor)
+        layout = ImageScaleUtils.compute_layout("pad", img.size[0], img.size[1], target_width, target_height, position)
 
-        resample_method = Image.Resampling.BICUBIC
-        if upscale_method == "bilinear":
-            resample_method = Image.Resampling.BILINEAR
-        elif upscale_method == "lanczos":
-            resample_method = Image.Resampling.LANCZOS
-
-        resized_img = img.resize((new_width, new_height), resample_method)
+        resized_img = img.resize(layout.resize_size, ImageScaleUtils.get_resample_method(upscale_method))
 
         # Use specified pad color instead of default gray
-        new_img = Image.new("RGB", (target_width, target_height), pad_color)
-        
-        position_offsets = {
-            "center": ((target_width - new_width) // 2, (target_height - new_height) // 2),
-            "top": ((target_width - new_width) // 2, 0),
-            "bottom": ((target_width - new_width) // 2, target_height - new_height),
-            "left": (0, (target_height - new_height) // 2),
-            "right": (target_width - new_width, (target_height - new_height) // 2),
-        }
-        x_offset, y_offset = position_offsets.get(position, position_offsets["center"])
-        new_img.paste(resized_img, (x_offset, y_offset))
-
-        mask = Image.new("L", (target_width, target_height), 255)
-        mask.paste(0, (x_offset, y_offset, x_offset + new_width, y_offset + new_height))
+        new_img = Image.new("RGB", layout.canvas_size, pad_color)
+        new_img.paste(resized_img, layout.paste_box[:2])
 
-        if feathering > 0:
-            mask = ImageScaleUtils.apply_feather(mask, feathering)
+        mask = ImageScaleUtils.build_mask(layout, feathering)
 
         return new_img, mask
 
@@ -123,34 +252,12 @@ class ImageScaleUtils:
         """
         crop/cover: 保持原图宽高比，缩放到至少填满目标容器，超出部分裁剪，无空白边。
         """
-        img_width, img_height = img.size
-
-        scale_factor = max(target_width / img_width, target_height / img_height)
-        new_width = int(img_width * scale_factor)
-        new_height = int(img_height * scale_factor)
+        layout = ImageScaleUtils.compute_layout("crop", img.size[0], img.size[1], target_width, target_height, position)
 
-        resample_method = Image.Resampling.BICUBIC
-        if upscale_method == "bilinear":
-            resample_method = Image.Resampling.BILINEAR
-        elif upscale_method == "lanczos":
-            resample_method = Image.Resampling.LANCZOS
+        resized_img = img.resize(layout.resize_size, ImageScaleUtils.get_resample_method(upscale_method))
+        result = resized_img.crop(layout.crop_box)
 
-        resized_img = img.resize((new_width, new_height), resample_method)
-
-        position_offsets = {
-            "center": ((new_width - target_width) // 2, (new_height - target_height) // 2),
-            "top": ((new_width - target_width) // 2, 0),
-            "bottom": ((new_width - target_width) // 2, new_height - target_height),
-            "left": (0, (new_height - target_height) // 2),
-            "right": (new_width - target_width, (new_height - target_height) // 2),
-        }
-        crop_x, crop_y = position_offsets.get(position, position_offsets["center"])
-        result = resized_img.crop((crop_x, crop_y, crop_x + target_width, crop_y + target_height))
-
-        mask = Image.new("L", (target_width, target_height), 255)
-
-        if feathering > 0:
-            mask = ImageScaleUtils.apply_feather(mask, feathering)
+        mask = ImageScaleUtils.build_mask(layout, feathering)
 
         return result, mask
 
@@ -159,22 +266,13 @@ class ImageScaleUtils:
         """
         fill: 直接拉伸图片至目标尺寸，不保持宽高比且无裁剪补边。
         """
-        # 根据upscale_method选择插值方法
-        resample_method = Image.Resampling.BICUBIC
-        if upscale_method == "bilinear":
-            resample_method = Image.Resampling.BILINEAR
-        elif upscale_method == "lanczos":
-            resample_method = Image.Resampling.LANCZOS
+        layout = ImageScaleUtils.compute_layout("fill", img.size[0], img.size[1], target_width, target_height)
 
         # 直接拉伸到目标尺寸，不保持宽高比
-        result = img.resize((target_width, target_height), resample_method)
+        result = img.resize(layout.resize_size, ImageScaleUtils.get_resample_method(upscale_method))
 
         # 创建全白遮罩，因为整个区域都是图片内容
-        mask = Image.new("L", (target_width, target_height), 255)
-
-        # 应用羽化效果
-        if feathering > 0:
-            mask = ImageScaleUtils.apply_feather(mask, feathering)
+        mask = ImageScaleUtils.build_mask(layout, feathering)
 
         return result, mask
 
@@ -201,11 +299,41 @@ class ImageScaleUtils:
             mask = Image.new("L", img.size, 255)
             return img, mask
     
+    @staticmethod
+    def apply_scale_mode(img, scale_mode, target_width, target_height, upscale_method="bicubic", position="center", pad_color=(127, 127, 127), source_size=None):
+        """
+        只处理图像、不生成遮罩，返回 (处理后的图像, 布局)。
+        遮罩只取决于布局，由调用方通过 feather_mask_cache 按布局复用。
+        source_size: 图像在解码时被缩小过时传入原图尺寸，布局按原图计算以保证输出尺寸不变
+        """
+        layout_width, layout_height = source_size if source_size is not None else img.size
+        layout = ImageScaleUtils.compute_layout(scale_mode, layout_width, layout_height, target_width, target_height, position)
+        if scale_mode not in ("contain", "crop", "pad", "fill"):
+            return img, layout
+
+        result = img.resize(layout.resize_size, ImageScaleUtils.get_resample_method(upscale_method))
+        if layout.crop_box is not None:
+            result = result.crop(layout.crop_box)
+        elif layout.paste_box is not None:
+            # 带alpha的帧（RGBX）补边区域为透明
+            fill_color = tuple(pad_color) + (0,) if img.mode == "RGBX" else pad_color
+            canvas = Image.new(img.mode, layout.canvas_size, fill_color)
+            canvas.paste(result, layout.paste_box[:2])
+            result = canvas
+        return result, layout
+
+    @staticmethod
+    def feather_backend():
+        """当前使用的羽化实现，作为遮罩缓存键的一部分"""
+        return "analytic"
+
     @staticmethod
     def apply_feather(mask, feathering):
         """
         为遮罩添加羽化效果。
         羽化值越大，图像边缘的过渡越平滑（在图像范围内应用）。
+        适用于任意形状的遮罩；缩放模式产生的矩形遮罩由 rect_feather_array 处理，
+        没有 scipy 时才退回到高斯模糊。
         """
         # 转换为numpy数组
         mask_array = np.array(mask)
@@ -278,7 +406,111 @@ class ImageScaleUtils:
             result_array = np.where(mask_array == 0, blurred_array, 255)
             return Image.fromarray(result_array)
 
-def process_image_for_comfy(pil_image, resize_mode, target_width, target_height, feathering=0, upscale_method="bicubic", position="center", pad_color=(127, 127, 127)):
+class FeatherMaskCache:
+    """
+    羽化遮罩缓存
+    同一批次的所有帧目标尺寸、偏移和羽化值都相同，遮罩只需计算一次。
+    按 (缩放模式, 画布尺寸, 粘贴框, 羽化值, 羽化实现) 缓存，超出容量时淘汰最久未使用的条目。
+    返回的张量在多次调用之间共享，调用方不能原地修改。
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scale_mode, layout, feathering):
+        """返回 [H, W] 的 float32 遮罩张量（CPU）"""
+        # 没有补边区域时羽化不改变遮罩，不同羽化值共用同一条目
+        feather_key = feathering if layout.paste_box is not None else 0
+        key = (scale_mode, layout.canvas_size, layout.paste_box, feather_key, ImageScaleUtils.feather_backend())
+
+        # 在锁内计算：并行处理同一批次时，其余线程等待首个线程算完后直接命中
+        with self._lock:
+            mask_tensor = self._entries.get(key)
+            if mask_tensor is not None:
+                self._entries.move_to_end(key)
+                return mask_tensor
+
+            mask = ImageScaleUtils.build_mask(layout, feathering)
+            mask_tensor = torch.from_numpy(np.array(mask).astype(np.float32) / 255.0)
+            self._entries[key] = mask_tensor
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return mask_tensor
+
+    def get_batch(self, scale_mode, layout, feathering, batch_size, device=None):
+        """返回 [B, H, W] 遮罩，批次维度通过 expand 广播，不复制数据"""
+        mask_tensor = self.get(scale_mode, layout, feathering)
+        if device is not None:
+            mask_tensor = mask_tensor.to(device)
+        if batch_size == 1:
+            # 单帧的 expand 结果仍可写，复制一份避免下游原地修改污染缓存
+            return mask_tensor.unsqueeze(0).clone()
+        return mask_tensor.unsqueeze(0).expand(batch_size, -1, -1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 进程内共享的羽化遮罩缓存
+feather_mask_cache = FeatherMaskCache()
+
+
+def _load_frame(frame, transpose_method):
+    """加载当前帧像素，并按EXIF方向转置"""
+    frame.load()
+    if transpose_method is None:
+        return frame
+    return frame.transpose(transpose_method)
+
+
+def _to_rgb_with_alpha(frame):
+    """
+    转为 RGB + alpha 的四通道图像（alpha 存放在 RGBX 的 X 通道）。
+    PIL 对 RGBA 缩放时会预乘 alpha，导致透明区域的颜色变黑；RGBX 各通道独立重采样，
+    与单独缩放 RGB 和 alpha 的结果一致。
+    PIL 没有不复制像素就改变模式的公开接口：tobytes 复制一次，frombuffer 直接引用该缓冲区，不再复制。
+    """
+    rgba = frame if frame.mode == "RGBA" else frame.convert("RGBA")
+    return Image.frombuffer("RGBX", rgba.size, rgba.tobytes(), "raw", "RGBX", 0, 1)
+
+
+def _decode_frame(pil_image, source_index, total_frames, transpose_method, keep_alpha, reduce_factor):
+    """
+    Decode one frame up to the point where scaling starts.
+
+    Returns:
+        tuple: (RGB or RGBX PIL Image, has_alpha)
+    """
+    if total_frames > 1:
+        pil_image.seek(source_index)
+    # node_helpers.pillow(fn, arg) 只向 fn 传一个参数
+    i = node_helpers.pillow(partial(_load_frame, transpose_method=transpose_method), pil_image)
+    
+    # Standardize mode
+    if i.mode == 'I':
+        i = i.point(lambda v: v * (1 / 255))
+    
+    # Frames with transparency are resampled as a single 4-channel image, so the alpha
+    # stays aligned with the content; frames without alpha skip the copy entirely
+    has_alpha = keep_alpha and ('A' in i.getbands() or (str(i.mode).strip() == 'P' and 'transparency' in i.info))
+    if has_alpha:
+        current_frame = _to_rgb_with_alpha(i)
+    elif i.mode == "RGB":
+        current_frame = i
+    else:
+        current_frame = i.convert("RGB")
+    
+    # Decode-time downscaling: fast integer reduce before the final resample
+    if reduce_factor > 1:
+        current_frame = current_frame.reduce(reduce_factor)
+    return current_frame, has_alpha
+
+
+def process_image_for_comfy(pil_image, resize_mode, target_width, target_height, feathering=0, upscale_method="bicubic", position="center", pad_color=(127, 127, 127), decode_plan=None, out_image=None, out_mask=None, frame_start=0, frame_count=0, frame_stride=1, keep_alpha=True, cache_key=None, exif_transpose=True):
     """
     Unified image processing function for ComfyUI nodes.
     
@@ -291,53 +523,89 @@ def process_image_for_comfy(pil_image, resize_mode, target_width, target_height,
         upscale_method: Interpolation method for upscaling (bilinear, bicubic, lanczos)
         position: Position for crop/pad ("center", "top", "bottom", "left", "right")
         pad_color: Color for padding area as RGB tuple, default (127, 127, 127)
+        decode_plan: Optional DecodePlan from decode_planner.plan_decode (decode-time downscaling)
+        out_image: Optional preallocated [N, H, W, 3] float32 tensor (e.g. a slice of a batch buffer).
+            Frames are written into it directly; frames beyond N are not decoded.
+        out_mask: Optional preallocated [N, H, W] float32 tensor, required together with out_image
+        frame_start: First frame to decode for animated images (GIF/WebP/APNG)
+        frame_count: Number of frames to decode, 0 means up to the last frame
+        frame_stride: Decode every n-th frame starting from frame_start
+        keep_alpha: Merge the alpha channel into the mask; False treats every frame as plain RGB
+        cache_key: Optional decode_cache.file_cache_key(path) of the source file. Decoded frames are
+            then served from / stored in the shared decoded-image cache
+        exif_transpose: Rotate frames according to the EXIF orientation; False keeps the stored orientation
         
     Returns:
         tuple: (output_image_tensor, output_mask_tensor, final_width, final_height)
     """
 
-    # Handle EXIF orientation
-    img = node_helpers.pillow(ImageOps.exif_transpose, pil_image)
-
-    # Standardize mode
-    if img.mode == 'I':
-        img = img.point(lambda i: i * (1 / 255))
-    
-    output_images = []
-    output_masks = []
     w, h = None, None
+    frame_index = 0
     
     excluded_formats = ['MPO']
+    # MPO stores extra views, not animation frames: only the first frame is used
+    total_frames = 1 if pil_image.format in excluded_formats else getattr(pil_image, "n_frames", 1)
+    frame_indices = select_frame_indices(total_frames, frame_start, frame_count, frame_stride)
+    if out_image is not None:
+        frame_indices = frame_indices[:out_image.shape[0]]
+    if len(frame_indices) == 0:
+        raise ValueError(f"起始帧 {frame_start} 超出范围（共 {total_frames} 帧）")
     
-    # Iterate over frames (for animated images) or single frame
-    for i in ImageSequence.Iterator(img):
-        # Keep transparency info
-        original_image = i.copy()
-        current_frame = i.convert("RGB")
+    # Handle EXIF orientation per frame (transposing the file image itself would keep only its first frame)
+    transpose_method = EXIF_TRANSPOSE_METHODS.get(get_exif_orientation(pil_image, cache_key)) if exif_transpose else None
+    source_size = decode_plan.source_size if decode_plan is not None else None
+    reduce_factor = decode_plan.reduce_factor if decode_plan is not None else 1
+    
+    # Seek straight to the selected frames (for animated images) or the single frame;
+    # each frame is written into the output buffer as soon as it is decoded
+    for source_index in frame_indices:
+        # pil_image.size already reflects a JPEG draft, so together with the reduce factor
+        # it identifies the decoded resolution
+        frame_key = None
+        cached = None
+        if cache_key is not None:
+            frame_key = (cache_key, source_index, pil_image.size, reduce_factor, keep_alpha, transpose_method)
+            cached = decoded_image_cache.get(frame_key)
+        if cached is not None:
+            current_frame, has_alpha = cached
+        else:
+            current_frame, has_alpha = _decode_frame(pil_image, source_index, total_frames, transpose_method, keep_alpha, reduce_factor)
+            if frame_key is not None:
+                if current_frame is pil_image:
+                    # The file image is reused by later seeks; cache a detached copy
+                    current_frame = current_frame.copy()
+                decoded_image_cache.put(frame_key, current_frame, has_alpha)
         
-        # Apply scaling
-        processed_img, mask = ImageScaleUtils.apply_scale_mode_with_mask(
-            current_frame, resize_mode, target_width, target_height, feathering, upscale_method, position, pad_color
+        # Apply scaling (mask depends only on the layout and is shared via the cache)
+        processed_img, layout = ImageScaleUtils.apply_scale_mode(
+            current_frame, resize_mode, target_width, target_height, upscale_method, position, pad_color, source_size
         )
         
         if w is None:
             w, h = processed_img.size
+            if out_image is None:
+                # Output shape is known after the first frame: allocate the whole result once
+                out_image = torch.empty((len(frame_indices), h, w, 3), dtype=torch.float32)
+                out_mask = torch.empty((len(frame_indices), h, w), dtype=torch.float32)
+            elif out_image.shape[1] != h or out_image.shape[2] != w:
+                raise ValueError(f"图片尺寸 {w}x{h} 与批次尺寸 {out_image.shape[2]}x{out_image.shape[1]} 不一致")
             
         # Skip frames that don't match expected size (shouldn't happen with our scaling but safety check)
         if processed_img.size[0] != w or processed_img.size[1] != h:
             continue
             
-        # Convert to numpy
-        img_np = np.array(processed_img).astype(np.float32) / 255.0
-        mask_np = np.array(mask).astype(np.float32) / 255.0
+        cached_mask = feather_mask_cache.get(resize_mode, layout, feathering)
+        
+        # np.asarray wraps the bytes PIL exports (read-only, no extra copy); the uint8 -> float32
+        # conversion and the division by 255 are a single pass written straight into the output slot
+        # (ComfyUI image format is [Batch, Height, Width, Channel], PIL gives [Height, Width, Channel])
+        frame_np = np.asarray(processed_img)
+        np.divide(frame_np[..., :3], 255.0, out=out_image[frame_index].numpy(), dtype=np.float32)
         
-        # Handle alpha channel merging if present
-        if 'A' in original_image.getbands():
-            alpha_channel = np.array(original_image.getchannel('A')).astype(np.float32) / 255.0
-            alpha_img = Image.fromarray((alpha_channel * 255).astype(np.uint8))
-            alpha_img = alpha_img.resize(processed_img.size, Image.Resampling.BICUBIC)
-            alpha_resized = np.array(alpha_img).astype(np.float32) / 255.0
-            mask_np = np.minimum(mask_np, 1.0 - alpha_resized) # Use the image's alpha as the mask (1.0 = opaque)
+        mask_slot = out_mask[frame_index]
+        if has_alpha:
+            # Handle alpha channel merging (palette transparency was expanded to RGBA above)
+            # mask = min(layout_mask, 1.0 - alpha)
             # Wait, ComfyUI mask: 0 is black (masked?), 1 is white (visible/unmasked?).
             # In ComfyUI: 
             #   MASK is usually 0.0 to 1.0.
@@ -427,50 +695,125 @@ def process_image_for_comfy(pil_image, resize_mode, target_width, target_height,
             
             #   I will preserve this exact logic.
             
-            mask_np = np.minimum(mask_np, 1.0 - alpha_resized)
-
-        elif str(original_image.mode).strip() == 'P' and 'transparency' in original_image.info:
-             # Handle palette transparency
-             rgba_img = original_image.convert('RGBA')
-             alpha_channel = np.array(rgba_img.getchannel('A')).astype(np.float32) / 255.0
-             alpha_img = Image.fromarray((alpha_channel * 255).astype(np.uint8))
-             alpha_img = alpha_img.resize(processed_img.size, Image.Resampling.BICUBIC)
-             alpha_resized = np.array(alpha_img).astype(np.float32) / 255.0
-             mask_np = np.minimum(mask_np, 1.0 - alpha_resized)
-
-        # Convert to tensor (HWC -> CHW? No, Comfy is BHWC for images usually? Wait.)
-        # ImageLoaderSingleBen: 
-        # img_tensor = torch.from_numpy(img_np)[None,]  (Add batch dim? shape: 1, H, W, C)
-        # ComfyUI image format is [Batch, Height, Width, Channel]. 
-        # numpy img_np is [Height, Width, Channel] (from PIL)
-        # So [None,] adds batch dim.
+            mask_np = mask_slot.numpy()
+            np.multiply(frame_np[..., 3], -1.0 / 255.0, out=mask_np, dtype=np.float32)
+            mask_np += 1.0
+            torch.minimum(mask_slot, cached_mask, out=mask_slot)
+        else:
+            mask_slot.copy_(cached_mask)
+        frame_index += 1
+
+    if frame_index == 0:
+        raise ValueError("未能解码任何帧")
         
-        img_tensor = torch.from_numpy(img_np)[None,]
-        mask_tensor = torch.from_numpy(mask_np).unsqueeze(0) # Add batch dim to mask? [1, H, W]
+    return out_image[:frame_index], out_mask[:frame_index], w, h
+
+# Upload formats for vision APIs: PIL format name and MIME type
+UPLOAD_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "png": ("PNG", "image/png"),
+}
+UPLOAD_MIN_QUALITY = 40
+UPLOAD_MAX_QUALITY = 95
+# Shrink factor applied when even the lowest quality does not fit the budget
+UPLOAD_SHRINK_STEP = 0.75
+
+
+def _encode_upload(pil_image, pil_format, quality):
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        pil_image.save(buffer, format="PNG", compress_level=1)
+    else:
+        pil_image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
 
-        output_images.append(img_tensor)
-        output_masks.append(mask_tensor)
 
-    if len(output_images) > 1 and img.format not in excluded_formats:
-        final_image = torch.cat(output_images, dim=0)
-        final_mask = torch.cat(output_masks, dim=0)
-    else:
-        final_image = output_images[0]
-        final_mask = output_masks[0]
-        
-    return final_image, final_mask, w, h
+def encode_image_for_upload(pil_image, max_bytes, max_px=2048, image_format="jpeg"):
+    """
+    Encode a PIL image for a vision API request within a byte budget.
+
+    The image is first downscaled so its longest side is at most max_px. For JPEG/WebP the
+    highest quality that fits max_bytes is found by binary search; if even the lowest quality
+    does not fit (or the format is PNG), the image is shrunk further and the search repeated.
+
+    Args:
+        pil_image: RGB PIL Image
+        max_bytes: Maximum size of the encoded bytes
+        max_px: Maximum width or height, 0 keeps the original resolution
+        image_format: "jpeg", "webp" or "png"
+
+    Returns:
+        tuple: (encoded_bytes, mime_type)
+    """
+    pil_format, mime_type = UPLOAD_FORMATS.get(image_format, UPLOAD_FORMATS["jpeg"])
+    if max_px > 0 and max(pil_image.size) > max_px:
+        scale = max_px / max(pil_image.size)
+        pil_image = pil_image.resize(
+            (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale))), Image.Resampling.LANCZOS
+        )
+
+    while True:
+        data = _encode_upload(pil_image, pil_format, UPLOAD_MAX_QUALITY)
+        if len(data) <= max_bytes:
+            return data, mime_type
+        if pil_format != "PNG":
+            best = None
+            low, high = UPLOAD_MIN_QUALITY, UPLOAD_MAX_QUALITY - 1
+            while low <= high:
+                quality = (low + high) // 2
+                candidate = _encode_upload(pil_image, pil_format, quality)
+                if len(candidate) <= max_bytes:
+                    best = candidate
+                    low = quality + 1
+                else:
+                    high = quality - 1
+            if best is not None:
+                return best, mime_type
+        if min(pil_image.size) <= 16:
+            return data, mime_type
+        pil_image = pil_image.resize(
+            (max(1, int(pil_image.width * UPLOAD_SHRINK_STEP)), max(1, int(pil_image.height * UPLOAD_SHRINK_STEP))), Image.Resampling.LANCZOS
+        )
+
 
-def tensor_to_base64(image_tensor, max_size_mb=4.0, max_px=6000):
+def _tensor_frame_to_pil(frame):
+    """[H, W, C] float tensor (0..1) -> RGB PIL Image"""
+    frame_np = frame[..., :3].mul(255).round_().clamp_(0, 255).to(torch.uint8).cpu().numpy()
+    return Image.fromarray(frame_np, mode="RGB")
+
+
+def tensor_to_base64(image_tensor, max_size_mb=4.0, max_px=6000, image_format="jpeg"):
     """
     Convert a ComfyUI image tensor to a base64 string with size and resolution constraints.
     
     Args:
-        image_tensor: torch.Tensor, shape [Batch, H, W, C] or [H, W, C]
-        max_size_mb: float, maximum size in MB (default 4.0 to stay safely under 5.0)
+        image_tensor: torch.Tensor, shape [Batch, H, W, C] or [H, W, C] (first frame of a batch is used)
+        max_size_mb: float, maximum size in MB (default 4.0 to stay safely under 5.0), measured on the base64 payload
         max_px: int, maximum pixel dimension (width or height)
+        image_format: "jpeg", "webp" or "png"
         
     Returns:
-        str: Base64 encoded string starting with 'data:image/jpeg;base64,'
+        str: Base64 data URL, e.g. 'data:image/jpeg;base64,...'
+    """
+    if image_tensor.dim() == 4:
+        image_tensor = image_tensor[0]
+    # base64 grows the payload by 4/3
+    max_bytes = int(max_size_mb * 1024 * 1024 * 3 / 4)
+    data, mime_type = encode_image_for_upload(_tensor_frame_to_pil(image_tensor), max_bytes, max_px, image_format)
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def tensor_batch_to_base64(image_tensor, max_size_mb=4.0, max_px=6000, image_format="jpeg"):
+    """
+    Encode every frame of a [Batch, H, W, C] tensor with tensor_to_base64, in parallel on the
+    shared executor (PIL releases the GIL while encoding). Results keep the batch order.
+    
+    Returns:
+        list: Base64 data URLs, one per frame
     """
-    import io
-    import base64
\ No newline at end of file
+    if image_tensor.dim() == 3:
+        image_tensor = image_tensor.unsqueeze(0)
+    frames = list(image_tensor)
+    count = len(frames)
+    return get_executor().map(tensor_to_base64, frames, [max_size_mb] * count, [max_px] * count, [image_format] * count)
@@ -0,0 +1,51 @@
+"""
+ComfyUI-BenNodes Latent 工厂
+在 ComfyUI 的中间设备上按需创建空 Latent，支持不同模型的通道数/下采样倍数，
+以及只读场景下零步长（expand）的大批次。
+"""
+
+import torch
+
+try:
+    import comfy.model_management
+    MODEL_MANAGEMENT_AVAILABLE = True
+except ImportError:
+    MODEL_MANAGEMENT_AVAILABLE = False
+
+# Latent 布局预设：(通道数, 空间下采样倍数)
+LATENT_LAYOUTS = {
+    "4ch (SD1.5/SDXL)": (4, 8),
+    "16ch (SD3/Flux)": (16, 8),
+    "自定义": None,
+}
+
+
+def get_latent_device():
+    """与 ComfyUI 自带的空 Latent 节点一致，使用中间设备（通常为CPU，采样时再搬到GPU）"""
+    if MODEL_MANAGEMENT_AVAILABLE:
+        return comfy.model_management.intermediate_device()
+    return torch.device("cpu")
+
+
+def resolve_latent_layout(layout, channels=4, downscale_ratio=8):
+    """返回 (通道数, 下采样倍数)，"自定义" 时使用传入的数值"""
+    preset = LATENT_LAYOUTS.get(layout)
+    if preset is None:
+        return channels, downscale_ratio
+    return preset
+
+
+def create_empty_latent(batch_size, width, height, channels=4, downscale_ratio=8, expand=False, device=None):
+    """
+    创建 [B, C, H/ratio, W/ratio] 的全零 Latent
+
+    Args:
+        expand: True 时只分配一个样本，批次维度为零步长视图。
+            适合下游只读取的大批次；需要原地写入的节点会报错，此时应关闭
+        device: 默认使用 get_latent_device()
+    """
+    device = device if device is not None else get_latent_device()
+    shape = [channels, height // downscale_ratio, width // downscale_ratio]
+    if expand and batch_size > 1:
+        return torch.zeros([1] + shape, device=device).expand(batch_size, *shape)
+    return torch.zeros([batch_size] + shape, device=device)
@@ -0,0 +1,64 @@
+"""
+ComfyUI-BenNodes 预处理张量磁盘缓存
+把批量加载时解码、缩放后的 uint8 图像保存为 .npy，按文件 stat 标识（路径、大小、修改时间）和完整的缩放参数索引。
+再次加载时以内存映射方式读取并直接写入输出张量，跨队列和服务器重启都有效。
+"""
+
+import hashlib
+
+import numpy as np
+import torch
+
+from ..file.disk_cache import DiskCache, LazyInstance, budget_from_env, cache_directory, touch
+
+# 缓存目录和容量（MB）可通过环境变量调整
+CACHE_DIR_ENV = "BENNODES_TENSOR_CACHE_DIR"
+CACHE_BUDGET_ENV = "BENNODES_TENSOR_CACHE_MB"
+DEFAULT_BUDGET_MB = 4096
+# 缓存格式或处理逻辑变化时递增，旧条目自然失效
+CACHE_VERSION = 2
+CACHE_SUFFIX = ".npy"
+
+
+def make_cache_key(file_key, *params):
+    """由文件标识和缩放参数生成缓存文件名"""
+    raw = repr((CACHE_VERSION, file_key) + params).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class TensorDiskCache(DiskCache):
+    """以 .npy 文件保存 [N, H, W, 3] uint8 图像，按最近使用时间淘汰到容量以内"""
+
+    suffix = CACHE_SUFFIX
+    label = "张量缓存"
+
+    def load_into(self, key, out_image):
+        """命中时把缓存写入 out_image（float32, 0..1）并返回 True"""
+        path = self._path(key)
+        try:
+            # copy-on-write 映射：只读取页缓存，不复制整个文件，torch 也能直接包装
+            array = np.load(path, mmap_mode="c")
+        except (OSError, ValueError):
+            self._count("misses")
+            return False
+        if array.dtype != np.uint8 or tuple(array.shape) != tuple(out_image.shape):
+            self._count("misses")
+            return False
+        out_image.copy_(torch.from_numpy(array)).div_(255.0)
+        del array
+        touch(path)
+        self._count("hits")
+        return True
+
+    def store(self, key, image):
+        """保存 float32 图像（取值为 k/255，转回 uint8 无损）"""
+        array = image.mul(255.0).round_().to(torch.uint8).cpu().numpy()
+        self._write(key, lambda f: np.save(f, array))
+
+
+def _create_tensor_cache():
+    return TensorDiskCache(cache_directory(CACHE_DIR_ENV, "tensors"), budget_from_env(CACHE_BUDGET_ENV, DEFAULT_BUDGET_MB))
+
+
+# 返回全局磁盘缓存（首次使用时创建目录）
+get_tensor_cache = LazyInstance(_create_tensor_cache)
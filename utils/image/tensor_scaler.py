@@ -0,0 +1,83 @@
+"""
+ComfyUI-BenNodes 张量缩放引擎
+直接在 [B, H, W, C] 张量上整批执行 contain/crop/pad/fill，不经过 PIL 往返和逐帧循环
+"""
+
+import torch
+import torch.nn.functional as F
+
+from .image_utils import ImageScaleUtils, feather_mask_cache
+
+# torch.nn.functional.interpolate 支持的插值方法（lanczos 没有对应实现）
+INTERPOLATE_MODES = {
+    "bilinear": "bilinear",
+    "bicubic": "bicubic",
+}
+
+
+def supports_tensor_engine(image, upscale_method):
+    """
+    判断张量引擎能否处理该输入。
+    只处理 RGB 三通道图像；带 alpha 的图像和 lanczos 插值交给 PIL 路径，保持原有行为。
+    """
+    return image.dim() == 4 and image.shape[-1] == 3 and upscale_method in INTERPOLATE_MODES
+
+
+def resize_batch(images, width, height, upscale_method="bicubic"):
+    """
+    整批缩放 [B, H, W, C] 张量到指定尺寸
+    """
+    if images.shape[1] == height and images.shape[2] == width:
+        return images
+
+    # interpolate 需要 [B, C, H, W]；缩小时开启抗锯齿以接近 PIL 的重采样质量
+    samples = images.movedim(-1, 1)
+    resized = F.interpolate(
+        samples,
+        size=(height, width),
+        mode=INTERPOLATE_MODES.get(upscale_method, "bicubic"),
+        align_corners=False,
+        antialias=True,
+    )
+    # bicubic 会产生过冲，与 PIL 转 uint8 时的截断保持一致
+    return resized.movedim(1, -1).clamp_(0.0, 1.0)
+
+
+def scale_image_batch(images, resize_mode, target_width, target_height, feathering=0, upscale_method="bicubic", position="center", pad_color=(127, 127, 127)):
+    """
+    张量版的 process_image_for_comfy，整批处理同尺寸的图像。
+
+    Args:
+        images: torch.Tensor, shape [B, H, W, 3], 取值 0..1
+        resize_mode: "none", "contain", "pad", "crop", "fill"
+        target_width: Target width
+        target_height: Target height
+        feathering: Feathering amount
+        upscale_method: Interpolation method ("bilinear", "bicubic")
+        position: Position for crop/pad ("center", "top", "bottom", "left", "right")
+        pad_color: Color for padding area as RGB tuple, default (127, 127, 127)
+
+    Returns:
+        tuple: (output_image_tensor [B, H, W, 3], output_mask_tensor [B, H, W], final_width, final_height)
+    """
+    batch_size, img_height, img_width, channels = images.shape
+    layout = ImageScaleUtils.compute_layout(resize_mode, img_width, img_height, target_width, target_height, position)
+    canvas_width, canvas_height = layout.canvas_size
+
+    resized = resize_batch(images, layout.resize_size[0], layout.resize_size[1], upscale_method)
+
+    if layout.crop_box is not None:
+        x0, y0, x1, y1 = layout.crop_box
+        output_image = resized[:, y0:y1, x0:x1, :]
+    elif layout.paste_box is not None:
+        x0, y0, x1, y1 = layout.paste_box
+        output_image = resized.new_empty((batch_size, canvas_height, canvas_width, channels))
+        output_image[:] = torch.tensor(pad_color, dtype=resized.dtype, device=resized.device) / 255.0
+        output_image[:, y0:y1, x0:x1, :] = resized
+    else:
+        output_image = resized
+
+    # 整批共用同一个几何布局，遮罩从缓存取出后沿批次维度广播
+    output_mask = feather_mask_cache.get_batch(resize_mode, layout, feathering, batch_size, images.device)
+
+    return output_image.contiguous(), output_mask, canvas_width, canvas_height
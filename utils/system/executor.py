@@ -0,0 +1,225 @@
+"""
+ComfyUI-BenNodes 共享执行器
+所有节点的并行路径共用一个常驻线程池，不再每次执行都新建线程池。
+池大小取自 CPU 亲和性和 cgroup 配额，而不是宿主机的全部核心数。
+不提供进程池：ComfyUI 是已初始化 CUDA 的多线程服务进程，fork 出的子进程可能继承被占用的锁和失效的
+CUDA 上下文；spawn/forkserver 子进程又会重新导入服务端主模块。PIL 解码和缩放本身会释放 GIL，线程池即可利用多核。
+"""
+
+import concurrent.futures
+import math
+import os
+import threading
+import time
+
+import torch
+
+# 通过环境变量限制工作线程数（0 或未设置表示自动）
+MAX_WORKERS_ENV = "BENNODES_MAX_WORKERS"
+# I/O 线程池大小：与 GLM 配置节点 concurrency 的上限一致，多个节点同时请求时排队
+IO_POOL_WORKERS = 64
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_cgroup_cpu_limit():
+    """读取容器的 CPU 配额（核数，向上取整），没有限制时返回 None"""
+    try:
+        with open(CGROUP_V2_CPU_MAX) as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(CGROUP_V1_QUOTA) as f:
+            quota = int(f.read())
+        with open(CGROUP_V1_PERIOD) as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_cpu_budget():
+    """当前进程实际可用的 CPU 数：CPU 亲和性与 cgroup 配额取较小值"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    cgroup_limit = _read_cgroup_cpu_limit()
+    if cgroup_limit is not None:
+        cpus = min(cpus, cgroup_limit)
+    return max(1, cpus)
+
+
+def get_configured_workers():
+    """工作线程数：环境变量优先，否则使用 CPU 预算"""
+    budget = get_cpu_budget()
+    try:
+        configured = int(os.environ.get(MAX_WORKERS_ENV, "0"))
+    except ValueError:
+        print(f"{MAX_WORKERS_ENV} 不是整数，使用自动值 {budget}")
+        configured = 0
+    return configured if configured > 0 else budget
+
+
+def _coordinate_torch_threads(budget):
+    """torch 默认按物理核心数开 intra-op 线程，不感知容器配额，超出预算时收紧"""
+    if torch.get_num_threads() > budget:
+        torch.set_num_threads(budget)
+
+
+class SharedExecutor:
+    """常驻线程池，记录排队、运行中和完成的任务数以及累计忙碌时间"""
+
+    def __init__(self, max_workers, thread_name_prefix="BenNodes"):
+        self.max_workers = max_workers
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._busy_seconds = 0.0
+
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._busy_seconds += elapsed
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._queued += 1
+        return self._pool.submit(self._run, fn, args, kwargs)
+
+    def map(self, fn, *iterables):
+        """与 Executor.map 相同，但立即提交全部任务并按输入顺序返回结果列表"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._created
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "busy_seconds": round(self._busy_seconds, 3),
+                # 当前占用率与自创建以来的平均利用率
+                "utilisation": self._active / self.max_workers,
+                "average_utilisation": self._busy_seconds / (elapsed * self.max_workers) if elapsed > 0 else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+_executor = None
+_io_executor = None
+_init_lock = threading.Lock()
+# 标记当前线程是否为 I/O 线程池的工作线程
+_io_thread = threading.local()
+
+
+def get_executor():
+    """返回共享线程池（首次调用时创建）"""
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                workers = get_configured_workers()
+                _coordinate_torch_threads(get_cpu_budget())
+                _executor = SharedExecutor(workers)
+    return _executor
+
+
+def get_io_executor():
+    """返回共享的 I/O 线程池（首次调用时创建）"""
+    global _io_executor
+    if _io_executor is None:
+        with _init_lock:
+            if _io_executor is None:
+                _io_executor = SharedExecutor(IO_POOL_WORKERS, thread_name_prefix="BenNodes-io")
+    return _io_executor
+
+
+def run_io_tasks(fn, items, max_workers):
+    """
+    并发执行网络请求等 I/O 任务，按输入顺序返回结果列表
+    I/O 任务大部分时间在等待，使用单独的常驻 I/O 线程池，不占用按 CPU 配额设定大小的共享线程池。
+    每次调用最多占用 max_workers 个线程，各线程依次领取下一项；某一项抛出异常后不再领取新项，
+    等已开始的项结束后抛出该异常。
+    只有一项、max_workers<=1，或在 I/O 线程内嵌套调用时直接在当前线程执行，嵌套调用不会等待线程而死锁。
+    """
+    items = list(items)
+    workers = min(max(1, int(max_workers)), len(items))
+    if workers <= 1 or getattr(_io_thread, "active", False):
+        return [fn(item) for item in items]
+
+    results = [None] * len(items)
+    next_index = iter(range(len(items)))
+    index_lock = threading.Lock()
+    failed = threading.Event()
+
+    def worker():
+        _io_thread.active = True
+        try:
+            while not failed.is_set():
+                with index_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                try:
+                    results[index] = fn(items[index])
+                except BaseException:
+                    failed.set()
+                    raise
+        finally:
+            _io_thread.active = False
+
+    executor = get_io_executor()
+    futures = [executor.submit(worker) for _ in range(workers)]
+    concurrent.futures.wait(futures)
+    for future in futures:
+        future.result()
+    return results
+
+
+def executor_stats():
+    """所有共享池的状态，供日志或调试节点显示"""
+    stats = {"cpu_budget": get_cpu_budget(), "torch_threads": torch.get_num_threads()}
+    if _executor is not None:
+        stats["threads"] = _executor.stats()
+    if _io_executor is not None:
+        stats["io_threads"] = _io_executor.stats()
+    return stats
+
+
+def log_executor_stats():
+    """打印一行共享线程池状态，节点完成并行任务后调用"""
+    stats = executor_stats()
+    parts = [f"CPU预算 {stats['cpu_budget']}", f"torch线程 {stats['torch_threads']}"]
+    for key, label in (("threads", "线程池"), ("io_threads", "I/O线程池")):
+        pool = stats.get(key)
+        if pool is not None:
+            parts.append(
+                f"{label} {pool['active']}/{pool['max_workers']} 运行中, 排队 {pool['queue_depth']}, "
+                f"已完成 {pool['completed']}, 平均利用率 {pool['average_utilisation']:.1%}"
+            )
+    print("共享执行器: " + "; ".join(parts))